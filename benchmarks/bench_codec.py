@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Decoding throughput of the json codecs on synthetic notes listings.
+
+Usage: python benchmarks/bench_codec.py [notes] [content size]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from paperwrap import codec, wrapper
+
+
+def notes_payload(count, content_size):
+    """Returns a notes response body as the server sends it."""
+    content = ('<p>Lorem ipsum dolor sit amet, ü€ consectetur.</p>' *
+               (content_size // 50 + 1))[:content_size]
+    notes = [{
+        'id': i,
+        'title': 'note {}'.format(i),
+        'content': content,
+        'content_preview': content[:15],
+        'notebook_id': i % 20,
+        'updated_at': '2015-01-01 12:00:00',
+        'tags': [{'id': i % 7, 'title': 'tag', 'visibility': 0}],
+        'versions': [{'id': i * 3, 'title': 'note {}'.format(i)}]
+        } for i in range(count)]
+    return codec.JSONCodec().dumps({'success': True, 'response': notes})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    content_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    payload = notes_payload(count, content_size)
+    megabytes = len(payload) / 1024.0 / 1024
+    print('{} notes, {:.1f} MB payload'.format(count, megabytes))
+
+    def text_then_loads():
+        # the former code path: decode to str, then parse with json
+        return codec.JSONCodec().loads(payload.decode('utf-8'))
+
+    runs = [('json (text, before)', text_then_loads)]
+    for name in sorted(codec.CODECS):
+        if name != 'json' and getattr(codec, name) is None:
+            continue
+        json_codec = codec.get_codec(name)
+        api = wrapper.API('localhost', json_codec=json_codec)
+        runs.append(('{} (bytes)'.format(name),
+                     lambda api=api: api.parse_response(payload)))
+
+    for name, func in runs:
+        seconds = min(timeit.repeat(func, number=3, repeat=3)) / 3
+        print('{:<22} {:8.1f} ms {:8.1f} MB/s'.format(
+            name, seconds * 1000, megabytes / seconds))
+
+
+if __name__ == '__main__':
+    main()
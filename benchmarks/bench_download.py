@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Time of Paperwork.download with simulated server latency for
+different numbers of workers.
+
+Usage: python benchmarks/bench_download.py [notebooks] [notes] [latency]
+"""
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from paperwrap import models, wrapper
+
+
+class LatencyAPI(wrapper.API):
+    """API answering from memory after latency seconds."""
+    def __init__(self, notebooks, notes, latency):
+        super().__init__('localhost')
+        self.latency = latency
+        self.notebooks = [{
+            'id': i,
+            'title': 'notebook {}'.format(i),
+            'type': 0,
+            'updated_at': '2015-01-01 12:00:00'
+            } for i in range(notebooks)]
+        self.notes = [{
+            'id': i,
+            'title': 'title',
+            'content': '',
+            'updated_at': '2015-01-01 12:00:00',
+            'tags': []
+            } for i in range(notes)]
+
+    def list_tags(self):
+        time.sleep(self.latency)
+        return []
+
+    def list_notebooks(self):
+        time.sleep(self.latency)
+        return self.notebooks
+
+    def list_notebook_notes(self, notebook_id):
+        time.sleep(self.latency)
+        return self.notes
+
+
+def main():
+    notebooks = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    notes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    print('{} notebooks with {} notes, {}s latency'.format(
+        notebooks, notes, latency))
+    for workers in (1, 2, 4, 8, 16):
+        with patch.object(wrapper.API, 'test_connection'):
+            pw = models.Paperwork('localhost')
+        pw.api = LatencyAPI(notebooks, notes, latency)
+        start = time.perf_counter()
+        pw.download(workers=workers)
+        print('{:2} workers: {:.3f}s'.format(
+            workers, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
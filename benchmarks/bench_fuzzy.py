@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Time of utils.fuzzy_find against a full scan with fuzz.ratio.
+
+Usage: python benchmarks/bench_fuzzy.py [choices] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fuzzywuzzy import fuzz
+from paperwrap import utils
+
+WORDS = (
+    'meeting notes project plan budget travel recipe shopping list ideas '
+    'journal report draft review summary todo weekly monthly archive '
+    'invoice contract letter').split()
+
+
+class Choice:
+    def __init__(self, title):
+        self.title = title
+
+
+def scan(title, choices):
+    """fuzzy_find before the index."""
+    top_choice = (0, None)
+    for choice in choices:
+        val = fuzz.ratio(choice.title, title)
+        if val > top_choice[0]:
+            top_choice = (val, choice)
+    return top_choice[1]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+    choices = [Choice('{} {} {}'.format(
+        random.choice(WORDS), random.choice(WORDS), i))
+        for i in range(count)]
+    # queries with a typo
+    titles = [choice.title[:3] + choice.title[4:]
+              for choice in random.sample(choices, queries)]
+    print('{} choices, {} queries'.format(count, queries))
+
+    start = time.perf_counter()
+    expected = [scan(title, choices) for title in titles[:3]]
+    print('scan:        {:.4f}s per query'.format(
+        (time.perf_counter() - start) / 3))
+
+    start = time.perf_counter()
+    utils.fuzzy_index(choices)
+    print('build index: {:.4f}s'.format(time.perf_counter() - start))
+    start = time.perf_counter()
+    found = [utils.fuzzy_find(title, choices) for title in titles]
+    print('index:       {:.4f}s per query'.format(
+        (time.perf_counter() - start) / queries))
+    start = time.perf_counter()
+    [utils.fuzzy_find(title, choices) for title in titles]
+    print('cached:      {:.4f}s per query'.format(
+        (time.perf_counter() - start) / queries))
+    print('same result as scan: {}/3'.format(sum(
+        a.title == b.title for a, b in zip(expected, found))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Memory used per note and per version by the model classes.
+
+Usage: python benchmarks/bench_models_memory.py [notes] [versions per note]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from paperwrap import models, wrapper
+
+
+def version_json(note_id, i):
+    return {
+        'id': note_id * 100 + i,
+        'title': 'title',
+        'previous_id': None,
+        'next_id': None,
+        'content': '',
+        'updated_at': '2015-01-01 12:00:00'
+        }
+
+
+def measure(func):
+    """Returns the result of func and the bytes allocated by it."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    versions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    api = wrapper.API('localhost')
+    notebook = models.Notebook('notebook', 1, api)
+    # strings are shared between both measurements, so only the
+    # per-object overhead of the models is counted
+    notes_json = [{
+        'id': i,
+        'title': 'title',
+        'content': '',
+        'updated_at': '2015-01-01 12:00:00'
+        } for i in range(count)]
+    versions_json = [
+        [version_json(i, j) for j in range(versions)] for i in range(count)]
+
+    notes, note_bytes = measure(lambda: [
+        models.Note.from_json(notebook, note) for note in notes_json])
+    _, version_bytes = measure(lambda: [
+        models.Version.from_json(note, version)
+        for note, note_versions in zip(notes, versions_json)
+        for version in note_versions])
+
+    print('{} notes, {} versions'.format(count, count * versions))
+    print('bytes per note:    {:.0f}'.format(note_bytes / count))
+    print('bytes per version: {:.0f}'.format(
+        version_bytes / (count * versions)))
+
+
+if __name__ == '__main__':
+    main()
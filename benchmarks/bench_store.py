@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""Cold start (download from a simulated server) vs warm start (load
+from the SQLite store) of a synthetic instance.
+
+Usage: python benchmarks/bench_store.py [notes] [notebooks] [latency]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from paperwrap import models, store, wrapper
+
+
+class FakeAPI(wrapper.API):
+    """API decoding prepared response bodies after latency seconds."""
+    def __init__(self, notes, notebooks, latency):
+        super().__init__('localhost')
+        self.latency = latency
+        self.responses = {
+            'tags': self.body([
+                {'id': i, 'title': 'tag {}'.format(i), 'visibility': 0}
+                for i in range(50)]),
+            'notebooks': self.body([
+                {'id': i, 'title': 'notebook {}'.format(i), 'type': 0,
+                 'updated_at': '2015-01-01 12:00:00'}
+                for i in range(notebooks)])
+            }
+        for i in range(notebooks):
+            self.responses[i] = self.body([{
+                'id': j,
+                'title': 'note {}'.format(j),
+                'content': 'content of note {} '.format(j) * 10,
+                'updated_at': '2015-01-01 12:00:00',
+                'tags': [{'id': j % 50}]
+                } for j in range(i, notes, notebooks)])
+
+    def body(self, response):
+        return self.codec.dumps({'success': True, 'response': response})
+
+    def respond(self, key):
+        time.sleep(self.latency)
+        return self.parse_response(self.responses[key])
+
+    def list_tags(self):
+        return self.respond('tags')
+
+    def list_notebooks(self):
+        return self.respond('notebooks')
+
+    def list_notebook_notes(self, notebook_id):
+        return self.respond(notebook_id)
+
+
+def paperwork(api):
+    with patch.object(wrapper.API, 'test_connection'):
+        pw = models.Paperwork('localhost')
+    pw.api = api
+    return pw
+
+
+def main():
+    notes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    notebooks = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    api = FakeAPI(notes, notebooks, latency)
+    path = os.path.join(tempfile.mkdtemp(), 'store.db')
+    print('{} notes in {} notebooks, {}s latency'.format(
+        notes, notebooks, latency))
+
+    pw = paperwork(api)
+    start = time.perf_counter()
+    pw.download()
+    print('cold start: {:.3f}s'.format(time.perf_counter() - start))
+
+    with store.Store(path) as local:
+        start = time.perf_counter()
+        pw.save(local)
+        print('save:       {:.3f}s ({:.1f} MB)'.format(
+            time.perf_counter() - start, os.path.getsize(path) / 1e6))
+
+    with store.Store(path) as local:
+        pw = paperwork(api)
+        start = time.perf_counter()
+        pw.load(local)
+        print('warm start: {:.3f}s'.format(time.perf_counter() - start))
+        assert len(list(pw.iter_notes())) == notes
+
+    # the collector scans the growing model graph while it is built,
+    # applications loading large stores may pause it around load
+    with store.Store(path) as local:
+        pw = paperwork(api)
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            pw.load(local)
+            print('warm start: {:.3f}s (gc paused)'.format(
+                time.perf_counter() - start))
+        finally:
+            gc.enable()
+
+
+if __name__ == '__main__':
+    main()
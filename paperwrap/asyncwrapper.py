@@ -0,0 +1,328 @@
+"""Asyncio variant of the wrapper for paperwork API.
+
+Requires aiohttp.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import asyncio
+import logging
+import os
+from . import wrapper
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 100
+
+
+async def run_blocking(func, *args):
+    """Runs func in the default executor of the event loop, for file
+    access which would block the loop.
+
+    :type func: callable
+    """
+    return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+class AsyncAPI(wrapper.BaseAPI):
+    """Class representing the asyncio api-wrapper.
+
+    Offers the endpoints of wrapper.API, each of them returns a
+    coroutine instead of the result. Retries, the circuit breaker and
+    the slow request log of wrapper.API are not supported.
+    """
+    def __init__(self, host, user_agent=wrapper.DEFAULT_AGENT,
+                 concurrency=DEFAULT_CONCURRENCY,
+                 timeout=wrapper.DEFAULT_TIMEOUT,
+                 keep_alive=True,
+                 json_codec=None,
+                 metrics_registry=None):
+        """Async api instance.
+
+        The aiohttp session is created on first use, so the instance
+        can be created outside of the event loop.
+
+        :type host: str
+        :type user_agent: str
+        :param int concurrency: Maximum number of requests in flight.
+        :param timeout: Timeout in seconds for each request, either a
+            float or a (connect, read) tuple.
+        :param bool keep_alive: If false connections are closed after
+            each request.
+        :param codec.JSONCodec json_codec: Codec for request and response
+            bodies, defaults to the fastest installed one.
+        :param metrics.Registry metrics_registry: Registry recording the
+            requests, a new one if None.
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncAPI requires aiohttp.')
+        self.configure(host, user_agent, timeout, keep_alive, json_codec,
+                       metrics_registry)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Closes the session and all pooled connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def pool_stats(self):
+        """Returns the concurrency limit and the requests in flight.
+
+        :rtype: dict
+        """
+        return {'concurrency': self.concurrency, 'in_flight': self.in_flight}
+
+    def get_session(self):
+        """Returns the aiohttp session, creates it if necessary.
+
+        :rtype: aiohttp.ClientSession
+        """
+        if self.session is None:
+            if isinstance(self.timeout, tuple):
+                timeout = aiohttp.ClientTimeout(
+                    sock_connect=self.timeout[0],
+                    sock_read=self.timeout[1])
+            else:
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                timeout=timeout)
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def test_connection(self):
+        """Tests connection.  Returns false if connection fails.
+
+        :rtype: bool
+        """
+        if await self.get('notebooks'):
+            return True
+        else:
+            return False
+
+    async def request(self, method, keyword, *ids, **data):
+        """Sends a request to the host and returns the parsed json data
+        if successfull.
+
+        :type method: str
+        :type keyword: str
+        :rtype: dict or None
+        """
+        uri = self.uri(keyword, *ids)
+        headers = dict(self.headers)
+
+        if data:
+            headers['Content-Type'] = 'application/json'
+            data = self.codec.dumps(data)
+
+        LOGGER.info(
+            '{} request to {}:\ndata: {}\nheaders: {}'.format(
+                method, uri, data, headers))
+
+        session = self.get_session()
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                with self.metrics.measure(keyword, method) as measurement:
+                    async with session.request(
+                            method,
+                            uri,
+                            data=data or None,
+                            headers=headers) as res:
+                        content = await res.read()
+                    measurement.status = res.status
+                    measurement.request_bytes = len(data) if data else 0
+                    measurement.response_bytes = len(content)
+            finally:
+                self.in_flight -= 1
+
+        if keyword == 'attachment_raw':
+            return content
+        return self.parse_response(content)
+
+    async def delete_note(self, note):
+        """Delete note.
+
+        :type note: dict
+        :rtype: dict
+        """
+        return (await self.delete_notes([note]))[0]
+
+    async def move_note(self, note, new_notebook_id):
+        """Moves note to new_notebook_id.
+
+        :type note: dict
+        :type new_notebook_id: int
+        :rtype: dict
+        """
+        return (await self.move_notes([note], new_notebook_id))[0]
+
+    async def delete_notes(self, notes):
+        """Delete notes, one concurrent request per notebook.
+
+        :type notes: list
+        :rtype: list
+        """
+        groups = wrapper.group_by_notebook(notes)
+        if len(groups) == 1:
+            return await self.delete(
+                'note',
+                notes[0]['notebook_id'],
+                wrapper.concatenate_ids(notes))
+        responses = await asyncio.gather(*[
+            self.delete('note', notebook_id, wrapper.concatenate_ids(group))
+            for notebook_id, group in groups.items()])
+        return [deleted for response in responses
+                for deleted in wrapper.as_list(response)]
+
+    async def move_notes(self, notes, new_notebook_id):
+        """Moves notes to new_notebook_id, one concurrent request per
+        notebook.
+
+        :type notes: list
+        :type new_notebook_id: int
+        :rtype: list
+        """
+        groups = wrapper.group_by_notebook(notes)
+        if len(groups) == 1:
+            return await self.get(
+                'move',
+                notes[0]['notebook_id'],
+                wrapper.concatenate_ids(notes),
+                new_notebook_id)
+        responses = await asyncio.gather(*[
+            self.get('move', notebook_id, wrapper.concatenate_ids(group),
+                     new_notebook_id)
+            for notebook_id, group in groups.items()])
+        return [moved for response in responses
+                for moved in wrapper.as_list(response)]
+
+    async def download_note_version_attachment(
+            self,
+            note,
+            version_id,
+            attachment_id,
+            path,
+            progress=None,
+            resume=True):
+        """Downloads attachment of note version to specified path.
+
+        See wrapper.API.download_note_version_attachment.
+        :type note: dict
+        :type version_id: int
+        :type attachment_id: int
+        :type path: str
+        :type progress: callable
+        :type resume: bool
+        :rtype: bool
+        """
+        uri = self.uri(
+            'attachment_raw',
+            note['notebook_id'],
+            note['id'],
+            version_id,
+            attachment_id)
+        offset = await run_blocking(wrapper.partial_size, path) \
+            if resume else 0
+        LOGGER.info('Downloading {} to {} from byte {}'.format(
+            uri, path, offset))
+        session = self.get_session()
+        try:
+            async with self.semaphore:
+                with self.metrics.measure('attachment_raw', 'get') \
+                        as measurement:
+                    async with session.get(
+                            uri,
+                            headers=wrapper.range_headers(
+                                self.headers, offset)) as res:
+                        measurement.status = res.status
+                        if res.status == 416 and offset:
+                            LOGGER.info(
+                                'Range not satisfiable, restarting download')
+                            restart = True
+                        else:
+                            restart = False
+                            res.raise_for_status()
+                            if res.status != 206:
+                                offset = 0
+                            length = res.headers.get('Content-Length')
+                            total = offset + int(length) if length else None
+                            f = await run_blocking(
+                                open, path + wrapper.PART_SUFFIX,
+                                'ab' if offset else 'wb')
+                            try:
+                                async for chunk in res.content.iter_chunked(
+                                        wrapper.CHUNK_SIZE):
+                                    await run_blocking(f.write, chunk)
+                                    offset += len(chunk)
+                                    measurement.response_bytes += len(chunk)
+                                    if progress:
+                                        progress(offset, total)
+                            finally:
+                                await run_blocking(f.close)
+            if restart:
+                return await self.download_note_version_attachment(
+                    note, version_id, attachment_id, path,
+                    progress, resume=False)
+            await run_blocking(os.replace, path + wrapper.PART_SUFFIX, path)
+            return True
+        except (IOError, aiohttp.ClientError) as error:
+            LOGGER.error(error)
+        return False
+
+    async def upload_attachment(self, note, path, progress=None):
+        """Uploads an attachment and returns it.
+
+        See wrapper.API.upload_attachment. The file is opened and read
+        in the default executor of the event loop.
+        :type note: dict
+        :type path: str
+        :type progress: callable
+        :rtype: dict
+        """
+        LOGGER.info('Uploading file at {} to {}'.format(path, note))
+        session = self.get_session()
+        body = await run_blocking(
+            wrapper.MultipartEncoder, 'file', path, progress)
+        try:
+            headers = dict(self.headers)
+            headers['Content-Type'] = body.content_type
+            headers['Content-Length'] = str(len(body))
+
+            async def chunks():
+                chunk = await run_blocking(body.read, wrapper.CHUNK_SIZE)
+                while chunk:
+                    yield chunk
+                    chunk = await run_blocking(body.read, wrapper.CHUNK_SIZE)
+
+            async with self.semaphore:
+                with self.metrics.measure('attachments', 'post') \
+                        as measurement:
+                    async with session.post(
+                            self.uri('attachments', note['notebook_id'],
+                                     note['id'], 0),
+                            data=chunks(),
+                            headers=headers) as res:
+                        content = await res.read()
+                    measurement.status = res.status
+                    measurement.request_bytes = len(body)
+                    measurement.response_bytes = len(content)
+            return self.parse_response(content)
+        finally:
+            await run_blocking(body.close)
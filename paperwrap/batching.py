@@ -0,0 +1,218 @@
+"""Micro-batching of single note requests into multi-id requests.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.01
+DEFAULT_MAX_SIZE = 50
+
+
+def by_id(ids, response):
+    """Maps a response of a multi-id request to the requested ids by the
+    'id' of the returned items.
+
+    :type ids: list
+    :type response: list or dict or None
+    :rtype: dict
+    """
+    if isinstance(response, dict):
+        response = [response]
+    return {
+        str(item['id']): item for item in response or []
+        if isinstance(item, dict) and 'id' in item}
+
+
+def by_position(ids, response):
+    """Maps a response of a multi-id request to the requested ids by
+    position. A single id receives the whole response.
+
+    :type ids: list
+    :type response: list or None
+    :rtype: dict
+    """
+    if len(ids) == 1:
+        return {ids[0]: response}
+    if isinstance(response, list) and len(response) == len(ids):
+        return dict(zip(ids, response))
+    LOGGER.error('Could not map batched response to {}'.format(ids))
+    return {}
+
+
+def note_dicts(notebook_id, ids):
+    """Returns minimal note dicts for the multi-id api methods.
+
+    :type notebook_id: int or str
+    :type ids: list
+    :rtype: list
+    """
+    return [{'id': ident, 'notebook_id': notebook_id} for ident in ids]
+
+
+class Batch:
+    """Class representing pending single note calls of one operation on
+    one notebook."""
+    def __init__(self, key):
+        """Initializes an empty batch.
+
+        :param tuple key: (operation, notebook_id, extra argument)
+        """
+        self.key = key
+        self.futures = {}
+        self.timer = None
+
+    def add(self, ident):
+        """Returns the future for ident, shared by calls for the same id.
+
+        :type ident: str
+        :rtype: Future
+        """
+        if ident not in self.futures:
+            self.futures[ident] = Future()
+        return self.futures[ident]
+
+
+class BatchDispatcher:
+    """Collects single note calls to the same notebook and sends them as
+    one multi-id request, either after window seconds or as soon as
+    max_size notes are pending."""
+    def __init__(self, api, window=DEFAULT_WINDOW, max_size=DEFAULT_MAX_SIZE):
+        """Initializes the dispatcher.
+
+        :type api: wrapper.API
+        :param float window: seconds to wait for further calls
+        :param int max_size: maximum number of notes per request
+        """
+        self.api = api
+        self.window = window
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.counters = {'calls': 0, 'requests': 0}
+
+    def submit(self, operation, notebook_id, note_id, extra=None):
+        """Queues a call and returns a future for its result.
+
+        :param str operation: one of get_note, delete_note, move_note,
+            list_note_versions
+        :type notebook_id: int or str
+        :type note_id: int or str
+        :param extra: new notebook id for move_note
+        :rtype: Future
+        """
+        key = (operation, str(notebook_id), extra)
+        flush = None
+        with self.lock:
+            self.counters['calls'] += 1
+            batch = self.pending.get(key)
+            if batch is None:
+                batch = self.pending[key] = Batch(key)
+                batch.timer = threading.Timer(self.window, self.flush, [batch])
+                batch.timer.daemon = True
+                batch.timer.start()
+            future = batch.add(str(note_id))
+            if len(batch.futures) >= self.max_size:
+                flush = batch
+        if flush is not None:
+            self.flush(flush)
+        return future
+
+    def flush(self, batch):
+        """Sends the request for batch and resolves its futures.
+
+        :type batch: Batch
+        """
+        with self.lock:
+            if self.pending.get(batch.key) is not batch:
+                return
+            del self.pending[batch.key]
+            self.counters['requests'] += 1
+        batch.timer.cancel()
+        operation, notebook_id, extra = batch.key
+        ids = list(batch.futures)
+        LOGGER.info('Sending batched {} for notes {} in notebook {}'.format(
+            operation, ids, notebook_id))
+        try:
+            results = self.send(operation, notebook_id, ids, extra)
+        except BaseException as error:
+            for future in batch.futures.values():
+                future.set_exception(error)
+            return
+        for ident, future in batch.futures.items():
+            future.set_result(results.get(ident))
+
+    def flush_all(self):
+        """Sends all pending batches immediately."""
+        with self.lock:
+            batches = list(self.pending.values())
+        for batch in batches:
+            self.flush(batch)
+
+    def send(self, operation, notebook_id, ids, extra):
+        """Sends the multi-id request and maps the response to the ids.
+
+        :rtype: dict
+        """
+        if operation == 'get_note':
+            return by_id(ids, self.api.get_notes(notebook_id, ids))
+        elif operation == 'delete_note':
+            return by_id(ids, self.api.delete_notes(
+                note_dicts(notebook_id, ids)))
+        elif operation == 'move_note':
+            return by_id(ids, self.api.move_notes(
+                note_dicts(notebook_id, ids), extra))
+        elif operation == 'list_note_versions':
+            return by_position(ids, self.api.list_notes_versions(
+                note_dicts(notebook_id, ids)))
+        raise ValueError('Unknown batch operation {}'.format(operation))
+
+    def get_note(self, notebook_id, note_id):
+        """Batched wrapper.API.get_note.
+
+        :rtype: Future
+        """
+        return self.submit('get_note', notebook_id, note_id)
+
+    def delete_note(self, note):
+        """Batched wrapper.API.delete_note.
+
+        :type note: dict
+        :rtype: Future
+        """
+        return self.submit('delete_note', note['notebook_id'], note['id'])
+
+    def move_note(self, note, new_notebook_id):
+        """Batched wrapper.API.move_note.
+
+        :type note: dict
+        :type new_notebook_id: int
+        :rtype: Future
+        """
+        return self.submit(
+            'move_note', note['notebook_id'], note['id'], new_notebook_id)
+
+    def list_note_versions(self, note):
+        """Batched wrapper.API.list_note_versions.
+
+        :type note: dict
+        :rtype: Future
+        """
+        return self.submit(
+            'list_note_versions', note['notebook_id'], note['id'])
+
+    def stats(self):
+        """Returns the number of batched calls, the number of requests
+        sent for them and the number of pending batches.
+
+        :rtype: dict
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['pending'] = len(self.pending)
+        return stats
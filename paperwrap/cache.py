@@ -0,0 +1,208 @@
+"""Response cache for the paperwork api-wrapper.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 256
+DEFAULT_TTL = 60
+
+# keywords whose GET responses are cached
+CACHEABLE = (
+    'notebooks', 'notebook', 'notes', 'note', 'versions', 'version',
+    'attachments', 'attachment', 'tags', 'tag', 'tagged', 'search',
+    'i18n', 'i18nkey')
+# keywords not bound to a notebook, which may change with any note
+GLOBAL = ('notebooks', 'tags', 'tag', 'tagged', 'search')
+# keywords whose first id is a notebook id
+NOTEBOOK_SCOPED = (
+    'notebook', 'notes', 'note', 'move', 'versions', 'version',
+    'attachments', 'attachment', 'attachment_raw')
+
+
+def cache_key(keyword, ids):
+    """Returns the cache key of a request.
+
+    :type keyword: str
+    :type ids: tuple
+    :rtype: tuple
+    """
+    return (keyword, tuple(str(ident) for ident in ids))
+
+
+def affected_notebooks(keyword, ids):
+    """Returns the ids of the notebooks changed by a modifying request.
+
+    :type keyword: str
+    :type ids: tuple
+    :rtype: set
+    """
+    if keyword not in NOTEBOOK_SCOPED or not ids:
+        return set()
+    notebooks = {str(ids[0])}
+    if keyword == 'move' and len(ids) > 2:
+        notebooks.add(str(ids[2]))
+    return notebooks
+
+
+class CacheEntry:
+    """Class representing a cached response."""
+    def __init__(self, value, size, etag=None, last_modified=None):
+        """Initializes a cache entry.
+
+        :param value: parsed response
+        :param int size: size of the response body in bytes
+        :type etag: str
+        :type last_modified: str
+        """
+        self.value = value
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time()
+
+    def validators(self):
+        """Returns headers for a conditional request.
+
+        :rtype: dict
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """LRU cache of parsed GET responses with a time to live.
+
+    Entries older than ttl are revalidated with the server through
+    ETag/Last-Modified if possible, otherwise fetched again.
+    Cached values are shared between callers and must not be modified.
+    """
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL):
+        """Initializes the cache.
+
+        :param int maxsize: maximum number of entries
+        :param float ttl: seconds an entry is used without revalidation
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            ('hits', 'misses', 'revalidations', 'evictions',
+             'invalidations', 'bytes_served'), 0)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, key):
+        """Returns the entry for key or None.
+
+        Counts a hit if the entry is fresh, a miss otherwise.
+        :type key: tuple
+        :rtype: CacheEntry or None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            if self.is_fresh(entry):
+                self.counters['hits'] += 1
+                self.counters['bytes_served'] += entry.size
+            elif not entry.etag and not entry.last_modified:
+                del self.entries[key]
+                self.counters['misses'] += 1
+                return None
+            else:
+                self.counters['misses'] += 1
+            return entry
+
+    def is_fresh(self, entry):
+        """Returns true if entry may be used without revalidation.
+
+        :type entry: CacheEntry
+        :rtype: bool
+        """
+        return time.time() - entry.stored_at < self.ttl
+
+    def store(self, key, value, size, etag=None, last_modified=None):
+        """Stores a response, evicting the least recently used entries.
+
+        :type key: tuple
+        :type size: int
+        :type etag: str
+        :type last_modified: str
+        """
+        with self.lock:
+            self.entries[key] = CacheEntry(value, size, etag, last_modified)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def revalidated(self, key, entry):
+        """Marks entry as confirmed by the server and returns its value.
+
+        :type key: tuple
+        :type entry: CacheEntry
+        """
+        with self.lock:
+            entry.stored_at = time.time()
+            if self.entries.get(key) is not entry:
+                self.entries[key] = entry
+            self.counters['revalidations'] += 1
+            self.counters['bytes_served'] += entry.size
+        return entry.value
+
+    def invalidate(self, keyword, ids):
+        """Drops all entries affected by a modifying request.
+
+        :type keyword: str
+        :type ids: tuple
+        """
+        notebooks = affected_notebooks(keyword, ids)
+        with self.lock:
+            for key in list(self.entries):
+                cached_keyword, cached_ids = key
+                if cached_keyword in GLOBAL or (
+                        cached_keyword in NOTEBOOK_SCOPED and
+                        cached_ids[0] in notebooks):
+                    del self.entries[key]
+                    self.counters['invalidations'] += 1
+        LOGGER.info('Invalidated cache for {} {}'.format(keyword, ids))
+
+    def clear(self):
+        """Drops all entries."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Returns the cache counters.
+
+        hits, misses: lookups answered from cache or not
+        revalidations: stale entries confirmed by a 304 response
+        evictions: entries dropped because of maxsize
+        invalidations: entries dropped because of modifying requests
+        bytes_served: response bytes answered from cache
+        bytes_stored: response bytes currently held in the cache
+        entries: current number of entries
+        :rtype: dict
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['bytes_stored'] = sum(
+                entry.size for entry in self.entries.values())
+            stats['entries'] = len(self.entries)
+        return stats
@@ -1,6 +1,6 @@
 """Terminal client for paperwork.py"""
 
-from . import models
+from . import models, store, tracing
 from .utils import fuzzy_find
 import os
 import sys
@@ -8,9 +8,6 @@ import logging
 import argparse
 import tempfile
 
-if str(sys.version[0]) < '3':
-    input = raw_input
-
 LOGGER = logging.getLogger(__name__)
 
 PW = models.Paperwork(input('Host: '))
@@ -18,13 +15,53 @@ if not PW.authenticated:
     print('User/password not valid or host not reachable.')
     sys.exit()
 
+# background sync of a warm start, see download
+RECONCILING = None
+
 SEP_NOTE_ATTACH = ' to '
 SEP_NOTE_NB = ' in '
+TRACE_EXPORTERS = {
+    'jsonl': tracing.JSONLinesExporter,
+    'chrome': tracing.ChromeTraceExporter
+    }
 
 
-def download():
-    """Fills Paperwork instance with information from server."""
-    PW.download()
+def download(path=None):
+    """Fills Paperwork instance with information from server.
+
+    If path is given the objects are loaded from the store in path and
+    synced in background if possible, otherwise downloaded and saved.
+    Commands wait for the background sync, see wait_for_sync.
+    :param str path: file of the store
+    """
+    global RECONCILING
+    if path is None:
+        PW.download()
+        return None
+    local = store.Store(path)
+    if PW.load(local):
+        RECONCILING = PW.reconcile(local)
+    else:
+        PW.download()
+        PW.save(local)
+    return local
+
+
+def wait_for_sync():
+    """Waits until the background sync started by download is done, it
+    modifies the notebooks and indexes the commands read."""
+    global RECONCILING
+    if RECONCILING is None:
+        return
+    try:
+        RECONCILING.result()
+    except Exception as error:
+        LOGGER.error('Syncing with the host failed: {}'.format(error))
+        print('Syncing with the host failed, working with stored notes.')
+    finally:
+        # reported here, not again by PW.wait
+        models.forget(RECONCILING)
+    RECONCILING = None
 
 
 def update():
@@ -209,7 +246,7 @@ def tagged(tag_title):
     """
     tag = fuzzy_find(tag_title, PW.tags)
     print('Notes tagged with {}'.format(tag.title))
-    for note in tag.notes:
+    for note in tag.get_notes():
         print(note.title)
 
 
@@ -273,27 +310,61 @@ def main():
         "-v", "--verbose", help="verbose output", action="store_true")
     parser.add_argument(
         "--threading", help="enable multi-threading", action="store_true")
+    parser.add_argument(
+        "--workers", help="maximum number of threads", type=int,
+        default=models.THREAD_WORKERS)
+    parser.add_argument(
+        "--store", help="keep notes in a local database for fast starts")
+    parser.add_argument(
+        "--trace", help="write tracing spans to file")
+    parser.add_argument(
+        "--trace-format", help="format of the trace file",
+        choices=sorted(TRACE_EXPORTERS), default='jsonl')
+    parser.add_argument(
+        "--slow-requests", help="log requests taking at least SECONDS",
+        type=float, metavar="SECONDS")
     args = parser.parse_args()
 
     if args.verbose:
         logging.basicConfig(level=logging.INFO)
     if args.threading:
-        models.use_threading = True
-
-    download()
-
-    cmd = input('>')
-    while cmd != 'exit':
-        LOGGER.info(cmd)
-        cmd, args = split(cmd, ' ')
-        if cmd and cmd in CMD_DICT:
-            CMD_DICT[cmd](args)
-        elif args in CMD_DICT:
-            CMD_DICT[args]()
-        else:
-            LOGGER.info('Invalid command')
-            print('{} {} unknown'.format(cmd, args))
+        models.USE_THREADING = True
+        models.set_workers(args.workers)
+    if args.trace:
+        tracing.add_exporter(TRACE_EXPORTERS[args.trace_format](args.trace))
+    if args.slow_requests is not None:
+        PW.api.log_slow_requests(args.slow_requests)
+
+    with tracing.span('cli.download'):
+        local = download(args.store)
+
+    try:
         cmd = input('>')
+        while cmd != 'exit':
+            LOGGER.info(cmd)
+            cmd, args = split(cmd, ' ')
+            wait_for_sync()
+            if cmd and cmd in CMD_DICT:
+                with tracing.span('cli.' + cmd, args=args):
+                    CMD_DICT[cmd](args)
+            elif args in CMD_DICT:
+                with tracing.span('cli.' + args):
+                    CMD_DICT[args]()
+            else:
+                LOGGER.info('Invalid command')
+                print('{} {} unknown'.format(cmd, args))
+            cmd = input('>')
+        PW.wait()
+    finally:
+        wait_for_sync()
+        try:
+            if local is not None:
+                try:
+                    PW.save(local)
+                finally:
+                    local.close()
+        finally:
+            tracing.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+"""JSON codecs for the paperwork api-wrapper.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+class JSONCodec:
+    """Codec using the json module of the standard library.
+
+    Codecs encode request bodies to bytes and decode response bodies
+    directly from bytes.
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        """Encodes obj.
+
+        :rtype: bytes
+        """
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """Decodes data.
+
+        :type data: bytes or str
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec using orjson."""
+    name = 'orjson'
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """Codec using ujson."""
+    name = 'ujson'
+
+    def dumps(self, obj):
+        return ujson.dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+def default_codec():
+    """Returns the fastest installed codec.
+
+    :rtype: JSONCodec
+    """
+    if orjson is not None:
+        return OrjsonCodec()
+    if ujson is not None:
+        return UjsonCodec()
+    return JSONCodec()
+
+
+CODECS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec
+    }
+
+
+def get_codec(name):
+    """Returns codec by name, falls back to the standard library if the
+    library is not installed.
+
+    :param str name: json, orjson or ujson
+    :rtype: JSONCodec
+    """
+    if (name == 'orjson' and orjson is None) or \
+            (name == 'ujson' and ujson is None):
+        LOGGER.error('{} is not installed, using json'.format(name))
+        return JSONCodec()
+    return CODECS[name]()
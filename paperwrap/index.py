@@ -0,0 +1,240 @@
+"""Indexes for fast lookups of paperwork-objects.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+import threading
+from .utils import basestring, invalidate_fuzzy
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ModelIndex:
+    """Index of models by ident and by title.
+
+    Notes and notebooks are reindexed when their title is assigned,
+    other models have to be added again after a title change. Title
+    lookups verify the candidates, so items with a changed title are not
+    found by their old one. Every change drops the fuzzy indexes of
+    utils, which cannot tell which collections hold the item.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.by_id = {}
+        self.by_title = {}
+        # title of each item at the time it was indexed
+        self.titles = {}
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, ident):
+        return ident in self.by_id
+
+    def add(self, item):
+        """Adds or reindexes item.
+
+        :type item: models.Model
+        """
+        with self.lock:
+            if item.ident in self.by_id:
+                self.remove(item)
+            self.by_id[item.ident] = item
+            self.titles[item.ident] = item.title
+            self.by_title.setdefault(item.title, []).append(item)
+        invalidate_fuzzy()
+
+    def reindex(self, item):
+        """Reindexes item if it is indexed, e.g. after its title changed.
+
+        :type item: models.Model
+        """
+        with self.lock:
+            if self.by_id.get(item.ident) is item:
+                self.add(item)
+
+    def remove(self, item):
+        """Removes the item with the ident of item if it is indexed.
+
+        :type item: models.Model
+        """
+        with self.lock:
+            indexed = self.by_id.pop(item.ident, None)
+            if indexed is None:
+                return
+            title = self.titles.pop(item.ident)
+            items = self.by_title[title]
+            items.remove(indexed)
+            if not items:
+                del self.by_title[title]
+        invalidate_fuzzy()
+
+    def clear(self):
+        """Removes all items."""
+        with self.lock:
+            self.by_id.clear()
+            self.by_title.clear()
+            self.titles.clear()
+        invalidate_fuzzy()
+
+    def get(self, ident):
+        """Returns item with ident or None.
+
+        :rtype: models.Model or None
+        """
+        return self.by_id.get(ident)
+
+    def get_title(self, title):
+        """Returns an indexed item whose current title is title or None.
+
+        :type title: str
+        :rtype: models.Model or None
+        """
+        with self.lock:
+            for item in self.by_title.get(title, ()):
+                if item.title == title:
+                    return item
+        return None
+
+    def find(self, key):
+        """Finds item by ident or title.
+
+        :type key: str or int
+        :rtype: models.Model or None
+        """
+        if isinstance(key, basestring):
+            return self.get_title(key)
+        return self.get(key)
+
+
+class TagIndex:
+    """Bidirectional index between tags and notes.
+
+    Every indexed note gets a slot number, the notes of a tag are kept
+    as an integer bitmap over the slots, so set queries over many notes
+    are a few big integer operations. Tag.notes is kept up to date as
+    well.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        # note ident -> slot
+        self.slots = {}
+        # slot -> note, None for free slots
+        self.notes = []
+        self.free = []
+        # tag ident -> bitmap of its notes
+        self.bitmaps = {}
+        # note ident -> tags the note is indexed with
+        self.tags = {}
+        # bitmap of all indexed notes
+        self.all = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, note):
+        """Adds note or updates the index to the current tags of note.
+
+        :type note: models.Note
+        """
+        with self.lock:
+            slot = self.slots.get(note.ident)
+            if slot is None:
+                if self.free:
+                    slot = self.free.pop()
+                else:
+                    slot = len(self.notes)
+                    self.notes.append(None)
+                self.slots[note.ident] = slot
+                self.all |= 1 << slot
+            self.notes[slot] = note
+            bit = 1 << slot
+            old = self.tags.get(note.ident, frozenset())
+            new = frozenset(note.tags)
+            for tag in old - new:
+                self.bitmaps[tag.ident] &= ~bit
+                tag.notes.discard(note)
+            for tag in new - old:
+                self.bitmaps[tag.ident] = self.bitmaps.get(tag.ident, 0) | bit
+                tag.notes.add(note)
+            self.tags[note.ident] = new
+
+    def remove(self, note):
+        """Removes note if it is indexed.
+
+        :type note: models.Note
+        """
+        with self.lock:
+            slot = self.slots.pop(note.ident, None)
+            if slot is None:
+                return
+            bit = 1 << slot
+            for tag in self.tags.pop(note.ident):
+                self.bitmaps[tag.ident] &= ~bit
+                tag.notes.discard(self.notes[slot])
+            self.notes[slot] = None
+            self.free.append(slot)
+            self.all &= ~bit
+
+    def clear(self):
+        """Removes all notes."""
+        with self.lock:
+            for tags in self.tags.values():
+                for tag in tags:
+                    tag.notes.clear()
+            self.slots.clear()
+            self.tags.clear()
+            self.bitmaps.clear()
+            del self.notes[:]
+            del self.free[:]
+            self.all = 0
+
+    def bitmap(self, tag):
+        """Returns the bitmap of the notes of tag.
+
+        :param tag: tag or its ident
+        :type tag: models.Tag or int
+        :rtype: int
+        """
+        return self.bitmaps.get(getattr(tag, 'ident', tag), 0)
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Returns the bitmap of the notes which have all tags of all_of,
+        at least one of any_of and none of none_of.
+
+        Without all_of and any_of all notes are candidates.
+        :param list all_of: tags or idents
+        :param list any_of: tags or idents
+        :param list none_of: tags or idents
+        :rtype: int
+        """
+        with self.lock:
+            bits = self.all
+            for tag in all_of:
+                bits &= self.bitmap(tag)
+            if any_of:
+                union = 0
+                for tag in any_of:
+                    union |= self.bitmap(tag)
+                bits &= union
+            for tag in none_of:
+                bits &= ~self.bitmap(tag)
+        return bits
+
+    def members(self, bits):
+        """Returns the notes of a bitmap in slot order.
+
+        :type bits: int
+        :rtype: list
+        """
+        # reversed binary representation, index i is the bit of slot i
+        digits = bin(bits)[:1:-1]
+        notes = []
+        with self.lock:
+            slot = digits.find('1')
+            while slot != -1:
+                notes.append(self.notes[slot])
+                slot = digits.find('1', slot + 1)
+        return notes
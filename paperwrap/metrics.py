@@ -0,0 +1,301 @@
+"""Per endpoint request metrics of the api-wrapper.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+LOGGER = logging.getLogger(__name__)
+
+# upper bounds in seconds of the latency buckets
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0,
+    7.5, 10.0, 30.0, 60.0, float('inf'))
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = 'paperwrap'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Counts observations in buckets with fixed upper bounds.
+
+    Quantiles are estimated by interpolating linearly inside the bucket
+    holding the quantile, like Prometheus' histogram_quantile.
+    """
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """Creates an empty histogram.
+
+        :param tuple bounds: ascending upper bounds, the last one should
+            be infinite
+        """
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Adds value.
+
+        :type value: float
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Returns (upper bound, observations up to bound) pairs.
+
+        :rtype: list
+        """
+        pairs = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """Returns the estimated q-quantile or None without observations.
+
+        Values in the infinite bucket are estimated as the largest finite
+        bound.
+        :param float q: between 0 and 1
+        :rtype: float or None
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = previous = 0
+        for bound, total in self.cumulative():
+            if total >= rank and total > previous:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (
+                    (rank - previous) / (total - previous))
+            lower, previous = bound, total
+        return lower
+
+
+class Endpoint:
+    """Metrics of the requests to one API_PATH keyword with one method."""
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram()
+
+    def snapshot(self):
+        """Returns the metrics as dict.
+
+        :rtype: dict
+        """
+        snapshot = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'latency_sum': self.latency.sum
+            }
+        for q in QUANTILES:
+            snapshot['p{:g}'.format(q * 100)] = self.latency.quantile(q)
+        return snapshot
+
+
+class Measurement:
+    """Measures one request, see Registry.measure.
+
+    status, request_bytes and response_bytes are set by the caller. The
+    request counts as error if it raised or status is 400 or higher.
+    """
+    __slots__ = ('registry', 'endpoint', 'started', 'status',
+                 'request_bytes', 'response_bytes')
+
+    def __init__(self, registry, endpoint):
+        self.registry = registry
+        self.endpoint = endpoint
+        self.started = None
+        self.status = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def __enter__(self):
+        with self.registry.lock:
+            self.endpoint.in_flight += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.started
+        endpoint = self.endpoint
+        with self.registry.lock:
+            endpoint.in_flight -= 1
+            endpoint.requests += 1
+            if exc_type is not None or (
+                    self.status is not None and self.status >= 400):
+                endpoint.errors += 1
+            endpoint.request_bytes += self.request_bytes
+            endpoint.response_bytes += self.response_bytes
+            endpoint.latency.observe(elapsed)
+        return False
+
+
+class Registry:
+    """Request metrics by API_PATH keyword and HTTP method.
+
+    The registry is shared by all threads using an api instance.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (keyword, method) -> Endpoint
+        self.endpoints = {}
+
+    def measure(self, keyword, method):
+        """Returns a context manager measuring one request.
+
+        :type keyword: str
+        :type method: str
+        :rtype: Measurement
+        """
+        key = (keyword, method)
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            with self.lock:
+                endpoint = self.endpoints.setdefault(key, Endpoint())
+        return Measurement(self, endpoint)
+
+    def reset(self):
+        """Forgets all recorded requests."""
+        with self.lock:
+            self.endpoints.clear()
+
+    def snapshot(self):
+        """Returns the metrics of every endpoint by (keyword, method).
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                key: endpoint.snapshot()
+                for key, endpoint in sorted(self.endpoints.items())}
+
+    def prometheus(self):
+        """Returns the metrics in the Prometheus text format.
+
+        :rtype: str
+        """
+        with self.lock:
+            endpoints = [
+                (labels(keyword, method), endpoint.requests,
+                 endpoint.errors, endpoint.in_flight,
+                 endpoint.request_bytes, endpoint.response_bytes,
+                 endpoint.latency.cumulative(), endpoint.latency.sum,
+                 endpoint.latency.count)
+                for (keyword, method), endpoint in sorted(
+                    self.endpoints.items())]
+        lines = []
+
+        def metric(name, kind, description, index):
+            lines.append('# HELP {}_{} {}'.format(PREFIX, name, description))
+            lines.append('# TYPE {}_{} {}'.format(PREFIX, name, kind))
+            for values in endpoints:
+                lines.append('{}_{}{{{}}} {}'.format(
+                    PREFIX, name, values[0], values[index]))
+
+        metric('requests_total', 'counter', 'Requests sent.', 1)
+        metric('request_errors_total', 'counter',
+               'Requests which raised or returned status 400 or higher.', 2)
+        metric('requests_in_flight', 'gauge',
+               'Requests waiting for a response.', 3)
+        metric('request_bytes_total', 'counter', 'Bytes of request bodies.', 4)
+        metric('response_bytes_total', 'counter',
+               'Bytes of response bodies.', 5)
+
+        name = '{}_request_duration_seconds'.format(PREFIX)
+        lines.append('# HELP {} Duration of requests.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for values in endpoints:
+            for bound, total in values[6]:
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    name, values[0],
+                    '+Inf' if bound == float('inf') else repr(bound), total))
+            lines.append('{}_sum{{{}}} {}'.format(
+                name, values[0], repr(values[7])))
+            lines.append('{}_count{{{}}} {}'.format(
+                name, values[0], values[8]))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Writes the metrics in the Prometheus text format to path.
+
+        The file is replaced atomically, so it can be read by the
+        textfile collector of node_exporter at any time.
+        :type path: str
+        """
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.prometheus())
+        os.replace(path + '.tmp', path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serves the metrics in the Prometheus text format on
+        http://host:port/metrics from a daemon thread.
+
+        Returns the server, its shutdown method stops serving.
+        :type port: int
+        :type host: str
+        :rtype: MetricsServer
+        """
+        server = MetricsServer((host, port), MetricsHandler)
+        server.registry = self
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        LOGGER.info('Serving metrics on {}:{}'.format(
+            host, server.server_port))
+        return server
+
+
+def labels(keyword, method):
+    """Returns the Prometheus labels of an endpoint.
+
+    :type keyword: str
+    :type method: str
+    :rtype: str
+    """
+    return 'keyword="{}",method="{}"'.format(keyword, method)
+
+
+class MetricsServer(ThreadingMixIn, HTTPServer):
+    """HTTP server of a registry."""
+    daemon_threads = True
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Answers GET /metrics with the metrics of the server's registry."""
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOGGER.info(format % args)
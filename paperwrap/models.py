@@ -1,43 +1,258 @@
 """Models representing objects in paperwork."""
-from . import wrapper
-from .utils import find
+from . import wrapper, asyncwrapper, tracing, unitofwork, utils
+from .batching import DEFAULT_MAX_SIZE, by_position
+from .index import ModelIndex, TagIndex
+from .search import SearchIndex
+import asyncio
 import logging
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor, wait as futures_wait
+from functools import wraps
+from threading import Lock, local
 
 LOGGER = logging.getLogger(__name__)
 
 USE_THREADING = False
+# maximum number of threads running threaded methods
+THREAD_WORKERS = 8
+# notes per request when fetching versions in bulk
+VERSIONS_CHUNK_SIZE = 50
+# parallel requests when downloading the notes of all notebooks
+DOWNLOAD_WORKERS = 8
+# parallel requests when fetching attachment listings in bulk
+ATTACHMENT_WORKERS = 8
+# keys of the change summary returned by Paperwork.sync
+SYNC_CHANGES = (
+    'created_tags', 'updated_tags', 'deleted_tags',
+    'created_notebooks', 'updated_notebooks', 'deleted_notebooks',
+    'created_notes', 'updated_notes', 'moved_notes', 'deleted_notes',
+    'conflicted_notebooks', 'conflicted_notes')
+# shared by all models without local changes, an empty frozenset per
+# instance would more than double the size of a version
+CLEAN = frozenset()
+
+EXECUTOR = None
+# futures of submitted threaded calls, which are not done yet
+PENDING = set()
+# futures of failed threaded calls, which were not reported by wait yet
+FAILED = []
+PENDING_LOCK = Lock()
+# marks threads of the executor
+WORKER = local()
+
+
+def get_executor():
+    """Returns the executor running threaded methods, creates it with
+    THREAD_WORKERS threads on first use.
+
+    :rtype: ThreadPoolExecutor
+    """
+    global EXECUTOR
+    with PENDING_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = ThreadPoolExecutor(
+                THREAD_WORKERS, thread_name_prefix='paperwrap')
+        return EXECUTOR
+
+
+def set_workers(workers):
+    """Sets the maximum number of threads running threaded methods.
+
+    Calls already submitted are finished by the previous executor.
+    :type workers: int
+    """
+    global EXECUTOR, THREAD_WORKERS
+    with PENDING_LOCK:
+        THREAD_WORKERS = workers
+        executor, EXECUTOR = EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def failed(future):
+    """Returns true if future raised an exception.
+
+    :type future: Future
+    :rtype: bool
+    """
+    return not future.cancelled() and future.exception() is not None
+
+
+def finished(future):
+    """Forgets a finished future, keeps it for wait if it failed.
+
+    :type future: Future
+    """
+    with PENDING_LOCK:
+        if future not in PENDING:
+            # already collected by wait
+            return
+        PENDING.discard(future)
+        if failed(future):
+            FAILED.append(future)
+            LOGGER.error('Threaded call failed: {}'.format(
+                future.exception()))
+
+
+def wait(timeout=None):
+    """Waits for all submitted threaded calls and raises the exception of
+    the first call which failed since the last wait.
+
+    :param float timeout: seconds to wait, forever if None
+    :returns: true if all calls are done
+    :rtype: bool
+    """
+    with PENDING_LOCK:
+        futures = list(PENDING)
+    done, not_done = futures_wait(futures, timeout)
+    with PENDING_LOCK:
+        # done callbacks may run after waiters were woken up
+        errors = FAILED[:]
+        del FAILED[:]
+        for future in futures:
+            if future in done and future in PENDING:
+                PENDING.discard(future)
+                if failed(future):
+                    errors.append(future)
+    if errors:
+        raise errors[0].exception()
+    return not not_done
+
+
+def forget(future):
+    """Stops waiting for future in wait, for calls whose result or
+    exception was already read.
+
+    :type future: Future
+    """
+    with PENDING_LOCK:
+        PENDING.discard(future)
+        if future in FAILED:
+            FAILED.remove(future)
 
 
 def threaded_method(func):
     """Decorator to put a function into background after calling,
     if threading is enabled.
+
+    In background the call returns a Future, otherwise the result of the
+    function. Calls made from a background thread run inline, so
+    threaded methods calling each other cannot exhaust the executor.
     """
+    @wraps(func)
     def run(*args, **kwargs):
         """Runs the function in background, if USE_THREADING is true."""
-        if USE_THREADING:
-            Thread(target=func, args=args, kwargs=kwargs).start()
-        else:
-            func(*args, **kwargs)
+        if not USE_THREADING or getattr(WORKER, 'active', False):
+            return func(*args, **kwargs)
+        return submit(func, *args, **kwargs)
     return run
 
 
+def submit(func, *args, **kwargs):
+    """Runs func in background, regardless of USE_THREADING.
+
+    The call is waited for by wait like threaded methods and traced as
+    child of the current span.
+    :type func: callable
+    :rtype: Future
+    """
+    future = get_executor().submit(
+        in_worker, tracing.bind(func), *args, **kwargs)
+    with PENDING_LOCK:
+        PENDING.add(future)
+    future.add_done_callback(finished)
+    return future
+
+
+def in_worker(func, *args, **kwargs):
+    """Runs func, marking the current thread as a worker.
+
+    :type func: callable
+    """
+    WORKER.active = True
+    try:
+        return func(*args, **kwargs)
+    finally:
+        WORKER.active = False
+
+
+class Tracked:
+    """Descriptor wrapping the slot of a tracked attribute, records
+    changes in the dirty set of the model. Only assignments are seen,
+    mutable values have to be replaced instead of changed in place.
+
+    Only tracked attributes pay for the check, all other slots are
+    accessed directly.
+    """
+    def __init__(self, name, slot):
+        """Initializes the descriptor.
+
+        :param str name: name of the attribute
+        :param slot: member descriptor of the slot
+        """
+        self.name = name
+        self.slot = slot
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return self.slot.__get__(obj, owner)
+
+    def __set__(self, obj, value):
+        # dirty is None while the model is initialized
+        changed = obj.dirty is not None and self.slot.__get__(obj) != value
+        self.slot.__set__(obj, value)
+        if changed:
+            obj.mark_dirty(self.name)
+
+
 class Model:
-    """General class for paperwork-objects."""
-    def __init__(self, title, ident, api):
+    """General class for paperwork-objects.
+
+    Models use __slots__ to keep the per-instance overhead low. Only
+    notebooks and tags hold a reference to the api, all other models
+    reach it through the notebook or note they belong to.
+
+    Changes to the attributes listed in TRACKED are recorded in dirty,
+    which is empty after initialization and after each update. Models
+    with tracked attributes call mark_clean at the end of __init__.
+    """
+    __slots__ = ('ident', 'title', 'dirty')
+    TRACKED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.TRACKED:
+            slot = getattr(cls, name)
+            if isinstance(slot, Tracked):
+                slot = slot.slot
+            setattr(cls, name, Tracked(name, slot))
+
+    def __init__(self, title, ident):
         """Initializes paperwork-objects.
 
         :type title: str
         :type ident: integer
-        :type api: wrapper.api
         """
+        self.dirty = None if self.TRACKED else CLEAN
         self.ident = ident
         self.title = title
-        self.api = api
 
     def __str__(self):
         return "{}:'{}'".format(self.ident, self.title)
 
+    def mark_dirty(self, name):
+        """Records a local change of attribute name.
+
+        :type name: str
+        """
+        self.dirty = self.dirty | {name}
+        if name == 'title':
+            utils.invalidate_fuzzy()
+
+    def mark_clean(self):
+        """Forgets local changes, e.g. after they have been pushed."""
+        self.dirty = CLEAN
+
     def to_json(self):
         """Returns model as dict."""
         return {
@@ -49,16 +264,20 @@ class Model:
     def from_json(cls, api, json):
         """Creates model from json-dict.
 
+        Plain models do not hold the api, it is accepted for the same
+        signature as Notebook.from_json and Tag.from_json.
         :param dict json: dictionary of json data
         """
         return cls(
             json['title'],
-            json['id'],
-            api)
+            json['id'])
 
 
 class Notebook(Model):
     """Class representing a notebook."""
+    __slots__ = ('api', 'paperwork', 'nb_type', 'updated_at', 'notes')
+    TRACKED = ('title', 'nb_type')
+
     def __init__(self, title, ident, api, nb_type=0, updated_at=''):
         """Initializes a notebook object.
 
@@ -67,10 +286,23 @@ class Notebook(Model):
         :type api: wrapper.api
         :type updated_at: str
         """
-        super().__init__(title, ident, api)
+        super().__init__(title, ident)
+        self.api = api
         self.nb_type = nb_type
         self.updated_at = updated_at
         self.notes = {}
+        self.paperwork = None
+        self.mark_clean()
+
+    def mark_dirty(self, name):
+        """Records a local change and reindexes the notebook if its title
+        changed.
+
+        :type name: str
+        """
+        super().mark_dirty(name)
+        if name == 'title' and self.paperwork is not None:
+            self.paperwork.notebook_index.reindex(self)
 
     def to_json(self):
         """Returns notebook as dict."""
@@ -92,7 +324,7 @@ class Notebook(Model):
             json['id'],
             api,
             nb_type=json['type'],
-            updated_at='')
+            updated_at=json.get('updated_at', ''))
 
     @classmethod
     def create(cls, api, title):
@@ -114,22 +346,55 @@ class Notebook(Model):
     def update(self, force=True):
         """Updates local or remote notebook, depending on timestamp.
 
+        Returns true if the local notebook was pushed.
         :param bool force: If true the local title is pushed,
                            regardless of timestamp.
+        :rtype: bool
         """
         LOGGER.info('Updating {}'.format(self))
         remote = self.api.get_notebook(self.ident)
         if remote is None:
             LOGGER.error('Remote notebook could not be found.'
                          'Wrong ident or deleted.')
+            return False
         elif force or remote['updated_at'] < self.updated_at:
             self.updated_at = self.api.update_notebook(
                 self.to_json())['updated_at']
+            self.mark_clean()
+            return True
         else:
             LOGGER.info('Remote version is higher.'
                         'Updating local notebook.')
             self.title = remote['title']
             self.updated_at = remote['updated_at']
+            self.mark_clean()
+            return False
+
+    async def update_async(self, api, force=True):
+        """Coroutine version of update.
+
+        :type api: asyncwrapper.AsyncAPI
+        :param bool force: If true the local title is pushed,
+                           regardless of timestamp.
+        """
+        LOGGER.info('Updating {}'.format(self))
+        remote = await api.get_notebook(self.ident)
+        if remote is None:
+            LOGGER.error('Remote notebook could not be found.'
+                         'Wrong ident or deleted.')
+            return False
+        elif force or remote['updated_at'] < self.updated_at:
+            self.updated_at = (await api.update_notebook(
+                self.to_json()))['updated_at']
+            self.mark_clean()
+            return True
+        else:
+            LOGGER.info('Remote version is higher.'
+                        'Updating local notebook.')
+            self.title = remote['title']
+            self.updated_at = remote['updated_at']
+            self.mark_clean()
+            return False
 
     def get_notes(self):
         """Returns notes in an alphabetically sorted list.
@@ -144,7 +409,7 @@ class Notebook(Model):
         :type title: str
         """
         note = Note.create(title, self)
-        self.notes[note.ident] = note
+        self.index_note(note)
         LOGGER.info('Created note {} in {}'.format(note, self))
 
     @threaded_method
@@ -152,26 +417,145 @@ class Notebook(Model):
         """Adds a note to the notebook.
 
         :type note: models.Note"""
-        self.notes[note.ident] = note
+        self.index_note(note)
         LOGGER.info('Added note {} to {}'.format(note, self))
 
-    def download(self, tags):
+    def index_note(self, note):
+        """Adds note to notes and to the indexes of the paperwork instance.
+
+        :type note: models.Note"""
+        note.notebook = self
+        self.notes[note.ident] = note
+        utils.invalidate_fuzzy(self.notes)
+        if self.paperwork is not None:
+            self.paperwork.note_index.add(note)
+            self.paperwork.search_index.add(note)
+            self.paperwork.tagged_index.add(note)
+
+    def unindex_note(self, note):
+        """Removes note from notes and the indexes of the paperwork
+        instance.
+
+        :type note: models.Note"""
+        self.notes.pop(note.ident, None)
+        utils.invalidate_fuzzy(self.notes)
+        if self.paperwork is not None:
+            self.paperwork.note_index.remove(note)
+            self.paperwork.search_index.remove(note)
+            self.paperwork.tagged_index.remove(note)
+
+    def download(self, tags, bulk=False):
         """Downloads notes.
 
+        Versions and attachments of the notes are loaded on first access.
+        :param dict tags: Tags of the paperwork instance.
+        :param bool bulk: If true versions and attachments are prefetched
+            with download_bulk.
+        """
+        with tracing.span('Notebook.download', notebook=self.ident):
+            for note in self.fetch_notes(tags):
+                self.index_note(note)
+            if bulk:
+                self.prefetch()
+
+    def fetch_notes(self, tags):
+        """Downloads and returns the notes of the notebook without adding
+        them to it.
+
+        :param dict tags: Tags of the paperwork instance.
+        :rtype: list
+        """
+        with tracing.span('Notebook.fetch_notes', notebook=self.ident) \
+                as span, self.api.building():
+            notes_json = self.api.list_notebook_notes(self.ident)
+            LOGGER.info('Downloading notes of notebook {}'.format(self))
+            notes = []
+            for note_json in notes_json:
+                note = Note.from_json(self, note_json)
+                note.tags.update(
+                    tags[tag['id']] for tag in note_json['tags'])
+                notes.append(note)
+            span.set(notes=len(notes))
+        return notes
+
+    def prefetch(self):
+        """Fetches versions and attachments of all notes, which have not
+        been loaded yet, in bulk."""
+        self.download_bulk([
+            note for note in self.notes.values() if not note.loaded])
+
+    def download_bulk(self, notes, chunk_size=VERSIONS_CHUNK_SIZE,
+                      workers=ATTACHMENT_WORKERS):
+        """Fetches versions and attachments of notes.
+
+        Versions are fetched through the multi-id versions endpoint with
+        chunk_size notes per request, attachment listings are fetched
+        by workers parallel requests.
+        :type notes: list
+        :type chunk_size: int
+        :type workers: int
+        """
+        if not notes:
+            return
+        LOGGER.info('Downloading versions and attachments of {} notes'
+                    ' in notebook {}'.format(len(notes), self))
+        notes_json = [note.to_json() for note in notes]
+        versions = {}
+        with ThreadPoolExecutor(workers) as executor:
+            attachments = executor.map(
+                self.api.list_note_attachments, notes_json)
+            for i in range(0, len(notes_json), chunk_size):
+                chunk = notes_json[i:i + chunk_size]
+                versions.update(by_position(
+                    [str(note['id']) for note in chunk],
+                    self.api.list_notes_versions(chunk)))
+            for note, note_attachments in zip(notes, attachments):
+                # notes missing from a failed or unmappable response are
+                # left unloaded and fetched again on access
+                note_versions = versions.get(str(note.ident))
+                if note_versions is not None:
+                    note.versions = [
+                        Version.from_json(note, version)
+                        for version in note_versions]
+                if note_attachments is not None:
+                    note.attachments = [
+                        Attachment.from_json(note, attachment)
+                        for attachment in note_attachments]
+        unloaded = sum(not note.loaded for note in notes)
+        if unloaded:
+            LOGGER.error('Could not fetch versions or attachments of {} notes'
+                         ' in notebook {}'.format(unloaded, self))
+
+    async def download_async(self, api, tags):
+        """Coroutine version of download, fetches the versions and
+        attachments of all notes concurrently.
+
+        :type api: asyncwrapper.AsyncAPI
         :param dict tags: Tags of the paperwork instance.
         """
-        notes_json = self.api.list_notebook_notes(self.ident)
+        notes_json = await api.list_notebook_notes(self.ident)
         LOGGER.info('Downloading notes of notebook {}'.format(self))
+        notes = []
         for note_json in notes_json:
             note = Note.from_json(self, note_json)
-            self.add_note(note)
-            note.add_tags([tags[tag['id']] for tag in note_json['tags']])
-            note.list_versions()
-            note.list_attachments()
+            note.tags.update(tags[tag['id']] for tag in note_json['tags'])
+            self.index_note(note)
+            notes.append(note)
+        await asyncio.gather(*[note.download_async(api) for note in notes])
 
 
 class Note(Model):
-    """Class representing a note object."""
+    """Class representing a note object.
+
+    Tracked attributes are only recorded as changed when they are
+    assigned, tags must be changed with add_tags and remove_tags or by
+    assigning a new set, changes made in place are not pushed.
+    """
+    __slots__ = (
+        'notebook', 'content', 'updated_at', 'tags', '_versions',
+        '_attachments')
+    TRACKED = ('title', 'content', 'tags')
+
     def __init__(self, title, ident, notebook, content='', updated_at=''):
         """Initializes a note object.
 
@@ -181,13 +565,82 @@ class Note(Model):
         :type content: str
         :type updated_at: str
         """
-        super().__init__(title, ident, notebook.api)
+        super().__init__(title, ident)
         self.notebook = notebook
         self.content = content
         self.updated_at = updated_at
         self.tags = set()
-        self.versions = []
-        self.attachments = []
+        self._versions = None
+        self._attachments = None
+        self.mark_clean()
+
+    def mark_dirty(self, name):
+        """Records a local change and updates the tag index or queues the
+        note to be reindexed by the search index, a changed title is
+        reindexed right away.
+
+        :type name: str
+        """
+        super().mark_dirty(name)
+        if self.notebook is None or self.notebook.paperwork is None:
+            return
+        if name == 'tags':
+            self.notebook.paperwork.tagged_index.add(self)
+        else:
+            self.notebook.paperwork.search_index.add(self)
+            if name == 'title':
+                self.notebook.paperwork.note_index.reindex(self)
+
+    @property
+    def api(self):
+        """Api of the notebook.
+
+        :rtype: wrapper.API
+        """
+        return self.notebook.api
+
+    @property
+    def versions(self):
+        """Versions of the note, fetched on first access.
+
+        :rtype: list
+        """
+        if self._versions is None:
+            return self.list_versions()
+        return self._versions
+
+    @versions.setter
+    def versions(self, versions):
+        self._versions = versions
+
+    @property
+    def attachments(self):
+        """Attachments of the note, fetched on first access.
+
+        :rtype: list
+        """
+        if self._attachments is None:
+            return self.list_attachments()
+        return self._attachments
+
+    @attachments.setter
+    def attachments(self, attachments):
+        self._attachments = attachments
+
+    @property
+    def loaded(self):
+        """True if versions and attachments have been fetched.
+
+        :rtype: bool
+        """
+        return self._versions is not None and self._attachments is not None
+
+    def prefetch(self):
+        """Fetches versions and attachments unless already loaded."""
+        if self._versions is None:
+            self.list_versions()
+        if self._attachments is None:
+            self.list_attachments()
 
     def to_json(self):
         """Returns note as dict."""
@@ -215,6 +668,22 @@ class Note(Model):
             json['updated_at']
             )
 
+    def update_from_json(self, json, tags):
+        """Replaces local values with the values of a remote note.
+
+        Versions and attachments are fetched again on next access.
+        :type json: dict
+        :param dict tags: Tags of the paperwork instance.
+        """
+        self.title = json['title']
+        self.content = json['content']
+        self.updated_at = json['updated_at']
+        self.tags = {tags[tag['id']] for tag in json.get('tags', ())
+                     if tag['id'] in tags}
+        self._versions = None
+        self._attachments = None
+        self.mark_clean()
+
     @classmethod
     def create(cls, title, notebook):
         """Creates note in notebook.
@@ -236,32 +705,69 @@ class Note(Model):
     def update(self, force=False):
         """Updates local or remote note, depending on timestamp.
 
+        Returns true if the local note was pushed.
+        :param bool force: If true local values will be pushed regardless
+                           of timestamp.
+        :rtype: bool
+        """
+        LOGGER.info('Updating note {}'.format(self))
+        with tracing.span('Note.update', note=self.ident) as span:
+            remote = self.api.get_note(self.notebook.ident, self.ident)
+            if remote is None:
+                LOGGER.error('Remote note could not be found. Wrong ident,'
+                             'deleted or moved to another notebook')
+                return False
+            elif force or remote['updated_at'] <= self.updated_at:
+                LOGGER.info('Remote version is lower or force update.'
+                            'Updating remote note.')
+                self.updated_at = self.api.update_note(
+                    self.to_json())['updated_at']
+                self.mark_clean()
+                span.set(pushed=True)
+                return True
+            else:
+                LOGGER.info('Remote version is higher. Updating local note.')
+                self.title = remote['title']
+                self.content = remote['content']
+                self.updated_at = remote['updated_at']
+                self.mark_clean()
+                span.set(pushed=False)
+                return False
+
+    async def update_async(self, api, force=False):
+        """Coroutine version of update.
+
+        :type api: asyncwrapper.AsyncAPI
         :param bool force: If true local values will be pushed regardless
                            of timestamp.
         """
         LOGGER.info('Updating note {}'.format(self))
-        remote = self.api.get_note(self.notebook.ident, self.ident)
+        remote = await api.get_note(self.notebook.ident, self.ident)
         if remote is None:
             LOGGER.error('Remote note could not be found. Wrong ident,'
                          'deleted or moved to another notebook')
+            return False
         elif force or remote['updated_at'] <= self.updated_at:
             LOGGER.info('Remote version is lower or force update.'
                         'Updating remote note.')
-            self.updated_at = self.api.update_note(
-                self.to_json())['updated_at']
+            self.updated_at = (await api.update_note(
+                self.to_json()))['updated_at']
+            self.mark_clean()
+            return True
         else:
             LOGGER.info('Remote version is higher. Updating local note.')
             self.title = remote['title']
             self.content = remote['content']
             self.updated_at = remote['updated_at']
+            self.mark_clean()
+            return False
 
     @threaded_method
     def delete(self):
         """Deletes note from remote host and notebook."""
         LOGGER.info('Deleting note {} in notebook {}'.format(
             self, self.notebook))
-        if self.ident in self.notebook.notes:
-            del(self.notebook.notes[self.ident])
+        self.notebook.unindex_note(self)
         self.api.delete_note(self.to_json())
 
     @threaded_method
@@ -270,9 +776,21 @@ class Note(Model):
 
         :type tags: list or set
         """
+        tags = set(tags)
         for tag in tags:
             LOGGER.info('Adding tag {} to note {}'.format(tag, self))
-            self.tags.add(tag)
+        self.tags = self.tags | tags
+
+    @threaded_method
+    def remove_tags(self, tags):
+        """Removes a collection of tags from the note.
+
+        :type tags: list or set
+        """
+        tags = set(tags)
+        for tag in tags:
+            LOGGER.info('Removing tag {} from note {}'.format(tag, self))
+        self.tags = self.tags - tags
 
     @threaded_method
     def move_to(self, new_notebook):
@@ -281,42 +799,87 @@ class Note(Model):
         :type new_notebook: Notebook
         """
         self.api.move_note(self.to_json(), new_notebook.ident)
-        del(self.notebook.notes[self.ident])
-        new_notebook.add_note(self)
+        self.notebook.unindex_note(self)
+        new_notebook.index_note(self)
 
     def list_versions(self):
         """Lists versions of a note.
 
-        Also sets note.versions list in case of future reference.
+        Also sets note.versions list in case of future reference. If the
+        request fails an empty list is returned and the versions are
+        fetched again on the next access.
         :rtype: list
         """
-        self.versions = [
-            Version.from_json(self, version)
-            for version in self.api.list_note_versions(self.to_json())]
+        with self.api.building():
+            versions = self.api.list_note_versions(self.to_json())
+            if versions is None:
+                LOGGER.error('Listing versions of {} failed'.format(self))
+                return []
+            self.versions = [
+                Version.from_json(self, version) for version in versions]
         return self.versions
 
     def list_attachments(self):
         """Lists attachments of a note.
 
-        Also sets note.attachments list in case of future reference.
+        Also sets note.attachments list in case of future reference, see
+        list_versions for failed requests.
         :rtype: list
         """
-        self.attachments = [
-            Attachment.from_json(self, attachment)
-            for attachment in self.api.list_note_attachments(self.to_json())]
+        with self.api.building():
+            attachments = self.api.list_note_attachments(self.to_json())
+            if attachments is None:
+                LOGGER.error('Listing attachments of {} failed'.format(self))
+                return []
+            self.attachments = [
+                Attachment.from_json(self, attachment)
+                for attachment in attachments]
         return self.attachments
 
+    async def download_async(self, api):
+        """Fetches versions and attachments of the note concurrently.
+
+        :type api: asyncwrapper.AsyncAPI
+        """
+        versions, attachments = await asyncio.gather(
+            api.list_note_versions(self.to_json()),
+            api.list_note_attachments(self.to_json()))
+        # failed listings are fetched again on access
+        if versions is not None:
+            self.versions = [
+                Version.from_json(self, version) for version in versions]
+        if attachments is not None:
+            self.attachments = [
+                Attachment.from_json(self, attachment)
+                for attachment in attachments]
+
     @threaded_method
-    def upload_file(self, path):
+    def upload_file(self, path, progress=None):
         """Uploads file at path as attachment.
 
+        Returns the new attachment, which is also added to
+        note.attachments if they are loaded. Unloaded attachments are
+        left to be fetched on first access, which includes the new one.
         :type path: str
+        :param callable progress: Called with the number of bytes sent
+            and the total size of the upload.
+        :rtype: Attachment or None
         """
-        self.api.upload_attachment(self.to_json(), path)
+        res = self.api.upload_attachment(self.to_json(), path, progress)
+        if res:
+            attachment = Attachment.from_json(self, res)
+            if self._attachments is not None:
+                self._attachments.append(attachment)
+                utils.invalidate_fuzzy(self._attachments)
+            return attachment
 
 
 class Version(Model):
     """Class representing a version of a note."""
+    __slots__ = (
+        'note', 'previous_id', 'next_id', 'content', 'updated_at',
+        '_attachments')
+
     def __init__(self, note, title, ident, previous_id, next_id,
                  content, updated_at):
         """Initializes a version object.
@@ -330,13 +893,35 @@ class Version(Model):
         :param str updated_at: Timestamp of the last update.
             Same as the creation date of the next version.
         """
-        super().__init__(title, ident, note.api)
+        super().__init__(title, ident)
         self.note = note
         self.previous_id = int(previous_id) if previous_id else None
         self.next_id = int(next_id) if next_id else None
         self.content = content
         self.updated_at = updated_at
-        self.attachments = []
+        self._attachments = None
+
+    @property
+    def api(self):
+        """Api of the note.
+
+        :rtype: wrapper.API
+        """
+        return self.note.api
+
+    @property
+    def attachments(self):
+        """Attachments of the version, fetched on first access.
+
+        :rtype: list
+        """
+        if self._attachments is None:
+            return self.list_attachments()
+        return self._attachments
+
+    @attachments.setter
+    def attachments(self, attachments):
+        self._attachments = attachments
 
     @classmethod
     def from_json(cls, note, json):
@@ -357,20 +942,26 @@ class Version(Model):
     def list_attachments(self):
         """Lists attachments of a note version.
 
-        Also sets version.attachments list in case of future reference.
+        Also sets version.attachments list in case of future reference,
+        see Note.list_versions for failed requests.
         :rtype: list
         """
-        self.attachments = [
-            Attachment.from_json(attachment, self.ident)
-            for attachment in
-            self.api.list_note_version_attachments(
-                self.note.to_json(),
-                self.ident)]
+        with self.api.building():
+            attachments = self.api.list_note_version_attachments(
+                self.note.to_json(), self.ident)
+            if attachments is None:
+                LOGGER.error('Listing attachments of {} failed'.format(self))
+                return []
+            self.attachments = [
+                Attachment.from_json(self.note, attachment)
+                for attachment in attachments]
         return self.attachments
 
 
 class Attachment(Model):
     """Class representing an attachment to a note."""
+    __slots__ = ('note', 'version_id', 'mimetype', 'updated_at')
+
     def __init__(self, note, filename, ident, version_id, mimetype,
                  updated_at):
         """Initializes an attachment object.
@@ -382,12 +973,20 @@ class Attachment(Model):
         :type mimetype: str
         :type updated_at: str
         """
-        super().__init__(filename, ident, note.api)
+        super().__init__(filename, ident)
         self.note = note
         self.version_id = int(version_id)
         self.mimetype = mimetype
         self.updated_at = updated_at
 
+    @property
+    def api(self):
+        """Api of the note.
+
+        :rtype: wrapper.API
+        """
+        return self.note.api
+
     @classmethod
     def from_json(cls, note, json):
         """Parses attachment from dict.
@@ -405,12 +1004,15 @@ class Attachment(Model):
             )
 
     @threaded_method
-    def download_to(self, path):
+    def download_to(self, path, progress=None):
         """Downloads attachment to specified path.
 
         :type path: str
+        :param callable progress: Called with the number of bytes written
+            and the total size (None if unknown) after each chunk.
         """
-        self.api.download_note_attachment(self.note, self.ident, path)
+        self.api.download_note_attachment(
+            self.note.to_json(), self.ident, path, progress)
 
     @threaded_method
     def delete(self):
@@ -420,12 +1022,15 @@ class Attachment(Model):
             self.version_id,
             self.ident
             )
-        if self in self.note.attachments:
-            self.note.attachments.remove(self)
+        if self.note._attachments and self in self.note._attachments:
+            self.note._attachments.remove(self)
+            utils.invalidate_fuzzy(self.note._attachments)
 
 
 class Tag(Model):
     """Class representing a tag."""
+    __slots__ = ('api', 'visibility', 'notes')
+
     def __init__(self, title, ident, api, visibility=0):
         """Initializes a tag object.
 
@@ -434,7 +1039,8 @@ class Tag(Model):
         :type api: wrapper.api
         :type visibility: int
         """
-        super().__init__(title, ident, api)
+        super().__init__(title, ident)
+        self.api = api
         self.visibility = visibility
         self.notes = set()
 
@@ -476,6 +1082,11 @@ class Paperwork:
         """
         self.notebooks = {}
         self.tags = {}
+        self.notebook_index = ModelIndex()
+        self.note_index = ModelIndex()
+        self.tag_index = ModelIndex()
+        self.search_index = SearchIndex()
+        self.tagged_index = TagIndex()
         self.api = wrapper.API(host)
         self.authenticated = self.api.test_connection()
 
@@ -487,7 +1098,7 @@ class Paperwork:
         """
         if title != 'All Notes':
             notebook = Notebook.create(self.api, title)
-            self.notebooks[notebook.ident] = notebook
+            self.index_notebook(notebook)
             LOGGER.info('Created notebook {}'.format(notebook))
             return notebook
 
@@ -498,7 +1109,7 @@ class Paperwork:
         :type notebook: Notebook
         """
         notebook.delete()
-        del(self.notebooks[notebook.ident])
+        self.unindex_notebook(notebook)
 
     @threaded_method
     def add_notebook(self, notebook):
@@ -507,44 +1118,360 @@ class Paperwork:
         :type notebook: Notebook
         """
         if notebook.ident != 0:
-            self.notebooks[notebook.ident] = notebook
+            self.index_notebook(notebook)
             LOGGER.info('Added notebook {}'.format(notebook))
 
+    def index_notebook(self, notebook):
+        """Adds notebook and its notes to notebooks and the indexes.
+
+        :type notebook: Notebook
+        """
+        notebook.paperwork = self
+        self.notebooks[notebook.ident] = notebook
+        self.notebook_index.add(notebook)
+        for note in notebook.notes.values():
+            self.note_index.add(note)
+            self.search_index.add(note)
+            self.tagged_index.add(note)
+
+    def unindex_notebook(self, notebook):
+        """Removes notebook and its notes from notebooks and the indexes.
+
+        :type notebook: Notebook
+        """
+        self.notebooks.pop(notebook.ident, None)
+        self.notebook_index.remove(notebook)
+        for note in notebook.notes.values():
+            self.note_index.remove(note)
+            self.search_index.remove(note)
+            self.tagged_index.remove(note)
+
     @threaded_method
     def add_tag(self, tag):
         """Adds tag to paperwork.
 
         :type tag: Tag
         """
-        self.tags[tag.ident] = tag
+        self.index_tag(tag)
         LOGGER.info('Added tag {}'.format(tag))
 
-    def download(self):
-        """Downloading tags, notebooks and notes from host."""
+    def index_tag(self, tag):
+        """Adds tag to tags and the indexes.
+
+        :type tag: Tag
+        """
+        self.tags[tag.ident] = tag
+        self.tag_index.add(tag)
+
+    def download(self, bulk=False, workers=DOWNLOAD_WORKERS):
+        """Downloading tags, notebooks and notes from host.
+
+        The note listings of the notebooks are fetched and parsed by
+        workers parallel threads. Tags, notebooks and notes are indexed
+        by the calling thread in the order of the server, so the result
+        does not depend on workers.
+        Versions and attachments of notes are loaded on first access.
+        :param bool bulk: If true versions and attachments are prefetched
+            in bulk, see prefetch.
+        :param int workers: maximum number of parallel requests
+        """
         LOGGER.info('Downloading all')
+        with tracing.span('Paperwork.download', workers=workers) as span, \
+                ThreadPoolExecutor(workers) as executor:
+            tags = executor.submit(tracing.bind(self.api.list_tags))
+            notebooks = executor.submit(
+                tracing.bind(self.api.list_notebooks))
+
+            LOGGER.info('Downloading tags')
+            for tag in tags.result():
+                self.index_tag(Tag.from_json(self.api, tag))
+
+            LOGGER.info('Downloading notebooks')
+            downloaded = []
+            for notebook in notebooks.result():
+                if notebook['title'] != 'All Notes':
+                    notebook = Notebook.from_json(self.api, notebook)
+                    self.index_notebook(notebook)
+                    downloaded.append(notebook)
+                else:
+                    LOGGER.info('Skipping notebook {}'.format(notebook))
+
+            listings = executor.map(tracing.bind(
+                lambda notebook: notebook.fetch_notes(self.tags)), downloaded)
+            for notebook, notes in zip(downloaded, listings):
+                for note in notes:
+                    notebook.index_note(note)
+            span.set(notebooks=len(downloaded), notes=len(self.note_index))
+            self.search_index.ready = True
+            if bulk:
+                self.prefetch(workers)
+
+    def prefetch(self, workers=DOWNLOAD_WORKERS):
+        """Fetches versions and attachments of all notes in bulk, workers
+        notebooks at a time.
+
+        :param int workers: maximum number of notebooks fetched in
+            parallel
+        """
+        with ThreadPoolExecutor(workers) as executor:
+            # list raises the first exception of the notebooks
+            list(executor.map(
+                tracing.bind(Notebook.prefetch), self.notebooks.values()))
+
+    def load(self, store):
+        """Adds the objects saved in store, without contacting the host.
+
+        Returns false if store holds no objects of this host.
+        :type store: store.Store
+        :rtype: bool
+        """
+        if not store.load(self):
+            return False
+        self.search_index.ready = True
+        return True
 
-        LOGGER.info('Downloading tags')
-        for tag in self.api.list_tags():
-            tag = Tag.from_json(self.api, tag)
-            self.tags[tag.ident] = tag
+    def save(self, store):
+        """Saves all objects to store, replacing its content.
 
-        LOGGER.info('Downloading notebooks')
-        for notebook in self.api.list_notebooks():
+        :type store: store.Store
+        """
+        store.save(self)
+
+    def reconcile(self, store, deep=True):
+        """Syncs with the host in background and saves the result to
+        store, e.g. after a warm start with load.
+
+        The objects are modified by the background thread, use wait
+        before relying on them.
+        :type store: store.Store
+        :param bool deep: see sync
+        :rtype: Future
+        """
+        def run():
+            changes = self.sync(deep)
+            self.save(store)
+            return changes
+        return submit(run)
+
+    def sync(self, deep=False):
+        """Fetches remote changes since the last download or sync.
+
+        Notebooks are compared by updated_at and only the note listings
+        of new or changed notebooks are fetched, unless deep is true.
+        Notes are only replaced if their updated_at moved. Notes missing
+        from a fetched listing or belonging to a deleted notebook are
+        moved if another fetched listing contains them, otherwise
+        deleted. Deleted tags are removed from their notes without
+        marking the notes as changed.
+        Notebooks and notes with unpushed local changes are not
+        overwritten by remote changes, they are reported as conflicted
+        instead.
+        Returns a dict with the lists of changed objects, see
+        SYNC_CHANGES.
+        :param bool deep: If true the note listings of all notebooks are
+            fetched, for servers which don't update the timestamp of a
+            notebook when its notes change.
+        :rtype: dict
+        """
+        LOGGER.info('Syncing')
+        changes = {key: [] for key in SYNC_CHANGES}
+
+        remote = {tag['id']: tag for tag in self.api.list_tags()}
+        for tag in list(self.tags.values()):
+            if tag.ident not in remote:
+                for note in list(tag.notes):
+                    # removed on the server, nothing to push
+                    dirty = note.dirty
+                    note.tags = note.tags - {tag}
+                    note.dirty = dirty
+                del self.tags[tag.ident]
+                self.tag_index.remove(tag)
+                changes['deleted_tags'].append(tag)
+        for ident, tag_json in remote.items():
+            tag = self.tags.get(ident)
+            if tag is None:
+                tag = Tag.from_json(self.api, tag_json)
+                self.index_tag(tag)
+                changes['created_tags'].append(tag)
+            elif tag.title != tag_json['title']:
+                tag.title = tag_json['title']
+                self.tag_index.add(tag)
+                changes['updated_tags'].append(tag)
+
+        remote = {
+            notebook['id']: notebook for notebook in self.api.list_notebooks()
+            if notebook['title'] != 'All Notes'}
+        # notes of deleted notebooks, unless a listing contains them
+        orphans = {}
+        for notebook in list(self.notebooks.values()):
+            if notebook.ident not in remote:
+                self.unindex_notebook(notebook)
+                orphans.update(notebook.notes)
+                changes['deleted_notebooks'].append(notebook)
+
+        listings = []
+        for ident, notebook_json in remote.items():
+            notebook = self.notebooks.get(ident)
+            if notebook is None:
+                notebook = Notebook.from_json(self.api, notebook_json)
+                self.index_notebook(notebook)
+                changes['created_notebooks'].append(notebook)
+            elif notebook.updated_at != notebook_json.get('updated_at', ''):
+                if notebook.dirty:
+                    # the local changes are kept until they are pushed
+                    changes['conflicted_notebooks'].append(notebook)
+                else:
+                    notebook.title = notebook_json['title']
+                    notebook.updated_at = notebook_json.get('updated_at', '')
+                    notebook.mark_clean()
+                    self.notebook_index.add(notebook)
+                    changes['updated_notebooks'].append(notebook)
+            elif not deep:
+                continue
+            listings.append(
+                (notebook, self.api.list_notebook_notes(ident) or []))
+
+        seen = set()
+        for notebook, notes_json in listings:
+            for note_json in notes_json:
+                seen.add(note_json['id'])
+                note = self.note_index.get(note_json['id']) or \
+                    orphans.pop(note_json['id'], None)
+                if note is None:
+                    note = Note.from_json(notebook, note_json)
+                    note.tags.update(
+                        self.tags[tag['id']] for tag in note_json['tags'])
+                    notebook.index_note(note)
+                    changes['created_notes'].append(note)
+                    continue
+                if note.notebook is not notebook:
+                    note.notebook.unindex_note(note)
+                    notebook.index_note(note)
+                    changes['moved_notes'].append(note)
+                if note.updated_at != note_json['updated_at']:
+                    if note.dirty:
+                        changes['conflicted_notes'].append(note)
+                        continue
+                    note.update_from_json(note_json, self.tags)
+                    self.note_index.add(note)
+                    changes['updated_notes'].append(note)
+
+        for notebook, notes_json in listings:
+            for note in list(notebook.notes.values()):
+                if note.ident not in seen:
+                    notebook.unindex_note(note)
+                    changes['deleted_notes'].append(note)
+        changes['deleted_notes'].extend(orphans.values())
+
+        LOGGER.info('Synced: {}'.format(
+            {key: len(value) for key, value in changes.items()}))
+        return changes
+
+    def async_api(self):
+        """Returns an asyncio api-wrapper for the same host.
+
+        :rtype: asyncwrapper.AsyncAPI
+        """
+        return asyncwrapper.AsyncAPI(
+            self.api.host, self.api.headers['User-Agent'])
+
+    async def download_async(self, api=None):
+        """Coroutine version of download, downloads notebooks and notes
+        concurrently.
+
+        :param asyncwrapper.AsyncAPI api: api used for the downloads,
+            a temporary one is created if omitted.
+        """
+        if api is None:
+            async with self.async_api() as api:
+                return await self.download_async(api)
+
+        LOGGER.info('Downloading all')
+        for tag in await api.list_tags():
+            self.index_tag(Tag.from_json(self.api, tag))
+
+        notebooks = []
+        for notebook in await api.list_notebooks():
             if notebook['title'] != 'All Notes':
                 notebook = Notebook.from_json(self.api, notebook)
-                self.add_notebook(notebook)
-                notebook.download(self.tags)
+                self.index_notebook(notebook)
+                notebooks.append(notebook)
             else:
                 LOGGER.info('Skipping notebook {}'.format(notebook))
+        await asyncio.gather(*[
+            notebook.download_async(api, self.tags)
+            for notebook in notebooks])
+        self.search_index.ready = True
+
+    def dirty_notebooks(self):
+        """Returns notebooks with local changes.
+
+        :rtype: list
+        """
+        return [
+            notebook for notebook in self.notebooks.values()
+            if notebook.dirty]
+
+    def dirty_notes(self):
+        """Returns notes with local changes.
+
+        :rtype: list
+        """
+        return [note for note in self.iter_notes() if note.dirty]
+
+    async def update_async(self, api=None):
+        """Coroutine version of update, updates modified notebooks and
+        notes concurrently.
+
+        :param asyncwrapper.AsyncAPI api: api used for the updates,
+            a temporary one is created if omitted.
+        :rtype: dict
+        """
+        if api is None:
+            async with self.async_api() as api:
+                return await self.update_async(api)
+
+        notebooks = self.dirty_notebooks()
+        notes = self.dirty_notes()
+        LOGGER.info('Updating {} notebooks and {} notes'.format(
+            len(notebooks), len(notes)))
+        pushed = await asyncio.gather(*[
+            notebook.update_async(api) for notebook in notebooks])
+        updated = {'notebooks': [
+            notebook for notebook, ok in zip(notebooks, pushed) if ok]}
+        pushed = await asyncio.gather(*[
+            note.update_async(api) for note in notes])
+        updated['notes'] = [note for note, ok in zip(notes, pushed) if ok]
+        return updated
 
     @threaded_method
     def update(self):
-        """Updating notebooks and notes to host."""
-        LOGGER.info('Updating notebooks and notes')
-        for notebook in self.notebooks.values():
-            notebook.update()
-            for note in notebook.get_notes():
-                note.update()
+        """Pushes modified notebooks and notes to host.
+
+        Objects without local changes are skipped. Returns the pushed
+        notebooks and notes.
+        :rtype: dict
+        """
+        notebooks = self.dirty_notebooks()
+        notes = self.dirty_notes()
+        LOGGER.info('Updating {} notebooks and {} notes'.format(
+            len(notebooks), len(notes)))
+        return {
+            'notebooks': [
+                notebook for notebook in notebooks if notebook.update()],
+            'notes': [note for note in notes if note.update()]}
+
+    def wait(self, timeout=None):
+        """Waits for threaded calls submitted in background.
+
+        Raises the exception of the first failed call.
+        :param float timeout: seconds to wait, forever if None
+        :returns: true if all calls are done
+        :rtype: bool
+        """
+        return wait(timeout)
+
+    join = wait
 
     def find_tag(self, key):
         """Finds tag with key (ident or title).
@@ -552,7 +1479,7 @@ class Paperwork:
         :type key: str or int
         :rtype: Tag or None
         """
-        return find(key, self.tags)
+        return self.tag_index.find(key)
 
     def find_notebook(self, key):
         """Find notebook with key (ident or title).
@@ -560,7 +1487,7 @@ class Paperwork:
         :type key: str or int
         :rtype: Notebook or None
         """
-        return find(key, self.notebooks)
+        return self.notebook_index.find(key)
 
     def find_note(self, key):
         """Find note with key (ident or title).
@@ -570,29 +1497,67 @@ class Paperwork:
         """
         LOGGER.info('Searching note for key {} of type {}'.format(
             key, type(key)))
-        if isinstance(key, basestring):
-            for item in self.get_notes():
-                if key == item.title:
-                    return item
-        else:
-            LOGGER.info('key is int, finding through keys')
-            for notebook in self.notebooks.values():
-                if key in notebook.notes:
-                    return notebook.notes[key]
-        LOGGER.error('No note found for key {} of type {}'.format(
-            key, type(key)))
+        note = self.note_index.find(key)
+        if note is None:
+            LOGGER.error('No note found for key {} of type {}'.format(
+                key, type(key)))
+        return note
+
+    def iter_notes(self):
+        """Iterates over the notes of all notebooks, unsorted.
+
+        :rtype: generator
+        """
+        for notebook in self.notebooks.values():
+            for note in notebook.notes.values():
+                yield note
+
+    def batch(self, chunk_size=DEFAULT_MAX_SIZE,
+              workers=unitofwork.DEFAULT_WORKERS):
+        """Returns a unit of work, which records deletes, moves and tag
+        changes of notes and sends them grouped into multi-id requests.
+
+        with paperwork.batch() as batch:
+            batch.move(note, notebook)
+            batch.delete(other_note)
+        :param int chunk_size: maximum number of notes per request
+        :param int workers: maximum number of parallel requests
+        :rtype: unitofwork.UnitOfWork
+        """
+        return unitofwork.UnitOfWork(self, chunk_size, workers)
+
+    def find_tagged(self, all_of=(), any_of=(), none_of=()):
+        """Returns the notes which have all tags of all_of, at least one
+        of any_of and none of none_of, without contacting the host.
+
+        Without all_of and any_of all notes are candidates.
+        :param list all_of: tags or idents
+        :param list any_of: tags or idents
+        :param list none_of: tags or idents
+        :rtype: list
+        """
+        index = self.tagged_index
+        return index.members(index.query(all_of, any_of, none_of))
 
-    def search(self, key):
-        """Searches for given key and returns note-instances.
+    def search(self, key, limit=None):
+        """Searches for given key and returns note-instances, best match
+        first.
 
+        Searches the local index once all notes have been downloaded or
+        loaded, the host otherwise.
         :type key: str
+        :param int limit: maximum number of notes, all if None
         :rtype: List
         """
-        json_notes = self.api.search(key)
+        if self.search_index.ready:
+            return self.search_index.search(key, limit)
+        LOGGER.info('Search index not ready, searching on host')
         notes = []
-        for json_note in json_notes:
-            self.find_note(json_note['id'])
-        return notes
+        for json_note in self.api.search(key) or []:
+            note = self.find_note(json_note['id'])
+            if note is not None:
+                notes.append(note)
+        return notes[:limit]
 
     def get_notes(self):
         """Returns notes in a sorted list.
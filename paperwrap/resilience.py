@@ -0,0 +1,215 @@
+"""Retries and circuit breaking for the paperwork api-wrapper.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+# methods which may safely be sent again
+IDEMPOTENT_METHODS = ('get', 'put', 'delete', 'head', 'options')
+# keywords whose requests change state although sent as get
+NON_IDEMPOTENT_KEYWORDS = ('move',)
+# status codes worth another try
+RETRY_STATUSES = (429, 502, 503, 504)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit is open."""
+
+
+def parse_retry_after(value):
+    """Returns the seconds to wait according to a Retry-After header,
+    which contains either seconds or a HTTP date.
+
+    :type value: str or None
+    :rtype: float or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decides whether and when a failed request is retried.
+
+    The delay grows exponentially with the attempt and is randomized
+    with full jitter, a Retry-After header sent by the server takes
+    precedence.
+    """
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS):
+        """Initializes the policy.
+
+        :param int retries: maximum number of retries per request
+        :param float backoff: base delay in seconds
+        :param float max_backoff: maximum delay in seconds
+        :param tuple statuses: status codes which are retried
+        :param tuple methods: methods which are retried
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = methods
+        self.lock = threading.Lock()
+        self.counters = {'retries': 0, 'exhausted': 0, 'statuses': {}}
+
+    def should_retry(self, method, attempt, status=None):
+        """Returns true if the request should be sent again.
+
+        :type method: str
+        :param int attempt: number of retries done so far
+        :param int status: status code, None for connection errors
+        :rtype: bool
+        """
+        if method.lower() not in self.methods:
+            return False
+        if status is not None and status not in self.statuses:
+            return False
+        if attempt >= self.retries:
+            with self.lock:
+                self.counters['exhausted'] += 1
+            return False
+        with self.lock:
+            self.counters['retries'] += 1
+            key = status or 'connection'
+            self.counters['statuses'][key] = \
+                self.counters['statuses'].get(key, 0) + 1
+        return True
+
+    def delay(self, attempt, retry_after=None):
+        """Returns seconds to wait before the next attempt.
+
+        :param int attempt: number of retries done so far
+        :param str retry_after: value of the Retry-After header
+        :rtype: float
+        """
+        seconds = parse_retry_after(retry_after)
+        if seconds is None:
+            seconds = random.uniform(0, self.backoff * 2 ** attempt)
+        return min(seconds, self.max_backoff)
+
+    def sleep(self, seconds):
+        """Waits before the next attempt.
+
+        :type seconds: float
+        """
+        time.sleep(seconds)
+
+    def stats(self):
+        """Returns the number of retries, requests which failed after
+        all retries and retries per status code.
+
+        :rtype: dict
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['statuses'] = dict(self.counters['statuses'])
+        return stats
+
+
+class CircuitBreaker:
+    """Fails fast while the host is unhealthy.
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests raise CircuitOpenError. After reset_timeout seconds a single
+    trial request is let through, its outcome closes or reopens the
+    circuit. A trial without outcome after another reset_timeout seconds
+    reopens it as well.
+    """
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        """Initializes a closed circuit.
+
+        :type failure_threshold: int
+        :param float reset_timeout: seconds until a trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.counters = {'opened': 0, 'rejected': 0}
+
+    def before_request(self):
+        """Raises CircuitOpenError if requests are not allowed."""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            now = time.time()
+            if self.state == HALF_OPEN and \
+                    now - self.opened_at >= self.reset_timeout:
+                LOGGER.error('Trial request got no result, circuit opened')
+                self.state = OPEN
+                self.opened_at = now
+                self.counters['opened'] += 1
+            elif self.state == OPEN and \
+                    now - self.opened_at >= self.reset_timeout:
+                LOGGER.info('Circuit half open, sending trial request')
+                self.state = HALF_OPEN
+                # start of the trial
+                self.opened_at = now
+                return
+            self.counters['rejected'] += 1
+        raise CircuitOpenError(
+            'Circuit open after {} failures'.format(self.failures))
+
+    def record_success(self):
+        """Closes the circuit."""
+        with self.lock:
+            if self.state != CLOSED:
+                LOGGER.info('Circuit closed')
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """Counts a failure, opens the circuit if the threshold is
+        reached or the trial request failed."""
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and
+                    self.failures >= self.failure_threshold):
+                LOGGER.error('Circuit opened after {} failures'.format(
+                    self.failures))
+                self.state = OPEN
+                self.opened_at = time.time()
+                self.counters['opened'] += 1
+
+    def stats(self):
+        """Returns state, consecutive failures, how often the circuit
+        opened and how many requests were rejected.
+
+        :rtype: dict
+        """
+        with self.lock:
+            stats = dict(self.counters)
+            stats['state'] = self.state
+            stats['failures'] = self.failures
+        return stats
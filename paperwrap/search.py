@@ -0,0 +1,159 @@
+"""Local full-text search over notes.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# a word in the title counts like TITLE_WEIGHT occurrences in the content
+TITLE_WEIGHT = 3
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Returns the lower case words of text.
+
+    :type text: str
+    :rtype: list
+    """
+    return TOKEN.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """Inverted index over the titles and contents of notes, ranking
+    results with BM25.
+
+    Added and removed notes are only queued, the index is brought up to
+    date by the next search. That keeps downloads cheap and lets changed
+    notes be queued again on every modification.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # term -> {note ident: term frequency}
+        self.postings = {}
+        # note ident -> (note, terms of the note, length)
+        self.documents = {}
+        self.total_length = 0
+        # note ident -> note to (re)index or None to remove
+        self.pending = {}
+        # true once all notes of the host have been added
+        self.ready = False
+
+    def __len__(self):
+        with self.lock:
+            self.refresh()
+            return len(self.documents)
+
+    def add(self, note):
+        """Queues note to be indexed or reindexed.
+
+        :type note: models.Note
+        """
+        with self.lock:
+            self.pending[note.ident] = note
+
+    def remove(self, note):
+        """Queues note to be removed from the index.
+
+        :type note: models.Note
+        """
+        with self.lock:
+            self.pending[note.ident] = None
+
+    def clear(self):
+        """Removes all notes."""
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.pending.clear()
+            self.total_length = 0
+            self.ready = False
+
+    def refresh(self):
+        """Applies the queued changes, the lock must be held."""
+        if not self.pending:
+            return
+        LOGGER.info('Indexing {} notes'.format(len(self.pending)))
+        for ident, note in self.pending.items():
+            self.unindex(ident)
+            if note is not None:
+                self.index(note)
+        self.pending.clear()
+
+    def index(self, note):
+        """Adds note to the postings.
+
+        :type note: models.Note
+        """
+        terms = {}
+        for term in tokenize(note.title):
+            terms[term] = terms.get(term, 0) + TITLE_WEIGHT
+        for term in tokenize(note.content):
+            terms[term] = terms.get(term, 0) + 1
+        length = sum(terms.values())
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[note.ident] = frequency
+        self.documents[note.ident] = (note, tuple(terms), length)
+        self.total_length += length
+
+    def unindex(self, ident):
+        """Removes the note with ident from the postings.
+
+        :type ident: int or str
+        """
+        document = self.documents.pop(ident, None)
+        if document is None:
+            return
+        _, terms, length = document
+        for term in terms:
+            posting = self.postings[term]
+            del posting[ident]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= length
+
+    def search(self, query, limit=None):
+        """Returns the notes matching any word of query, best first.
+
+        :type query: str
+        :param int limit: maximum number of notes, all if None
+        :rtype: list
+        """
+        terms = set(tokenize(query))
+        with self.lock:
+            self.refresh()
+            count = len(self.documents)
+            if not count or not terms:
+                return []
+            average = self.total_length / count
+            scores = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(
+                    1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for ident, frequency in posting.items():
+                    length = self.documents[ident][2]
+                    scores[ident] = scores.get(ident, 0) + idf * (
+                        frequency * (K1 + 1) / (frequency + K1 * (
+                            1 - B + B * length / average)))
+
+            def rank(ident):
+                return -scores[ident], str(ident)
+            if limit is None:
+                ranked = sorted(scores, key=rank)
+            else:
+                ranked = heapq.nsmallest(limit, scores, key=rank)
+            return [self.documents[ident][0] for ident in ranked]
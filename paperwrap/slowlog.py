@@ -0,0 +1,252 @@
+"""Log of slow requests with the time spent in each phase.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+LOGGER = logging.getLogger(__name__)
+
+# requests taking at least this many seconds are logged
+DEFAULT_THRESHOLD = 1.0
+# fraction of the requests whose network phases are measured
+DEFAULT_SAMPLE_RATE = 0.1
+# seconds spent connecting by the connections of the current thread
+CONNECTS = threading.local()
+
+
+def connect_time():
+    """Returns the seconds the current thread spent opening connections
+    since the last call and resets them.
+
+    :rtype: float
+    """
+    elapsed = getattr(CONNECTS, 'elapsed', 0.0)
+    CONNECTS.elapsed = 0.0
+    return elapsed
+
+
+def timed_connect(connect):
+    """Wraps the connect method of a connection class to add its
+    duration to the connect time of the current thread.
+    """
+    def run(self):
+        started = time.perf_counter()
+        try:
+            connect(self)
+        finally:
+            CONNECTS.elapsed = getattr(CONNECTS, 'elapsed', 0.0) + \
+                time.perf_counter() - started
+    return run
+
+
+class TimedHTTPConnection(HTTPConnection):
+    """HTTP connection recording the time for DNS lookup and connect."""
+    connect = timed_connect(HTTPConnection.connect)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection recording the time for DNS lookup, connect and
+    TLS handshake."""
+    connect = timed_connect(HTTPSConnection.connect)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    """Pool of TimedHTTPConnection."""
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    """Pool of TimedHTTPSConnection."""
+    ConnectionCls = TimedHTTPSConnection
+
+
+def install(adapter):
+    """Makes the connection pools of adapter record connect times.
+
+    Existing pools are closed, so that the next requests open timed
+    connections.
+    :type adapter: requests.adapters.HTTPAdapter
+    """
+    adapter.poolmanager.pool_classes_by_scheme = {
+        'http': TimedHTTPConnectionPool,
+        'https': TimedHTTPSConnectionPool
+        }
+    adapter.poolmanager.clear()
+
+
+class Timing:
+    """Phases of one request in seconds.
+
+    The network time of the last attempt of sampled requests is split
+    into connect, ttfb (time to first byte after connecting) and
+    transfer, the others only have network. Failed attempts and the
+    backoff between them are the retry phase. All requests have decode
+    and, if the response was turned into models, model.
+    """
+    __slots__ = ('method', 'keyword', 'ids', 'sampled', 'started', 'ended',
+                 'attempted', 'attempts', 'status', 'error', 'phases')
+
+    def __init__(self, method, keyword, ids, sampled):
+        self.method = method
+        self.keyword = keyword
+        self.ids = ids
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.ended = None
+        self.attempted = self.started
+        self.attempts = 0
+        self.status = None
+        self.error = None
+        self.phases = {}
+
+    def attempt(self):
+        """Records the start of an attempt to send the request."""
+        self.attempted = time.perf_counter()
+        self.attempts += 1
+        if self.attempts > 1:
+            self.phases['retry'] = self.attempted - self.started
+        if self.sampled:
+            connect_time()
+
+    @property
+    def duration(self):
+        """Seconds from the start of the request to the end of the last
+        phase.
+
+        :rtype: float
+        """
+        return self.ended - self.started + self.phases.get('model', 0.0)
+
+    def to_json(self):
+        """Returns the timing as dict.
+
+        :rtype: dict
+        """
+        return {
+            'method': self.method,
+            'keyword': self.keyword,
+            'ids': list(self.ids),
+            'status': self.status,
+            'error': self.error,
+            'sampled': self.sampled,
+            'attempts': self.attempts,
+            'duration': round(self.duration, 6),
+            'phases': {
+                phase: round(elapsed, 6)
+                for phase, elapsed in self.phases.items()}
+            }
+
+
+class SlowRequestLog:
+    """Logs requests taking at least threshold seconds as json to the
+    paperwrap.slowlog logger.
+
+    Every request is timed as a whole, the network phases of a request
+    are only measured with probability sample_rate.
+    """
+    def __init__(self, threshold=DEFAULT_THRESHOLD,
+                 sample_rate=DEFAULT_SAMPLE_RATE):
+        """Creates the log.
+
+        :param float threshold: minimum duration in seconds of logged
+            requests
+        :param float sample_rate: fraction of the requests whose network
+            phases are measured, between 0 and 1
+        """
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.local = threading.local()
+
+    def start(self, method, keyword, ids):
+        """Returns the timing of a new request.
+
+        :type method: str
+        :type keyword: str
+        :type ids: tuple
+        :rtype: Timing
+        """
+        return Timing(method, keyword, ids,
+                      random.random() < self.sample_rate)
+
+    def finish(self, timing):
+        """Ends timing and logs it if it was slow, inside building once
+        the models are built.
+
+        :type timing: Timing
+        """
+        timing.ended = time.perf_counter()
+        deferred = getattr(self.local, 'deferred', None)
+        if deferred is not None:
+            deferred.append(timing)
+        else:
+            self.emit(timing)
+
+    def emit(self, timing):
+        """Logs timing if it was slow.
+
+        :type timing: Timing
+        """
+        if timing.duration >= self.threshold:
+            LOGGER.warning('Slow request {}'.format(
+                json.dumps(timing.to_json(), default=str)))
+
+    def building(self):
+        """Returns a context manager whose remaining time after the last
+        request sent in it is the model phase of that request.
+
+        :rtype: Building
+        """
+        return Building(self)
+
+
+class Building:
+    """Defers the logging of the requests of the current thread until
+    the models built from them are done, see SlowRequestLog.building.
+    """
+    __slots__ = ('log', 'nested')
+
+    def __init__(self, log):
+        self.log = log
+        self.nested = False
+
+    def __enter__(self):
+        local = self.log.local
+        self.nested = getattr(local, 'deferred', None) is not None
+        if not self.nested:
+            local.deferred = []
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.nested:
+            return False
+        now = time.perf_counter()
+        deferred = self.log.local.deferred
+        self.log.local.deferred = None
+        if deferred:
+            last = deferred[-1]
+            last.phases['model'] = now - last.ended
+        for timing in deferred:
+            self.log.emit(timing)
+        return False
+
+
+class NoBuilding:
+    """Building used while no slow request log is configured."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NO_BUILDING = NoBuilding()
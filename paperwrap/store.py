@@ -0,0 +1,240 @@
+"""SQLite store of paperwork-objects for warm starts.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+import sqlite3
+import threading
+from . import models
+
+LOGGER = logging.getLogger(__name__)
+
+# version of the schema, stored as user_version of the database
+SCHEMA_VERSION = 2
+# statements migrating a database of version index to index + 1
+MIGRATIONS = [
+    [
+        'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)',
+        'CREATE TABLE tags (id INTEGER, title TEXT,'
+        ' visibility INTEGER)',
+        'CREATE TABLE notebooks (id INTEGER, title TEXT,'
+        ' type INTEGER, updated_at TEXT)',
+        # versions and attachments are null if they were not loaded
+        'CREATE TABLE notes (id INTEGER, notebook_id INTEGER,'
+        ' title TEXT, content TEXT, updated_at TEXT, versions INTEGER,'
+        ' attachments INTEGER)',
+        'CREATE TABLE note_tags (note_id INTEGER, tag_id INTEGER)',
+        'CREATE TABLE versions (id INTEGER, note_id INTEGER, title TEXT,'
+        ' previous_id INTEGER, next_id INTEGER, content TEXT,'
+        ' updated_at TEXT)',
+        'CREATE TABLE attachments (id INTEGER, note_id INTEGER,'
+        ' version_id INTEGER, filename TEXT, mimetype TEXT,'
+        ' updated_at TEXT)',
+        'CREATE INDEX versions_note ON versions (note_id)',
+        'CREATE INDEX attachments_note ON attachments (note_id)'
+        ],
+    [
+        # comma separated names of the attributes changed locally and
+        # not pushed yet, null if there are none
+        'ALTER TABLE notebooks ADD COLUMN dirty TEXT',
+        'ALTER TABLE notes ADD COLUMN dirty TEXT'
+        ]
+    ]
+TABLES = (
+    'meta', 'tags', 'notebooks', 'notes', 'note_tags', 'versions',
+    'attachments')
+
+
+def dump_dirty(model):
+    """Returns the dirty attributes of model as column value.
+
+    :type model: models.Model
+    :rtype: str or None
+    """
+    return ','.join(sorted(model.dirty)) or None
+
+
+def load_dirty(model, value):
+    """Restores the dirty attributes of model from a column value.
+
+    :type model: models.Model
+    :type value: str or None
+    """
+    if value:
+        model.dirty = frozenset(value.split(','))
+
+
+class Store:
+    """Persists tags, notebooks, notes and the loaded versions and
+    attachments of a paperwork instance in a SQLite database. Local
+    changes which were not pushed yet stay dirty after loading.
+
+    The store is a cache of the server: a database written by a newer
+    schema is dropped and rebuilt instead of being read.
+    """
+    def __init__(self, path):
+        """Opens or creates the database and migrates it to
+        SCHEMA_VERSION.
+
+        :param str path: file of the database, ':memory:' for testing
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.migrate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close()
+
+    @property
+    def version(self):
+        """Schema version of the database.
+
+        :rtype: int
+        """
+        return self.connection.execute('PRAGMA user_version').fetchone()[0]
+
+    def migrate(self):
+        """Applies the missing migrations."""
+        with self.lock, self.connection:
+            version = self.version
+            if version > SCHEMA_VERSION:
+                LOGGER.error('Store {} has schema version {}, rebuilding'
+                             .format(self.path, version))
+                for table in TABLES:
+                    self.connection.execute(
+                        'DROP TABLE IF EXISTS {}'.format(table))
+                version = 0
+            for version in range(version, SCHEMA_VERSION):
+                LOGGER.info('Migrating store {} to version {}'.format(
+                    self.path, version + 1))
+                for statement in MIGRATIONS[version]:
+                    self.connection.execute(statement)
+            self.connection.execute(
+                'PRAGMA user_version = {:d}'.format(SCHEMA_VERSION))
+
+    def save(self, paperwork):
+        """Replaces the stored objects with the ones of paperwork.
+
+        :type paperwork: models.Paperwork
+        """
+        notes = list(paperwork.iter_notes())
+        LOGGER.info('Saving {} notebooks and {} notes to {}'.format(
+            len(paperwork.notebooks), len(notes), self.path))
+        with self.lock, self.connection as db:
+            for table in TABLES:
+                db.execute('DELETE FROM {}'.format(table))
+            db.execute('INSERT INTO meta VALUES (?, ?)',
+                       ('host', paperwork.api.host))
+            db.executemany('INSERT INTO tags VALUES (?, ?, ?)', [
+                (tag.ident, tag.title, tag.visibility)
+                for tag in paperwork.tags.values()])
+            db.executemany('INSERT INTO notebooks VALUES (?, ?, ?, ?, ?)', [
+                (notebook.ident, notebook.title, notebook.nb_type,
+                 notebook.updated_at, dump_dirty(notebook))
+                for notebook in paperwork.notebooks.values()])
+            db.executemany(
+                'INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [
+                    (note.ident, note.notebook.ident, note.title,
+                     note.content, note.updated_at,
+                     note._versions is not None or None,
+                     note._attachments is not None or None,
+                     dump_dirty(note))
+                    for note in notes])
+            db.executemany('INSERT INTO note_tags VALUES (?, ?)', [
+                (note.ident, tag.ident)
+                for note in notes for tag in note.tags])
+            db.executemany(
+                'INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)', [
+                    (version.ident, note.ident, version.title,
+                     version.previous_id, version.next_id, version.content,
+                     version.updated_at)
+                    for note in notes for version in note._versions or ()])
+            db.executemany(
+                'INSERT INTO attachments VALUES (?, ?, ?, ?, ?, ?)', [
+                    (attachment.ident, note.ident, attachment.version_id,
+                     attachment.title, attachment.mimetype,
+                     attachment.updated_at)
+                    for note in notes
+                    for attachment in note._attachments or ()])
+
+    def load(self, paperwork):
+        """Adds the stored objects to paperwork.
+
+        Returns false if the store is empty or belongs to another host.
+        :type paperwork: models.Paperwork
+        :rtype: bool
+        """
+        with self.lock:
+            db = self.connection
+            host = db.execute(
+                "SELECT value FROM meta WHERE key = 'host'").fetchone()
+            if host is None or host[0] != paperwork.api.host:
+                LOGGER.info('Store {} has no data for {}'.format(
+                    self.path, paperwork.api.host))
+                return False
+            # rows are read in the order they were saved
+            tags, notebooks, notes, note_tags, versions, attachments = [
+                db.execute('SELECT * FROM {} ORDER BY rowid'.format(
+                    table)).fetchall()
+                for table in TABLES[1:]]
+
+        self.build(
+            paperwork, tags, notebooks, notes, note_tags, versions,
+            attachments)
+        LOGGER.info('Loaded {} notebooks and {} notes from {}'.format(
+            len(notebooks), len(notes), self.path))
+        return True
+
+    def build(self, paperwork, tags, notebooks, notes, note_tags, versions,
+              attachments):
+        """Creates the models from the rows of the tables and adds them
+        to paperwork.
+
+        :type paperwork: models.Paperwork
+        """
+        api = paperwork.api
+        for ident, title, visibility in tags:
+            paperwork.index_tag(models.Tag(title, ident, api, visibility))
+        for ident, title, nb_type, updated_at, dirty in notebooks:
+            notebook = models.Notebook(
+                title, ident, api, nb_type=nb_type, updated_at=updated_at)
+            load_dirty(notebook, dirty)
+            paperwork.index_notebook(notebook)
+
+        tagged = {}
+        for note_id, tag_id in note_tags:
+            tagged.setdefault(note_id, []).append(paperwork.tags[tag_id])
+        parsed = {}
+        for ident, notebook_id, title, content, updated_at, \
+                has_versions, has_attachments, dirty in notes:
+            notebook = paperwork.notebooks[notebook_id]
+            note = models.Note(title, ident, notebook, content, updated_at)
+            note.tags.update(tagged.get(ident, ()))
+            if has_versions:
+                note.versions = []
+            if has_attachments:
+                note.attachments = []
+            load_dirty(note, dirty)
+            notebook.index_note(note)
+            parsed[ident] = note
+        for ident, note_id, title, previous_id, next_id, content, \
+                updated_at in versions:
+            note = parsed[note_id]
+            note._versions.append(models.Version(
+                note, title, ident, previous_id, next_id, content,
+                updated_at))
+        for ident, note_id, version_id, filename, mimetype, \
+                updated_at in attachments:
+            note = parsed[note_id]
+            note._attachments.append(models.Attachment(
+                note, filename, ident, version_id, mimetype, updated_at))
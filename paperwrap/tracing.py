@@ -0,0 +1,321 @@
+"""Tracing spans of paperwork operations and http requests.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+LOGGER = logging.getLogger(__name__)
+
+# exporters finished spans are passed to, spans are only recorded while
+# this list is not empty
+EXPORTERS = []
+EXPORTERS_LOCK = threading.Lock()
+# stack of the open spans of each thread
+STATE = threading.local()
+IDS = itertools.count(1)
+
+
+def add_exporter(exporter):
+    """Starts passing finished spans to exporter.
+
+    :type exporter: Exporter
+    :rtype: Exporter
+    """
+    with EXPORTERS_LOCK:
+        EXPORTERS.append(exporter)
+    return exporter
+
+
+def remove_exporter(exporter):
+    """Stops passing spans to exporter and closes it.
+
+    :type exporter: Exporter
+    """
+    with EXPORTERS_LOCK:
+        if exporter in EXPORTERS:
+            EXPORTERS.remove(exporter)
+    exporter.close()
+
+
+def shutdown():
+    """Removes and closes all exporters."""
+    with EXPORTERS_LOCK:
+        exporters = EXPORTERS[:]
+        del EXPORTERS[:]
+    for exporter in exporters:
+        exporter.close()
+
+
+def stack():
+    """Returns the stack of open spans of the current thread.
+
+    :rtype: list
+    """
+    spans = getattr(STATE, 'spans', None)
+    if spans is None:
+        spans = STATE.spans = []
+    return spans
+
+
+def current():
+    """Returns the innermost open span of the current thread or None.
+
+    :rtype: Span or None
+    """
+    spans = getattr(STATE, 'spans', None)
+    return spans[-1] if spans else None
+
+
+class NoopSpan:
+    """Span returned while no exporter is configured, does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP = NoopSpan()
+
+
+class Span:
+    """Timed operation with attributes.
+
+    Spans opened while another span is open in the same thread are its
+    children. Finished spans are passed to the exporters.
+    """
+    __slots__ = ('name', 'ident', 'parent_id', 'attributes', 'start',
+                 'duration', 'thread', 'error', 'began')
+
+    def __init__(self, name, parent=None, attributes=None):
+        """Creates a span, timing starts when it is entered.
+
+        :type name: str
+        :param parent: parent span, the current span if None
+        :type parent: Span or None
+        :param dict attributes: initial attributes
+        """
+        if parent is None:
+            parent = current()
+        self.name = name
+        self.ident = next(IDS)
+        self.parent_id = parent.ident if parent is not None else None
+        self.attributes = attributes if attributes is not None else {}
+        self.start = None
+        self.duration = None
+        self.thread = None
+        self.error = None
+        self.began = None
+
+    def __repr__(self):
+        return 'Span({}, {})'.format(self.name, self.attributes)
+
+    def __enter__(self):
+        stack().append(self)
+        self.thread = threading.current_thread().ident
+        self.start = time.time()
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.began
+        if exc_value is not None:
+            self.error = '{}: {}'.format(exc_type.__name__, exc_value)
+        spans = stack()
+        if spans and spans[-1] is self:
+            spans.pop()
+        export(self)
+        return False
+
+    def set(self, **attributes):
+        """Sets attributes of the span."""
+        self.attributes.update(attributes)
+
+    def to_json(self):
+        """Returns the span as dict.
+
+        :rtype: dict
+        """
+        return {
+            'name': self.name,
+            'id': self.ident,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'thread': self.thread,
+            'error': self.error,
+            'attributes': self.attributes
+            }
+
+
+def span(name, parent=None, **attributes):
+    """Returns a new span to be used as context manager.
+
+    While no exporter is configured a shared span doing nothing is
+    returned.
+    :type name: str
+    :type parent: Span or None
+    :rtype: Span or NoopSpan
+    """
+    if not EXPORTERS:
+        return NOOP
+    return Span(name, parent, attributes)
+
+
+def export(finished):
+    """Passes a finished span to the exporters.
+
+    :type finished: Span
+    """
+    for exporter in EXPORTERS[:]:
+        try:
+            exporter.export(finished)
+        except Exception as error:
+            LOGGER.error('Exporting {} to {} failed: {}'.format(
+                finished, exporter, error))
+
+
+def bind(func):
+    """Returns func running with the current span as parent, for
+    passing functions to other threads.
+
+    :type func: callable
+    :rtype: callable
+    """
+    parent = current() if EXPORTERS else None
+    if parent is None:
+        return func
+
+    @wraps(func)
+    def run(*args, **kwargs):
+        spans = stack()
+        spans.append(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            spans.remove(parent)
+    return run
+
+
+class Exporter:
+    """Receives finished spans.
+
+    The base class discards them, subclasses override export.
+    """
+    def export(self, finished):
+        """Handles a finished span.
+
+        :type finished: Span
+        """
+        pass
+
+    def close(self):
+        """Flushes and releases resources."""
+        pass
+
+
+class InMemoryExporter(Exporter):
+    """Keeps finished spans in spans, for tests and inspection."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = []
+
+    def export(self, finished):
+        with self.lock:
+            self.spans.append(finished)
+
+    def clear(self):
+        """Forgets the recorded spans."""
+        with self.lock:
+            del self.spans[:]
+
+    def find(self, name):
+        """Returns the recorded spans called name.
+
+        :type name: str
+        :rtype: list
+        """
+        with self.lock:
+            return [recorded for recorded in self.spans
+                    if recorded.name == name]
+
+
+class JSONLinesExporter(Exporter):
+    """Appends every finished span as a line of json to a file."""
+    def __init__(self, path):
+        """Opens path for appending.
+
+        :type path: str
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a')
+
+    def export(self, finished):
+        line = json.dumps(finished.to_json(), default=str)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+
+class ChromeTraceExporter(Exporter):
+    """Writes the spans as complete events of the Chrome trace-event
+    format when closed, to be viewed in chrome://tracing or Perfetto.
+    """
+    def __init__(self, path):
+        """Collects spans for path.
+
+        :type path: str
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.events = []
+        self.pid = os.getpid()
+
+    def export(self, finished):
+        args = dict(finished.attributes)
+        if finished.error is not None:
+            args['error'] = finished.error
+        event = {
+            'name': finished.name,
+            'cat': 'paperwrap',
+            'ph': 'X',
+            'ts': finished.start * 1e6,
+            'dur': finished.duration * 1e6,
+            'pid': self.pid,
+            'tid': finished.thread,
+            'args': args
+            }
+        with self.lock:
+            self.events.append(event)
+
+    def close(self):
+        with self.lock:
+            events = self.events
+            self.events = []
+        if not events:
+            return
+        with open(self.path, 'w') as trace:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                      trace, default=str)
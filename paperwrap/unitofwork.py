@@ -0,0 +1,238 @@
+"""Unit of work collecting deletes, moves and tag changes of notes.
+
+License: MIT
+Author: Nelo Wallus, http://github.com/ntnn
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .batching import DEFAULT_MAX_SIZE, note_dicts
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+
+class BatchError(Exception):
+    """Raised by UnitOfWork.commit if requests failed.
+
+    failed holds (operation, notes, error) tuples, results the summary
+    of the changes which were applied.
+    """
+    def __init__(self, failed, results):
+        super().__init__('{} batched requests failed: {}'.format(
+            len(failed), failed[0][2]))
+        self.failed = failed
+        self.results = results
+
+
+def chunks(items, size):
+    """Splits items into lists of at most size items.
+
+    :type items: list
+    :type size: int
+    :rtype: list
+    """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class UnitOfWork:
+    """Records deletes, moves and tag changes of notes and sends them on
+    commit.
+
+    Deletes and moves are grouped by source notebook (and target
+    notebook) and sent through the multi-id endpoints in chunks of
+    chunk_size notes, all chunks in parallel. Tag changes have no
+    multi-id endpoint, they are pushed with one note update per note
+    after the moves. Local models are only changed for requests the
+    server confirmed.
+
+    Used as context manager the changes are committed when the block
+    ends without an exception and discarded otherwise.
+    """
+    def __init__(self, paperwork, chunk_size=DEFAULT_MAX_SIZE,
+                 workers=DEFAULT_WORKERS):
+        """Initializes an empty unit of work.
+
+        :type paperwork: models.Paperwork
+        :param int chunk_size: maximum number of notes per request
+        :param int workers: maximum number of parallel requests
+        """
+        self.paperwork = paperwork
+        self.api = paperwork.api
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.deletes = {}
+        # note ident -> (note, target notebook)
+        self.moves = {}
+        # note ident -> (note, tags to add, tags to remove)
+        self.tag_changes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            LOGGER.error('Discarding batch after {}'.format(exc_value))
+            self.discard()
+
+    def __len__(self):
+        return len(self.deletes) + len(self.moves) + len(self.tag_changes)
+
+    def delete(self, note):
+        """Records the deletion of note, replacing its other changes.
+
+        :type note: models.Note
+        """
+        self.deletes[note.ident] = note
+        self.moves.pop(note.ident, None)
+        self.tag_changes.pop(note.ident, None)
+
+    def move(self, note, notebook):
+        """Records moving note to notebook.
+
+        :type note: models.Note
+        :type notebook: models.Notebook
+        """
+        if note.ident in self.deletes:
+            return
+        if notebook is note.notebook:
+            self.moves.pop(note.ident, None)
+        else:
+            self.moves[note.ident] = (note, notebook)
+
+    def add_tags(self, note, tags):
+        """Records adding tags to note.
+
+        :type note: models.Note
+        :type tags: list or set
+        """
+        if note.ident in self.deletes:
+            return
+        _, add, remove = self.tag_changes.setdefault(
+            note.ident, (note, set(), set()))
+        add.update(tags)
+        remove.difference_update(tags)
+
+    def remove_tags(self, note, tags):
+        """Records removing tags from note.
+
+        :type note: models.Note
+        :type tags: list or set
+        """
+        if note.ident in self.deletes:
+            return
+        _, add, remove = self.tag_changes.setdefault(
+            note.ident, (note, set(), set()))
+        remove.update(tags)
+        add.difference_update(tags)
+
+    def discard(self):
+        """Forgets all recorded changes."""
+        self.deletes.clear()
+        self.moves.clear()
+        self.tag_changes.clear()
+
+    def requests(self):
+        """Returns the multi-id requests for deletes and moves as
+        (operation, notes, target notebook) tuples.
+
+        :rtype: list
+        """
+        groups = {}
+        for note in self.deletes.values():
+            groups.setdefault(
+                ('delete', note.notebook, None), []).append(note)
+        for note, notebook in self.moves.values():
+            groups.setdefault(
+                ('move', note.notebook, notebook), []).append(note)
+        return [
+            (operation, chunk, target)
+            for (operation, source, target), notes in groups.items()
+            for chunk in chunks(notes, self.chunk_size)]
+
+    def send(self, operation, notes, target):
+        """Sends one multi-id request.
+
+        :type operation: str
+        :type notes: list
+        :type target: models.Notebook or None
+        """
+        json = note_dicts(notes[0].notebook.ident, [
+            note.ident for note in notes])
+        if operation == 'delete':
+            return self.api.delete_notes(json)
+        return self.api.move_notes(json, target.ident)
+
+    def push_tags(self, note, tags):
+        """Pushes note with tags.
+
+        :type note: models.Note
+        :type tags: set
+        """
+        json = note.to_json()
+        json['tags'] = [tag.to_json() for tag in tags]
+        return self.api.update_note(json)
+
+    def commit(self):
+        """Sends the recorded changes and applies the confirmed ones to
+        the local models.
+
+        Returns the changed notes. Raises BatchError after all requests
+        were sent if some of them failed.
+        :rtype: dict
+        """
+        results = {'deleted': [], 'moved': [], 'tagged': []}
+        failed = []
+        requests = self.requests()
+        LOGGER.info('Committing {} changes in {} requests'.format(
+            len(self), len(requests) + len(self.tag_changes)))
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [
+                (request, executor.submit(self.send, *request))
+                for request in requests]
+            for (operation, notes, target), future in futures:
+                try:
+                    response = future.result()
+                except Exception as error:
+                    failed.append((operation, notes, error))
+                    continue
+                if response is None:
+                    failed.append((operation, notes, 'not confirmed'))
+                    continue
+                for note in notes:
+                    note.notebook.unindex_note(note)
+                    if operation == 'move':
+                        target.index_note(note)
+                results['deleted' if operation == 'delete' else 'moved'] \
+                    .extend(notes)
+
+            # tags are pushed after the moves, a note whose move failed
+            # is still updated in its old notebook
+            changes = [
+                (note, (note.tags | add) - remove)
+                for note, add, remove in self.tag_changes.values()]
+            futures = [
+                executor.submit(self.push_tags, note, tags)
+                for note, tags in changes]
+            for (note, tags), future in zip(changes, futures):
+                try:
+                    response = future.result()
+                except Exception as error:
+                    failed.append(('tag', [note], error))
+                    continue
+                if response is None:
+                    failed.append(('tag', [note], 'not confirmed'))
+                    continue
+                note.tags = tags
+                if isinstance(response, dict):
+                    note.updated_at = response.get(
+                        'updated_at', note.updated_at)
+                note.mark_clean()
+                results['tagged'].append(note)
+        self.discard()
+        if failed:
+            raise BatchError(failed, results)
+        return results
@@ -1,6 +1,9 @@
 """Class with utility functions."""
-from fuzzywuzzy import fuzz
+from fuzzywuzzy import fuzz, process
+from collections import OrderedDict
+import heapq
 import logging
+import threading
 
 try:
     isinstance('string', basestring)
@@ -9,6 +12,155 @@ except NameError:
 
 LOGGER = logging.getLogger(__name__)
 
+# choices scored per fuzzy query at most
+PREFILTER_SIZE = 100
+# queries cached per FuzzyIndex
+QUERY_CACHE_SIZE = 128
+# collections whose FuzzyIndex is kept by fuzzy_index
+INDEXES_SIZE = 16
+INDEXES = OrderedDict()
+INDEXES_LOCK = threading.Lock()
+
+
+def trigrams(text):
+    """Returns the set of lower case trigrams of text, padded so that
+    short words have trigrams as well.
+
+    :type text: str
+    :rtype: set
+    """
+    text = '  {} '.format(text.lower())
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FuzzyIndex:
+    """Fuzzy matching of titles.
+
+    Titles are split into trigrams once. A query is only scored against
+    the PREFILTER_SIZE choices sharing the most trigrams with it, which
+    are scored in one batch with the same fuzz.ratio as before. Results
+    of recent queries are cached.
+    """
+    def __init__(self, choices):
+        """Preprocesses the titles of choices.
+
+        :type choices: dict or list
+        """
+        if isinstance(choices, dict):
+            choices = list(choices.values())
+        self.choices = choices
+        self.titles = [choice.title for choice in choices]
+        # trigram -> positions of the choices containing it
+        self.grams = {}
+        for position, title in enumerate(self.titles):
+            for gram in trigrams(title):
+                self.grams.setdefault(gram, []).append(position)
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.choices)
+
+    def candidates(self, query, size):
+        """Returns the positions of up to size choices sharing the most
+        trigrams with query, in the order of the choices.
+
+        Trigrams contained in more than half of the choices are ignored
+        unless the query has no other ones.
+        :type query: str
+        :type size: int
+        :rtype: list
+        """
+        postings = [
+            self.grams[gram] for gram in trigrams(query) if gram in self.grams]
+        rare = [
+            posting for posting in postings
+            if len(posting) * 2 <= len(self.choices)]
+        counts = {}
+        for posting in rare or postings:
+            for position in posting:
+                counts[position] = counts.get(position, 0) + 1
+        if len(counts) > size:
+            counts = dict.fromkeys(heapq.nlargest(
+                size, counts, key=lambda position: (
+                    counts[position], -position)))
+        return sorted(counts)
+
+    def top(self, query, k=1):
+        """Returns up to k (choice, score) tuples, best first.
+
+        :type query: str
+        :type k: int
+        :rtype: list
+        """
+        key = (query, k)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        positions = self.candidates(query, max(PREFILTER_SIZE, k))
+        if not positions:
+            # nothing in common, score everything
+            positions = range(len(self.choices))
+        scored = process.extractBests(
+            query, {position: self.titles[position] for position in positions},
+            processor=None, scorer=fuzz.ratio, score_cutoff=1, limit=k)
+        result = [(self.choices[position], score)
+                  for _, score, position in scored]
+        LOGGER.info('Fuzzy matched {} against {} of {} choices: {}'.format(
+            query, len(positions), len(self.choices), result))
+        with self.lock:
+            self.cache[key] = result
+            while len(self.cache) > QUERY_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return result
+
+    def best(self, query):
+        """Returns the best matching choice or None.
+
+        :type query: str
+        """
+        result = self.top(query, 1)
+        return result[0][0] if result else None
+
+
+def fuzzy_index(choices):
+    """Returns the FuzzyIndex for choices, built on the first call after
+    choices was changed, see invalidate_fuzzy.
+
+    :type choices: dict or list
+    :rtype: FuzzyIndex
+    """
+    key = id(choices)
+    with INDEXES_LOCK:
+        entry = INDEXES.get(key)
+        # the entry keeps choices alive, so its id is not reused
+        if entry is not None and entry[0] is choices:
+            INDEXES.move_to_end(key)
+            return entry[1]
+    index = FuzzyIndex(choices)
+    with INDEXES_LOCK:
+        INDEXES[key] = (choices, index)
+        while len(INDEXES) > INDEXES_SIZE:
+            INDEXES.popitem(last=False)
+    return index
+
+
+def invalidate_fuzzy(choices=None):
+    """Drops the FuzzyIndex of choices, or of all collections if choices
+    is None. Called whenever items are added to or removed from a
+    collection or their titles change.
+
+    :type choices: dict or list
+    """
+    if not INDEXES:
+        return
+    with INDEXES_LOCK:
+        if choices is None:
+            INDEXES.clear()
+        else:
+            INDEXES.pop(id(choices), None)
+
 
 def fuzzy_find(title, choices):
     """Fuzzy find for title in choices. Returns highest match.
@@ -17,15 +169,19 @@ def fuzzy_find(title, choices):
     :type choices: dict or list
     :rtype: Tag or Note or Notebook
     """
-    if isinstance(choices, dict):
-        choices = list(choices.values())
-    top_choice = (0, None)
-    for choice in choices:
-        val = fuzz.ratio(choice.title, title)
-        LOGGER.info('{} to {}: {}'.format(choice.title, title, val))
-        if val > top_choice[0]:
-            top_choice = (val, choice)
-    return top_choice[1]
+    return fuzzy_index(choices).best(title)
+
+
+def fuzzy_top(title, choices, k=5):
+    """Fuzzy find for title in choices. Returns up to k (choice, score)
+    tuples, best first.
+
+    :type title: str
+    :type choices: dict or list
+    :type k: int
+    :rtype: list
+    """
+    return fuzzy_index(choices).top(title, k)
 
 
 def find(key, coll):
@@ -5,15 +5,35 @@ Author: Nelo Wallus, http://github.com/ntnn
 """
 
 import logging
-import json
+import mimetypes
+import os
+import threading
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
 from base64 import b64encode
+from collections import OrderedDict
+from concurrent.futures import Future
+from . import batching, cache, codec, metrics, resilience, slowlog, tracing
 
 LOGGER = logging.getLogger(__name__)
 
 __version__ = '0.14.2'
 API_VERSION = '/api/v1/'
 DEFAULT_AGENT = 'paperwrap api wrapper v{}'.format(__version__)
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+# (connect, read) timeout in seconds applied to every request
+DEFAULT_TIMEOUT = (5, 60)
+# buffer size used for streaming attachments
+CHUNK_SIZE = 64 * 1024
+# suffix of partially downloaded attachments
+PART_SUFFIX = '.part'
+# errors after which idempotent requests are sent again, including
+# connections dropped while the body was read
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError)
 
 API_PATH = {
     'notebooks':      'notebooks',
@@ -53,55 +73,234 @@ def concatenate_ids(coll):
     return ','.join([str(item['id']) for item in coll])
 
 
-class API:
-    """Class representing the api-wraper."""
-    def __init__(self, host, user_agent=DEFAULT_AGENT):
-        """Api instance.
+def group_by_notebook(notes):
+    """Groups note dicts by their notebook, keeping the order of the first
+    note of each notebook.
 
-        :type host: str
-        :type user_agent: str
+    :type notes: list
+    :rtype: OrderedDict
+    """
+    groups = OrderedDict()
+    for note in notes:
+        groups.setdefault(note['notebook_id'], []).append(note)
+    return groups
+
+
+def as_list(response):
+    """Returns the response of a multi-id request as list.
+
+    :type response: list or dict or None
+    :rtype: list
+    """
+    if response is None:
+        return []
+    return response if isinstance(response, list) else [response]
+
+
+def partial_size(path):
+    """Returns the size of the partial download of path or 0 if none
+    exists.
+
+    :type path: str
+    :rtype: int
+    """
+    try:
+        return os.path.getsize(path + PART_SUFFIX)
+    except OSError:
+        return 0
+
+
+def range_headers(headers, offset):
+    """Returns a copy of headers requesting the content after offset.
+
+    :type headers: dict
+    :type offset: int
+    :rtype: dict
+    """
+    headers = dict(headers)
+    if offset:
+        headers['Range'] = 'bytes={}-'.format(offset)
+    return headers
+
+
+class MultipartEncoder:
+    """File-like multipart/form-data body containing a single file.
+
+    The file is read from disk in chunks while the body is sent, so only
+    a small buffer is kept in memory regardless of the file size.
+    """
+    def __init__(self, field, path, progress=None):
+        """Opens the file at path, close() must be called afterwards.
+
+        :param str field: Name of the form field.
+        :type path: str
+        :param callable progress: Called with the number of bytes read
+            and the total size of the body after each read.
         """
-        self.headers = {'User-Agent': user_agent}
-        self.host = host if 'http://' in host else 'http://' + host
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(path).replace('"', '%22')
+        mimetype = mimetypes.guess_type(path)[0] or \
+            'application/octet-stream'
+        self.head = (
+            '--{}\r\n'
+            'Content-Disposition: form-data; name="{}"; filename="{}"\r\n'
+            'Content-Type: {}\r\n\r\n').format(
+                self.boundary, field, filename, mimetype).encode('utf-8')
+        self.tail = '\r\n--{}--\r\n'.format(self.boundary).encode('utf-8')
+        self.file = open(path, 'rb')
+        self.len = len(self.head) + os.fstat(self.file.fileno()).st_size + \
+            len(self.tail)
+        self.position = 0
+        self.progress = progress
+
+    def __len__(self):
+        return self.len
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def content_type(self):
+        """Value of the Content-Type header for this body.
+
+        :rtype: str
+        """
+        return 'multipart/form-data; boundary={}'.format(self.boundary)
 
-    def test_connection(self):
-        """Tests connection.  Returns false if connection fails.
+    def read(self, size=-1):
+        """Reads up to size bytes of the body, everything if size is
+        negative.
 
-        :rtype: bool
+        :type size: int
+        :rtype: bytes
         """
-        if self.get('notebooks'):
-            return True
+        if size is None or size < 0:
+            size = self.len - self.position
+        chunk = b''
+        file_end = self.len - len(self.tail)
+        if self.position < len(self.head):
+            chunk += self.head[self.position:self.position + size]
+        if len(chunk) < size and self.position + len(chunk) < file_end:
+            chunk += self.file.read(size - len(chunk))
+        if len(chunk) < size and self.position + len(chunk) >= file_end:
+            start = self.position + len(chunk) - file_end
+            chunk += self.tail[start:start + size - len(chunk)]
+        self.position += len(chunk)
+        if self.progress:
+            self.progress(self.position, self.len)
+        return chunk
+
+    def close(self):
+        """Closes the underlying file."""
+        self.file.close()
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one call, whose
+    result or exception is shared by all callers."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.counters = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, func):
+        """Calls func unless a call with the same key is in flight, in
+        which case its result is awaited and returned instead.
+
+        :type key: hashable
+        :type func: callable
+        """
+        with self.lock:
+            self.counters['calls'] += 1
+            leader = key not in self.calls
+            if leader:
+                self.calls[key] = Future()
+            else:
+                self.counters['coalesced'] += 1
+            future = self.calls[key]
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
         else:
-            return False
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
 
-    def request(self, method, keyword, *ids, **data):
-        """Sends a request to the host and returns the parsed json data
-        if successfull.
+    def stats(self):
+        """Returns the number of calls, how many of them were coalesced
+        and how many distinct calls are in flight.
 
-        :type method: str
-        :type keyword: str
-        :rtype: dict or None
+        :rtype: dict
         """
-        uri = self.host + API_VERSION + API_PATH[keyword].format(*ids)
+        with self.lock:
+            stats = dict(self.counters)
+            stats['in_flight'] = len(self.calls)
+        return stats
 
-        if data:
-            self.headers['Content-Type'] = 'application/json'
-            data = json.dumps(data)
 
-        LOGGER.info(
-            '{} request to {}:\ndata: {}\nheaders: {}'.format(
-                method, uri, data, self.headers))
+class BaseAPI:
+    """Endpoints of the api shared by API and asyncwrapper.AsyncAPI.
 
-        res = requests.request(
-            method,
-            uri,
-            data=data,
-            headers=self.headers).text
+    Subclasses implement request, which sends the request and returns
+    the parsed response or a coroutine returning it, as well as the
+    endpoints which depend on how requests are sent.
+    """
+    def configure(self, host, user_agent, timeout, keep_alive, json_codec,
+                  metrics_registry):
+        """Sets the attributes used by the endpoints, with caching,
+        coalescing, batching and the slow request log disabled.
 
-        if keyword == 'attachment_raw':
-            return res
+        See API.__init__ for the parameters.
+        """
+        self.headers = {'User-Agent': user_agent}
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+        self.host = host if 'http://' in host else 'http://' + host
+        self.timeout = timeout
+        self.cache = None
+        self.metrics = metrics_registry if metrics_registry is not None \
+            else metrics.Registry()
+        self.codec = json_codec or codec.default_codec()
+        self.single_flight = None
+        self.batcher = None
+        self.slow_log = None
+
+    def uri(self, keyword, *ids):
+        """Returns full uri of the resource.
+
+        :type keyword: str
+        :rtype: str
+        """
+        return self.host + API_VERSION + API_PATH[keyword].format(*ids)
+
+    def building(self):
+        """Returns a context manager for sending requests and building
+        models from their responses. The time after the last request
+        sent in it is logged as model phase of that request.
 
-        json_res = json.loads(res)
+        :rtype: slowlog.Building or slowlog.NoBuilding
+        """
+        if self.slow_log is None:
+            return slowlog.NO_BUILDING
+        return self.slow_log.building()
+
+    def parse_response(self, content):
+        """Parses the json body of a response and returns its payload
+        if the request was successfull.
+
+        :type content: bytes
+        :rtype: dict or list or None
+        """
+        json_res = self.codec.loads(content)
         if json_res['success'] is False:
             LOGGER.error('Unsuccessful request: {}'.format(
                 json_res['errors']))
@@ -214,6 +413,8 @@ class API:
         :type note_id: int
         :rtype: dict
         """
+        if self.batcher is not None:
+            return self.batcher.get_note(notebook_id, note_id).result()
         return self.get_notes(notebook_id, [note_id])
 
     def get_notes(self, notebook_id, note_ids):
@@ -236,53 +437,14 @@ class API:
         """
         return self.put(note, 'note', note['notebook_id'], note['id'])
 
-    def delete_note(self, note):
-        """Delete note.
-
-        :type note: dict
-        :rtype: dict
-        """
-        return self.delete_notes([note])[0]
-
-    def delete_notes(self, notes):
-        """Delete notes.
-
-        :type note: list
-        :rtype: list
-        """
-        return self.delete(
-            'note',
-            notes[0]['notebook_id'],
-            concatenate_ids(notes))
-
-    def move_note(self, note, new_notebook_id):
-        """Moves note to new_notebook_id.
-
-        :type note: dict
-        :type new_notebook_id: int
-        :rtype: dict
-        """
-        return self.move_notes([note], new_notebook_id)[0]
-
-    def move_notes(self, notes, new_notebook_id):
-        """Moves notes to new_notebook_id.
-
-        :type notes: list
-        :type new_notebook_id: int
-        :rtype: list
-        """
-        return self.get(
-            'move',
-            notes[0]['notebook_id'],
-            concatenate_ids(notes),
-            new_notebook_id)
-
     def list_note_versions(self, note):
         """Returns a list of versions of given note.
 
         :type note: dict
         :rtype: list
         """
+        if self.batcher is not None:
+            return self.batcher.list_note_versions(note).result()
         return self.list_notes_versions([note])
 
     def list_notes_versions(self, notes):
@@ -350,49 +512,23 @@ class API:
             version_id,
             attachment_id)
 
-    def download_note_attachment(self, note, attachment_id, path):
+    def download_note_attachment(self, note, attachment_id, path,
+                                 progress=None):
         """Downloads attachment to specified path.
 
         Returns true in case of success, false otherwise.
         :type note: dict
         :type attachment_id: int
         :type path: str
+        :param callable progress: See download_note_version_attachment.
         :rtype: bool
         """
         return self.download_note_version_attachment(
             note,
             0,
             attachment_id,
-            path)
-
-    def download_note_version_attachment(
-            self,
-            note,
-            version_id,
-            attachment_id,
-            path):
-        """Downloads attachment of note version to specified path.
-
-        Returns true in case of success, false otherwise.
-        :type note: dict
-        :type version_id: int
-        :type attachment_id: int
-        :type path: str
-        :rtype: bool
-        """
-        attachment = self.get(
-            'attachment_raw',
-            note['notebook_id'],
-            note['id'],
-            version_id,
-            attachment_id)
-        try:
-            with open(path, 'wb') as f:
-                f.write(attachment)
-            return True
-        except IOError as ioerror:
-            LOGGER.error(ioerror)
-        return False
+            path,
+            progress)
 
     def delete_note_attachment(self, note, attachment_id):
         """Deletes attachment with attachment_id on note.
@@ -418,22 +554,6 @@ class API:
             version_id,
             attachment_id)
 
-    def upload_attachment(self, note, path):
-        """Uploads an attachment.
-
-        :type note: dict
-        :type path: str
-        :rtype: dict
-        """
-        LOGGER.info('Uploading file at {} to {}'.format(path, note))
-        return requests.post(
-            self.host + API_VERSION + API_PATH['attachments'].format(
-                note['notebook_id'],
-                note['id'],
-                0),
-            files={'file': open(path, 'rb')},
-            headers=self.headers)
-
     def list_tags(self):
         """Returns all tags.
 
@@ -474,3 +594,511 @@ class API:
         if keyword:
             return self.get('i18nkey', keyword)
         return self.get('i18n')
+
+
+class API(BaseAPI):
+    """Class representing the api-wraper."""
+    def __init__(self, host, user_agent=DEFAULT_AGENT,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False,
+                 timeout=DEFAULT_TIMEOUT,
+                 keep_alive=True,
+                 response_cache=None,
+                 coalesce=True,
+                 batch_window=None,
+                 batch_size=batching.DEFAULT_MAX_SIZE,
+                 retries=resilience.DEFAULT_RETRIES,
+                 backoff=resilience.DEFAULT_BACKOFF,
+                 breaker_threshold=resilience.DEFAULT_FAILURE_THRESHOLD,
+                 breaker_timeout=resilience.DEFAULT_RESET_TIMEOUT,
+                 json_codec=None,
+                 metrics_registry=None,
+                 slow_request_threshold=None,
+                 slow_request_sample_rate=slowlog.DEFAULT_SAMPLE_RATE):
+        """Api instance.
+
+        All requests share one session and thereby one connection pool,
+        which is safe to use from multiple threads.
+
+        :type host: str
+        :type user_agent: str
+        :param int pool_connections: Number of host pools to cache.
+        :param int pool_maxsize: Maximum number of connections kept
+            open per host.
+        :param bool pool_block: If true no more than pool_maxsize
+            connections per host are opened at the same time, additional
+            requests wait for a free connection.
+        :param timeout: Timeout in seconds for each request, either a
+            float or a (connect, read) tuple.
+        :param bool keep_alive: If false connections are closed after
+            each request.
+        :param cache.ResponseCache response_cache: If given GET responses
+            are cached and revalidated, modifying requests invalidate the
+            affected entries.
+        :param bool coalesce: If true identical GET requests in flight
+            at the same time are sent only once, see SingleFlight.
+        :param float batch_window: If given get_note, delete_note,
+            move_note and list_note_versions calls issued within this many
+            seconds for the same notebook are sent as one multi-id request,
+            see batching.BatchDispatcher.
+        :param int batch_size: Maximum number of notes per batch.
+        :param int retries: How often idempotent requests are retried
+            after connection errors or 429/502/503/504 responses.
+        :param float backoff: Base delay in seconds between retries.
+        :param int breaker_threshold: Consecutive failures after which
+            requests fail fast with resilience.CircuitOpenError, 0 disables
+            the circuit breaker.
+        :param float breaker_timeout: Seconds until a trial request is
+            sent to a host with an open circuit.
+        :param codec.JSONCodec json_codec: Codec for request and response
+            bodies, defaults to the fastest installed one.
+        :param metrics.Registry metrics_registry: Registry recording the
+            requests, a new one if None. It can be shared by several
+            instances.
+        :param float slow_request_threshold: If given requests taking at
+            least this many seconds are logged, see log_slow_requests.
+        :param float slow_request_sample_rate: Fraction of the requests
+            whose network phases are measured for the slow request log.
+        """
+        self.configure(host, user_agent, timeout, keep_alive, json_codec,
+                       metrics_registry)
+        self.cache = response_cache
+        self.single_flight = SingleFlight() if coalesce else None
+        self.retry = resilience.RetryPolicy(retries, backoff)
+        self.breaker = None
+        if breaker_threshold:
+            self.breaker = resilience.CircuitBreaker(
+                breaker_threshold, breaker_timeout)
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = batching.BatchDispatcher(
+                self, batch_window, batch_size)
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        if slow_request_threshold is not None:
+            self.log_slow_requests(
+                slow_request_threshold, slow_request_sample_rate)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections."""
+        self.session.close()
+
+    def pool_stats(self):
+        """Returns statistics of the connection pools, one entry per host.
+
+        connections: connections opened since the pool was created
+        requests: requests sent through the pool
+        idle: open connections currently waiting for reuse
+        maxsize: maximum number of connections kept open
+        :rtype: dict
+        """
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['{}://{}:{}'.format(pool.scheme, pool.host, pool.port)] = {
+                'connections': pool.num_connections,
+                'requests': pool.num_requests,
+                'idle': pool.pool.qsize() if pool.pool else 0,
+                'maxsize': pool.pool.maxsize if pool.pool else 0
+                }
+        return stats
+
+    def send(self, method, uri, timing=None, retry=True, **kwargs):
+        """Sends a request through the session and returns the response.
+
+        Failed idempotent requests are retried according to self.retry,
+        while self.breaker is open resilience.CircuitOpenError is raised
+        without sending the request. Every attempt is recorded by the
+        breaker, as failure if it raised or returned a 5xx status.
+        :type method: str
+        :type uri: str
+        :param slowlog.Timing timing: If given the start of each attempt
+            is recorded.
+        :param bool retry: If false the request is sent only once, for
+            requests which are not idempotent despite their method.
+        :rtype: requests.Response
+        """
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_request()
+            if timing is not None:
+                timing.attempt()
+            res = None
+            failed = True
+            try:
+                res = self.session.request(
+                    method, uri, timeout=self.timeout, **kwargs)
+                failed = res.status_code >= 500
+            except requests.RequestException as error:
+                if not retry or not isinstance(error, RETRY_ERRORS) or \
+                        not self.retry.should_retry(method, attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+                LOGGER.error('{} {} failed: {}, retrying in {:.2f}s'.format(
+                    method, uri, error, delay))
+            finally:
+                # also reached by other exceptions, so a trial request
+                # always closes or reopens the circuit
+                if self.breaker is not None:
+                    if failed:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+            if res is not None:
+                if not retry or not self.retry.should_retry(
+                        method, attempt, res.status_code):
+                    return res
+                delay = self.retry.delay(
+                    attempt, res.headers.get('Retry-After'))
+                LOGGER.error('{} {} returned {}, retrying in {:.2f}s'.format(
+                    method, uri, res.status_code, delay))
+                res.close()
+            self.retry.sleep(delay)
+            attempt += 1
+
+    def timed_send(self, timing, method, uri, **kwargs):
+        """Sends a request like send and adds the network phases to
+        timing.
+
+        Sampled requests are streamed to tell the time to the first byte
+        from the transfer of the body. The network phases cover the last
+        attempt, earlier attempts and backoff are the retry phase.
+        :type timing: slowlog.Timing
+        :type method: str
+        :type uri: str
+        :rtype: requests.Response
+        """
+        if not timing.sampled:
+            res = self.send(method, uri, timing, **kwargs)
+            timing.status = res.status_code
+            timing.phases['network'] = \
+                time.perf_counter() - timing.attempted
+            return res
+        res = self.send(method, uri, timing, stream=True, **kwargs)
+        received = time.perf_counter()
+        connect = slowlog.connect_time()
+        timing.status = res.status_code
+        timing.phases['connect'] = connect
+        timing.phases['ttfb'] = received - timing.attempted - connect
+        # reading the body of the streamed response is the transfer
+        _ = res.content
+        timing.phases['transfer'] = time.perf_counter() - received
+        return res
+
+    def log_slow_requests(self, threshold=slowlog.DEFAULT_THRESHOLD,
+                          sample_rate=slowlog.DEFAULT_SAMPLE_RATE):
+        """Logs requests taking at least threshold seconds with the time
+        spent in their phases to the paperwrap.slowlog logger.
+
+        Connect (including DNS lookup and TLS), time to first byte and
+        transfer are measured for a fraction sample_rate of the requests,
+        JSON decoding and model construction (see building) for all.
+        :type threshold: float
+        :type sample_rate: float
+        """
+        slowlog.install(self.adapter)
+        self.slow_log = slowlog.SlowRequestLog(threshold, sample_rate)
+
+    def test_connection(self):
+        """Tests connection.  Returns false if connection fails.
+
+        :rtype: bool
+        """
+        if self.get('notebooks'):
+            return True
+        else:
+            return False
+
+    def request(self, method, keyword, *ids, **data):
+        """Sends a request to the host and returns the parsed json data
+        if successfull.
+
+        Identical GET requests issued while one is in flight wait for and
+        share its result.
+        :type method: str
+        :type keyword: str
+        :rtype: dict or None
+        """
+        if self.single_flight is not None and method == 'get' and \
+                keyword != 'move':
+            return self.single_flight.do(
+                cache.cache_key(keyword, ids),
+                lambda: self.send_request(method, keyword, *ids))
+        return self.send_request(method, keyword, *ids, **data)
+
+    def send_request(self, method, keyword, *ids, **data):
+        """Sends a request to the host, see request.
+
+        The request is traced in a span called http.
+        :type method: str
+        :type keyword: str
+        :rtype: dict or None
+        """
+        with tracing.span('http', method=method, keyword=keyword) as span:
+            uri = self.uri(keyword, *ids)
+            headers = dict(self.headers)
+
+            key = entry = None
+            if self.cache is not None and method == 'get' and \
+                    keyword in cache.CACHEABLE:
+                key = cache.cache_key(keyword, ids)
+                entry = self.cache.lookup(key)
+                if entry is not None:
+                    if self.cache.is_fresh(entry):
+                        LOGGER.info('Cache hit for {}'.format(uri))
+                        span.set(cache='hit')
+                        return entry.value
+                    headers.update(entry.validators())
+
+            if data:
+                headers['Content-Type'] = 'application/json'
+                data = self.codec.dumps(data)
+
+            LOGGER.info(
+                '{} request to {}:\ndata: {}\nheaders: {}'.format(
+                    method, uri, data, headers))
+
+            retry = keyword not in resilience.NON_IDEMPOTENT_KEYWORDS
+            timing = None
+            if self.slow_log is not None:
+                timing = self.slow_log.start(method, keyword, ids)
+            try:
+                try:
+                    with self.metrics.measure(keyword, method) \
+                            as measurement:
+                        if timing is None:
+                            res = self.send(
+                                method, uri, retry=retry, data=data,
+                                headers=headers)
+                        else:
+                            res = self.timed_send(
+                                timing, method, uri, retry=retry, data=data,
+                                headers=headers)
+                        measurement.status = res.status_code
+                        measurement.request_bytes = len(data) if data else 0
+                        measurement.response_bytes = len(res.content)
+                finally:
+                    if self.cache is not None and (
+                            method != 'get' or keyword == 'move'):
+                        self.cache.invalidate(keyword, ids)
+                if span:
+                    span.set(
+                        status=res.status_code,
+                        request_bytes=len(data) if data else 0,
+                        response_bytes=len(res.content),
+                        server_time=res.elapsed.total_seconds())
+
+                if entry is not None and res.status_code == 304:
+                    LOGGER.info('Cache revalidated for {}'.format(uri))
+                    span.set(cache='revalidated')
+                    return self.cache.revalidated(key, entry)
+
+                if keyword == 'attachment_raw':
+                    return res.content
+
+                if timing is None:
+                    response = self.parse_response(res.content)
+                else:
+                    decoding = time.perf_counter()
+                    response = self.parse_response(res.content)
+                    timing.phases['decode'] = \
+                        time.perf_counter() - decoding
+            except Exception as error:
+                if timing is not None:
+                    timing.error = '{}: {}'.format(
+                        type(error).__name__, error)
+                raise
+            finally:
+                if timing is not None:
+                    self.slow_log.finish(timing)
+
+            if key is not None and response is not None:
+                self.cache.store(
+                    key,
+                    response,
+                    len(res.content),
+                    res.headers.get('ETag'),
+                    res.headers.get('Last-Modified'))
+            return response
+
+    def delete_note(self, note):
+        """Delete note.
+
+        :type note: dict
+        :rtype: dict
+        """
+        if self.batcher is not None:
+            return self.batcher.delete_note(note).result()
+        return self.delete_notes([note])[0]
+
+    def delete_notes(self, notes):
+        """Delete notes, one request per notebook.
+
+        :type note: list
+        :rtype: list
+        """
+        groups = group_by_notebook(notes)
+        if len(groups) == 1:
+            return self.delete(
+                'note',
+                notes[0]['notebook_id'],
+                concatenate_ids(notes))
+        return [
+            deleted for notebook_id, group in groups.items()
+            for deleted in as_list(self.delete(
+                'note', notebook_id, concatenate_ids(group)))]
+
+    def move_note(self, note, new_notebook_id):
+        """Moves note to new_notebook_id.
+
+        :type note: dict
+        :type new_notebook_id: int
+        :rtype: dict
+        """
+        if self.batcher is not None:
+            return self.batcher.move_note(note, new_notebook_id).result()
+        return self.move_notes([note], new_notebook_id)[0]
+
+    def move_notes(self, notes, new_notebook_id):
+        """Moves notes to new_notebook_id, one request per notebook.
+
+        :type notes: list
+        :type new_notebook_id: int
+        :rtype: list
+        """
+        groups = group_by_notebook(notes)
+        if len(groups) == 1:
+            return self.get(
+                'move',
+                notes[0]['notebook_id'],
+                concatenate_ids(notes),
+                new_notebook_id)
+        return [
+            moved for notebook_id, group in groups.items()
+            for moved in as_list(self.get(
+                'move', notebook_id, concatenate_ids(group),
+                new_notebook_id))]
+
+    def download_note_version_attachment(
+            self,
+            note,
+            version_id,
+            attachment_id,
+            path,
+            progress=None,
+            resume=True):
+        """Downloads attachment of note version to specified path.
+
+        The file is streamed in chunks of CHUNK_SIZE to path + PART_SUFFIX,
+        which is renamed to path once complete. A partial file left by an
+        aborted download is resumed through a HTTP range request. The
+        download is traced in a span called http.
+
+        Returns true in case of success, false otherwise.
+        :type note: dict
+        :type version_id: int
+        :type attachment_id: int
+        :type path: str
+        :param callable progress: Called with the number of bytes written
+            and the total size (None if unknown) after each chunk.
+        :param bool resume: If false partial downloads are discarded.
+        :rtype: bool
+        """
+        uri = self.uri(
+            'attachment_raw',
+            note['notebook_id'],
+            note['id'],
+            version_id,
+            attachment_id)
+        offset = partial_size(path) if resume else 0
+        LOGGER.info('Downloading {} to {} from byte {}'.format(
+            uri, path, offset))
+        try:
+            with tracing.span('http', method='get', keyword='attachment_raw',
+                              offset=offset) as span, \
+                    self.metrics.measure('attachment_raw', 'get') \
+                    as measurement, self.send(
+                        'get',
+                        uri,
+                        headers=range_headers(self.headers, offset),
+                        stream=True) as res:
+                measurement.status = res.status_code
+                span.set(status=res.status_code)
+                if res.status_code == 416 and offset:
+                    LOGGER.info('Range not satisfiable, restarting download')
+                    res.close()
+                    return self.download_note_version_attachment(
+                        note, version_id, attachment_id, path,
+                        progress, resume=False)
+                res.raise_for_status()
+                if res.status_code != 206:
+                    offset = 0
+                length = res.headers.get('Content-Length')
+                total = offset + int(length) if length else None
+                with open(path + PART_SUFFIX, 'ab' if offset else 'wb') as f:
+                    for chunk in res.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        measurement.response_bytes += len(chunk)
+                        if progress:
+                            progress(offset, total)
+                span.set(response_bytes=measurement.response_bytes)
+            os.replace(path + PART_SUFFIX, path)
+            return True
+        except (IOError, requests.RequestException) as error:
+            LOGGER.error(error)
+        return False
+
+    def upload_attachment(self, note, path, progress=None):
+        """Uploads an attachment and returns it.
+
+        The file is streamed from disk, see MultipartEncoder. Cached
+        responses of the notebook of note are invalidated like for other
+        modifying requests. The upload is traced in a span called http.
+        :type note: dict
+        :type path: str
+        :param callable progress: Called with the number of bytes sent
+            and the total size of the request body.
+        :rtype: dict
+        """
+        LOGGER.info('Uploading file at {} to {}'.format(path, note))
+        ids = (note['notebook_id'], note['id'], 0)
+        try:
+            with tracing.span('http', method='post', keyword='attachments') \
+                    as span, MultipartEncoder('file', path, progress) \
+                    as body, self.metrics.measure('attachments', 'post') \
+                    as measurement:
+                headers = dict(self.headers)
+                headers['Content-Type'] = body.content_type
+                res = self.send(
+                    'post',
+                    self.uri('attachments', *ids),
+                    data=body,
+                    headers=headers)
+                measurement.status = res.status_code
+                measurement.request_bytes = len(body)
+                measurement.response_bytes = len(res.content)
+                span.set(
+                    status=res.status_code,
+                    request_bytes=len(body),
+                    response_bytes=len(res.content))
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate('attachments', ids)
+        return self.parse_response(res.content)
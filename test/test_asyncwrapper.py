@@ -0,0 +1,176 @@
+import os
+import tempfile
+import unittest
+from json import dumps
+from paperwrap import asyncwrapper, models, slowlog
+from test_data import *
+
+try:
+    from unittest.mock import patch, AsyncMock
+except ImportError:
+    from mock import patch, AsyncMock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+class TestAsyncAPI(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.response = notebooks
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.api = asyncwrapper.AsyncAPI(
+            'http://{}:{}'.format(self.server.host, self.server.port),
+            agent,
+            concurrency=2)
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await self.server.close()
+
+    async def handle(self, request):
+        self.requests.append((request.method, request.path))
+        return web.Response(text=dumps({
+            'success': True,
+            'response': self.response
+            }))
+
+    async def test_request(self):
+        response = await self.api.list_notebooks()
+        self.assertEqual(response, ret['notebooks'])
+        self.assertEqual(self.requests, [('GET', '/api/v1/notebooks')])
+
+    async def test_test_connection(self):
+        self.assertTrue(await self.api.test_connection())
+
+    async def test_get_note(self):
+        self.response = note
+        response = await self.api.get_note(notebook_id, note_id)
+        self.assertEqual(response, note)
+        self.assertEqual(
+            self.requests,
+            [('GET', '/api/v1/notebooks/{}/notes/{}'.format(
+                notebook_id, note_id))])
+
+    async def test_delete_note(self):
+        self.response = [note]
+        self.assertEqual(await self.api.delete_note(note), note)
+        self.assertEqual(self.requests[0][0], 'DELETE')
+
+    async def test_delete_notes_notebooks(self):
+        other = dict(note2, notebook_id=notebook2_id)
+        self.response = [note]
+        self.assertEqual(await self.api.delete_notes([note, other]),
+                         [note, note])
+        self.assertEqual(sorted(self.requests), sorted([
+            ('DELETE', '/api/v1/notebooks/{}/notes/{}'.format(
+                notebook_id, note_id)),
+            ('DELETE', '/api/v1/notebooks/{}/notes/{}'.format(
+                notebook2_id, note2_id))]))
+
+    async def test_move_notes_notebooks(self):
+        other = dict(note2, notebook_id=notebook2_id)
+        self.response = note
+        self.assertEqual(
+            await self.api.move_notes([note, other], new_notebook_id),
+            [note, note])
+        self.assertEqual(sorted(self.requests), sorted([
+            ('GET', '/api/v1/notebooks/{}/notes/{}/move/{}'.format(
+                notebook_id, note_id, new_notebook_id)),
+            ('GET', '/api/v1/notebooks/{}/notes/{}/move/{}'.format(
+                notebook2_id, note2_id, new_notebook_id))]))
+
+    async def test_attachments(self):
+        run_blocking = asyncwrapper.run_blocking
+        blocking = []
+
+        async def record(func, *args):
+            blocking.append(func)
+            return await run_blocking(func, *args)
+        self.response = attachment
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('paperwrap.asyncwrapper.run_blocking', record):
+            path = os.path.join(tmp, attachment_file)
+            self.assertTrue(await self.api.download_note_attachment(
+                note, attachment_id, path))
+            with open(path) as f:
+                self.assertIn(attachment_file, f.read())
+            self.assertIn(os.replace, blocking)
+            del blocking[:]
+            self.assertEqual(
+                await self.api.upload_attachment(note, path), attachment)
+        self.assertEqual(blocking[0].__name__, 'MultipartEncoder')
+        self.assertEqual(self.requests[-1], (
+            'POST', '/api/v1/notebooks/{}/notes/{}/versions/0/attachments'
+            .format(notebook_id, note_id)))
+
+    def test_init(self):
+        self.assertEqual(self.api.headers, {'User-Agent': agent})
+        self.assertIsNone(self.api.cache)
+        self.assertIsNone(self.api.single_flight)
+        self.assertIsNone(self.api.batcher)
+
+    def test_sync_methods(self):
+        for name in ('send', 'timed_send', 'log_slow_requests', 'adapter',
+                     'retry', 'breaker'):
+            self.assertFalse(hasattr(self.api, name))
+        self.assertIs(self.api.building(), slowlog.NO_BUILDING)
+
+    async def test_context_manager(self):
+        self.assertFalse(hasattr(self.api, '__enter__'))
+        async with self.api as api:
+            await api.list_tags()
+            self.assertIsNotNone(api.session)
+        self.assertIsNone(self.api.session)
+
+    async def test_concurrency(self):
+        await self.api.list_tags()
+        self.assertEqual(self.api.pool_stats(),
+                         {'concurrency': 2, 'in_flight': 0})
+
+
+class TestPaperworkAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+        self.api = asyncwrapper.AsyncAPI(uri)
+        self.api.request = AsyncMock()
+
+    async def test_download_async(self):
+        responses = {
+            'tags': tags,
+            'notebooks': [notebook],
+            'notes': notes,
+            'versions': versions,
+            'attachments': attachments
+            }
+        self.api.request.side_effect = \
+            lambda method, keyword, *ids: responses[keyword]
+        await self.pw.download_async(self.api)
+        self.assertEqual(len(self.pw.tags), 2)
+        self.assertEqual(list(self.pw.notebooks), [notebook_id])
+        downloaded = self.pw.notebooks[notebook_id].notes[note_id]
+        self.assertEqual(len(downloaded.versions), 2)
+        self.assertEqual(len(downloaded.attachments), 2)
+        self.assertEqual([tag.ident for tag in downloaded.tags], [tag_id])
+
+    async def test_update_async(self):
+        nb = models.Notebook.from_json(self.pw.api, notebook)
+        n = models.Note.from_json(nb, note)
+        nb.add_note(n)
+        self.pw.add_notebook(nb)
+        self.api.request.return_value = {'updated_at': note_updated_at}
+        await self.pw.update_async(self.api)
+        self.assertFalse(self.api.request.called)
+
+        nb.title = 'changed'
+        n.content = 'changed'
+        updated = await self.pw.update_async(self.api)
+        methods = [call[0][:2] for call in self.api.request.call_args_list]
+        self.assertIn(('put', 'notebook'), methods)
+        self.assertIn(('put', 'note'), methods)
+        self.assertEqual(updated, {'notebooks': [nb], 'notes': [n]})
+        self.assertFalse(nb.dirty or n.dirty)
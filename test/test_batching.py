@@ -0,0 +1,93 @@
+import threading
+import unittest
+from paperwrap import batching, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import Mock, patch
+except ImportError:
+    from mock import Mock, patch
+
+
+class TestBatchDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.api = Mock()
+        self.api.get_notes.return_value = notes
+        self.dispatcher = batching.BatchDispatcher(
+            self.api, window=60, max_size=2)
+
+    def test_flush_on_max_size(self):
+        first = self.dispatcher.get_note(notebook_id, note_id)
+        second = self.dispatcher.get_note(notebook_id, note2_id)
+        self.assertEqual(first.result(1), note)
+        self.assertEqual(second.result(1), note2)
+        self.api.get_notes.assert_called_once_with(
+            str(notebook_id), [str(note_id), str(note2_id)])
+        self.assertEqual(self.dispatcher.stats(),
+                         {'calls': 2, 'requests': 1, 'pending': 0})
+
+    def test_flush_on_window(self):
+        self.dispatcher.window = 0.01
+        self.assertEqual(
+            self.dispatcher.get_note(notebook_id, note_id).result(1), note)
+        self.assertEqual(self.api.get_notes.call_count, 1)
+
+    def test_same_id_shares_future(self):
+        first = self.dispatcher.get_note(notebook_id, note_id)
+        second = self.dispatcher.get_note(notebook_id, note_id)
+        self.assertIs(first, second)
+        self.dispatcher.flush_all()
+        self.assertEqual(first.result(1), note)
+
+    def test_notebooks_not_mixed(self):
+        self.dispatcher.get_note(notebook_id, note_id)
+        self.dispatcher.get_note(notebook2_id, note_id)
+        self.assertEqual(self.dispatcher.stats()['pending'], 2)
+        self.dispatcher.flush_all()
+        self.assertEqual(self.api.get_notes.call_count, 2)
+
+    def test_exception(self):
+        self.api.get_notes.side_effect = IOError('down')
+        first = self.dispatcher.get_note(notebook_id, note_id)
+        self.dispatcher.get_note(notebook_id, note2_id)
+        self.assertRaises(IOError, first.result, 1)
+
+    def test_move_note(self):
+        self.api.move_notes.return_value = move
+        future = self.dispatcher.move_note(note, new_notebook_id)
+        self.dispatcher.flush_all()
+        self.assertEqual(future.result(1), move_single)
+        self.api.move_notes.assert_called_once_with(
+            [{'id': str(note_id), 'notebook_id': str(notebook_id)}],
+            new_notebook_id)
+
+    def test_list_note_versions(self):
+        self.api.list_notes_versions.return_value = [[version], [version2]]
+        first = self.dispatcher.list_note_versions(note)
+        second = self.dispatcher.list_note_versions(note2)
+        self.assertEqual(first.result(1), [version])
+        self.assertEqual(second.result(1), [version2])
+
+    def test_by_position_single(self):
+        self.assertEqual(batching.by_position(['1'], versions),
+                         {'1': versions})
+
+
+class TestAPIBatching(unittest.TestCase):
+    @patch('paperwrap.wrapper.API.get_notes')
+    def test_get_note_batched(self, mocked_get_notes):
+        mocked_get_notes.return_value = notes
+        api = wrapper.API(uri, batch_window=0.05, batch_size=10)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda ident: results.append(
+                    api.get_note(notebook_id, ident)),
+                args=(ident,))
+            for ident in (note_id, note2_id)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(mocked_get_notes.call_count, 1)
+        self.assertCountEqual(results, notes)
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+from json import dumps
+from paperwrap import cache, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.ResponseCache(maxsize=2, ttl=60)
+
+    def test_lookup_miss(self):
+        self.assertIsNone(self.cache.lookup(('notebooks', ())))
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_store_lookup(self):
+        self.cache.store(('notebooks', ()), notebooks, 10)
+        entry = self.cache.lookup(('notebooks', ()))
+        self.assertEqual(entry.value, notebooks)
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['bytes_served'], 10)
+        self.assertEqual(stats['bytes_stored'], 10)
+
+    def test_lru_eviction(self):
+        self.cache.store(('tags', ()), tags, 1)
+        self.cache.store(('notebooks', ()), notebooks, 1)
+        self.cache.lookup(('tags', ()))
+        self.cache.store(('i18n', ()), i18n, 1)
+        self.assertIsNotNone(self.cache.lookup(('tags', ())))
+        self.assertIsNone(self.cache.lookup(('notebooks', ())))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_expired_without_validators(self):
+        self.cache.ttl = 0
+        self.cache.store(('tags', ()), tags, 1)
+        self.assertIsNone(self.cache.lookup(('tags', ())))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_expired_with_validators(self):
+        self.cache.ttl = 0
+        self.cache.store(('tags', ()), tags, 1, etag='"abc"')
+        entry = self.cache.lookup(('tags', ()))
+        self.assertFalse(self.cache.is_fresh(entry))
+        self.assertEqual(entry.validators(), {'If-None-Match': '"abc"'})
+
+    def test_invalidate_notebook(self):
+        self.cache.maxsize = 10
+        self.cache.store(cache.cache_key('notes', (1,)), notes, 1)
+        self.cache.store(cache.cache_key('notes', (2,)), notes, 1)
+        self.cache.store(cache.cache_key('notebooks', ()), notebooks, 1)
+        self.cache.store(cache.cache_key('i18n', ()), i18n, 1)
+        self.cache.invalidate('note', (1, 4))
+        keys = [key[0] + str(key[1]) for key in self.cache.entries]
+        self.assertEqual(keys, ["notes('2',)", 'i18n()'])
+
+    def test_invalidate_move(self):
+        self.cache.maxsize = 10
+        self.cache.store(cache.cache_key('notes', (1,)), notes, 1)
+        self.cache.store(cache.cache_key('notes', (2,)), notes, 1)
+        self.cache.invalidate('move', (1, 4, 2))
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestAPICache(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
+        self.mocked_request = self.patcher.start()
+        self.mocked_request.return_value = ResponseObj(
+            dumps({'success': True, 'response': notes}),
+            headers={'ETag': '"v1"'})
+        self.api = wrapper.API(
+            uri, response_cache=cache.ResponseCache(ttl=60))
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_hit(self):
+        self.assertEqual(self.api.list_notebook_notes(notebook_id), notes)
+        self.assertEqual(self.api.list_notebook_notes(notebook_id), notes)
+        self.assertEqual(self.mocked_request.call_count, 1)
+        self.assertEqual(self.api.cache.stats()['hits'], 1)
+
+    def test_revalidate(self):
+        self.api.list_notebook_notes(notebook_id)
+        self.api.cache.ttl = 0
+        self.mocked_request.return_value = ResponseObj('', 304)
+        self.assertEqual(self.api.list_notebook_notes(notebook_id), notes)
+        self.assertEqual(
+            self.mocked_request.call_args[1]['headers']['If-None-Match'],
+            '"v1"')
+        self.assertEqual(self.api.cache.stats()['revalidations'], 1)
+
+    def test_invalidate_on_update(self):
+        self.api.list_notebook_notes(notebook_id)
+        self.api.update_note(note)
+        self.api.list_notebook_notes(notebook_id)
+        self.assertEqual(self.mocked_request.call_count, 3)
+
+    def test_invalidate_on_upload(self):
+        self.api.list_note_attachments(note)
+        self.api.get_note(notebook_id, note_id)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, attachment_file)
+            with open(path, 'wb') as f:
+                f.write(b'%PDF')
+            self.api.upload_attachment(note, path)
+        self.api.list_note_attachments(note)
+        self.api.get_note(notebook_id, note_id)
+        self.assertEqual(self.mocked_request.call_count, 5)
+
+    def test_attachment_raw_not_cached(self):
+        self.api.get('attachment_raw', 1, 2, 3, 4)
+        self.api.get('attachment_raw', 1, 2, 3, 4)
+        self.assertEqual(self.mocked_request.call_count, 2)
@@ -1,15 +1,16 @@
 #!/usr/bin/env python3
 import unittest
+from concurrent.futures import Future
 from test_data import *
 from paperwrap.models import Notebook, Note, Tag, Attachment
 try:
-    from unittest.mock import patch
+    from unittest.mock import Mock, patch
 except ImportError:
-    from mock import patch
+    from mock import Mock, patch
 
 patch('paperwrap.wrapper.API.test_connection', lambda x: True).start()
 patch('builtins.input', lambda x: 'test/uri').start()
-from paperwrap import cli
+from paperwrap import cli, models
 
 
 class TestCli(unittest.TestCase):
@@ -38,6 +39,41 @@ class TestCli(unittest.TestCase):
         cli.download()
         self.assertTrue(mocked_download.called)
 
+    @patch('paperwrap.models.Paperwork.reconcile')
+    @patch('paperwrap.models.Paperwork.load')
+    def test_download_store(self, mocked_load, mocked_reconcile):
+        mocked_load.return_value = True
+        future = Future()
+        mocked_reconcile.return_value = future
+        cli.download(':memory:').close()
+        self.assertIs(cli.RECONCILING, future)
+        future.set_exception(IOError('down'))
+        cli.wait_for_sync()
+        self.assertIsNone(cli.RECONCILING)
+
+    def test_wait_for_sync_failed(self):
+        def fail():
+            raise IOError('down')
+        cli.RECONCILING = models.submit(fail)
+        cli.wait_for_sync()
+        # the failure was reported once
+        self.assertTrue(models.wait())
+
+    @patch('paperwrap.cli.tracing.shutdown')
+    @patch('paperwrap.models.Paperwork.save')
+    @patch('paperwrap.models.Paperwork.wait')
+    @patch('paperwrap.cli.download')
+    def test_main_exit_failed(self, mocked_download, mocked_wait,
+                              mocked_save, mocked_shutdown):
+        local = mocked_download.return_value = Mock()
+        mocked_wait.side_effect = IOError('down')
+        with patch('sys.argv', ['paperwrap']), \
+                patch('builtins.input', lambda x: 'exit'):
+            self.assertRaises(IOError, cli.main)
+        mocked_save.assert_called_with(local)
+        self.assertTrue(local.close.called)
+        self.assertTrue(mocked_shutdown.called)
+
     @patch('paperwrap.models.Paperwork.update')
     def test_update(self, mocked_update):
         cli.update()
@@ -0,0 +1,42 @@
+import unittest
+from paperwrap import codec, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestCodec(unittest.TestCase):
+    def roundtrip(self, json_codec):
+        encoded = json_codec.dumps(notes)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(json_codec.loads(encoded), notes)
+
+    def test_json(self):
+        self.roundtrip(codec.JSONCodec())
+
+    @unittest.skipIf(codec.orjson is None, 'orjson not installed')
+    def test_orjson(self):
+        self.roundtrip(codec.OrjsonCodec())
+
+    @unittest.skipIf(codec.ujson is None, 'ujson not installed')
+    def test_ujson(self):
+        self.roundtrip(codec.UjsonCodec())
+
+    @patch('paperwrap.codec.ujson', None)
+    @patch('paperwrap.codec.orjson', None)
+    def test_fallback(self):
+        self.assertEqual(codec.default_codec().name, 'json')
+        self.assertEqual(codec.get_codec('orjson').name, 'json')
+
+    @patch('paperwrap.wrapper.requests.Session.request')
+    def test_api_codec(self, mocked_request):
+        mocked_request.return_value = ResponseObj(
+            '{"success": true, "response": {"id": 1}}')
+        api = wrapper.API(uri, json_codec=codec.JSONCodec())
+        self.assertEqual(api.update_notebook(notebook), {'id': 1})
+        self.assertEqual(
+            codec.JSONCodec().loads(mocked_request.call_args[1]['data']),
+            notebook)
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 notebook_id = 1
 notebook2_id = 2
 new_notebook_id = 2
@@ -182,5 +184,37 @@ ret = {
 
 
 class ResponseObj:
-    def __init__(self, text):
+    def __init__(self, text, status_code=200, headers=None):
         self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.elapsed = timedelta(milliseconds=5)
+
+    def close(self):
+        pass
+
+
+class StreamResponseObj:
+    def __init__(self, content, status_code=200, chunk_size=4):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'Content-Length': str(len(content))}
+        self.chunk_size = chunk_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(self.status_code)
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), self.chunk_size):
+            yield self.content[i:i + self.chunk_size]
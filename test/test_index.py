@@ -0,0 +1,165 @@
+import unittest
+from paperwrap import index, models
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestModelIndex(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.api = models.Paperwork(uri).api
+        self.index = index.ModelIndex()
+        self.tag = models.Tag.from_json(self.api, tag)
+        self.tag2 = models.Tag.from_json(self.api, tag2)
+        self.index.add(self.tag)
+        self.index.add(self.tag2)
+
+    def test_get(self):
+        self.assertIs(self.index.get(tag_id), self.tag)
+        self.assertIs(self.index.get_title(tag_title), self.tag)
+        self.assertEqual(len(self.index), 2)
+
+    def test_remove(self):
+        self.index.remove(self.tag)
+        self.assertNotIn(tag_id, self.index)
+        self.assertIs(self.index.get_title(tag_title), self.tag2)
+        self.index.remove(self.tag2)
+        self.assertEqual(self.index.by_title, {})
+
+    def test_reindex_title(self):
+        self.tag.title = 'renamed'
+        self.index.add(self.tag)
+        self.assertIs(self.index.get_title('renamed'), self.tag)
+        self.assertEqual(self.index.by_title[tag_title], [self.tag2])
+
+    def test_find_stale_title(self):
+        self.tag.title = 'renamed'
+        self.assertIsNone(self.index.find('renamed'))
+        self.assertIs(self.index.find(tag_title), self.tag2)
+        self.index.reindex(self.tag)
+        self.assertIs(self.index.find('renamed'), self.tag)
+
+    def test_find_missing(self):
+        self.assertIsNone(self.index.find(99))
+        self.assertIsNone(self.index.find('missing'))
+
+    def test_reindex_removed(self):
+        self.index.remove(self.tag)
+        self.index.reindex(self.tag)
+        self.assertNotIn(tag_id, self.index)
+
+
+class TestPaperworkIndex(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+        self.nb = models.Notebook.from_json(self.pw.api, notebook)
+        self.nb2 = models.Notebook.from_json(self.pw.api, notebook2)
+        self.pw.add_notebook(self.nb)
+        self.pw.add_notebook(self.nb2)
+        self.note = models.Note.from_json(self.nb, note)
+        self.nb.add_note(self.note)
+
+    def test_find(self):
+        self.assertIs(self.pw.find_note(note_id), self.note)
+        self.assertIs(self.pw.find_note(note_title), self.note)
+        self.assertIs(self.pw.find_notebook(notebook_id), self.nb)
+        self.assertIn(note_id, self.pw.note_index)
+
+    def test_find_renamed(self):
+        self.note.title = 'renamed'
+        self.nb.title = 'renamed notebook'
+        with patch('paperwrap.models.Paperwork.iter_notes') as iter_notes:
+            self.assertIs(self.pw.find_note('renamed'), self.note)
+            self.assertIsNone(self.pw.find_note(note_title))
+        self.assertFalse(iter_notes.called)
+        self.assertIs(self.pw.find_notebook('renamed notebook'), self.nb)
+
+    @patch('paperwrap.wrapper.API.delete_note')
+    def test_delete(self, mocked_delete):
+        self.note.delete()
+        self.assertNotIn(note_id, self.pw.note_index)
+        self.assertIsNone(self.pw.find_note(note_id))
+
+    @patch('paperwrap.wrapper.API.move_note')
+    def test_move(self, mocked_move):
+        self.note.move_to(self.nb2)
+        self.assertIs(self.note.notebook, self.nb2)
+        self.assertIs(self.pw.find_note(note_id), self.note)
+        self.assertNotIn(note_id, self.nb.notes)
+
+    @patch('paperwrap.wrapper.API.create_note')
+    def test_create_note(self, mocked_create):
+        mocked_create.return_value = note2
+        self.nb.create_note(note_title)
+        self.assertIs(self.pw.find_note(note2_id).notebook, self.nb)
+
+    @patch('paperwrap.wrapper.API.delete_notebook')
+    def test_delete_notebook(self, mocked_delete):
+        self.pw.delete_notebook(self.nb)
+        self.assertIsNone(self.pw.find_note(note_id))
+        self.assertNotIn(notebook_id, self.pw.notebook_index)
+
+
+class TestTagIndex(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+        self.nb = models.Notebook.from_json(self.pw.api, notebook)
+        self.pw.add_notebook(self.nb)
+        self.red = models.Tag('red', 1, self.pw.api)
+        self.blue = models.Tag('blue', 2, self.pw.api)
+        self.green = models.Tag('green', 3, self.pw.api)
+        self.notes = []
+        for ident, tags in enumerate(([self.red], [self.red, self.blue],
+                                      [self.blue], [])):
+            note = models.Note('note', ident, self.nb)
+            note.tags.update(tags)
+            self.nb.add_note(note)
+            self.notes.append(note)
+
+    def idents(self, **kwargs):
+        return [note.ident for note in self.pw.find_tagged(**kwargs)]
+
+    def test_tag_notes(self):
+        self.assertEqual(self.red.notes, set(self.notes[:2]))
+        self.assertEqual(self.green.notes, set())
+
+    def test_queries(self):
+        self.assertEqual(self.idents(all_of=[self.red]), [0, 1])
+        self.assertEqual(self.idents(all_of=[self.red, self.blue]), [1])
+        self.assertEqual(self.idents(any_of=[1, 2]), [0, 1, 2])
+        self.assertEqual(self.idents(all_of=[self.red], none_of=[2]), [0])
+        self.assertEqual(self.idents(none_of=[self.red]), [2, 3])
+        self.assertEqual(self.idents(all_of=[self.green]), [])
+        self.assertEqual(self.idents(), [0, 1, 2, 3])
+
+    def test_tagging(self):
+        self.notes[3].add_tags([self.green, self.red])
+        self.notes[0].remove_tags([self.red])
+        self.assertEqual(self.idents(all_of=[self.red]), [1, 3])
+        self.assertEqual(self.green.notes, {self.notes[3]})
+        self.assertNotIn(self.notes[0], self.red.notes)
+
+    @patch('paperwrap.wrapper.API.delete_note')
+    def test_delete(self, mocked_delete):
+        self.notes[1].delete()
+        self.assertEqual(self.idents(any_of=[self.red, self.blue]), [0, 2])
+        self.assertNotIn(self.notes[1], self.blue.notes)
+        note = models.Note('new', 9, self.nb)
+        note.tags.add(self.blue)
+        self.nb.add_note(note)
+        # the free slot is reused
+        self.assertEqual(self.pw.tagged_index.slots[9], 1)
+        self.assertEqual(self.idents(all_of=[self.blue]), [9, 2])
+
+    def test_update_from_json(self):
+        self.pw.add_tag(self.green)
+        json = dict(note, tags=[{'id': 3}])
+        self.notes[0].update_from_json(json, self.pw.tags)
+        self.assertEqual(self.idents(all_of=[self.green]), [0])
+        self.assertEqual(self.idents(all_of=[self.red]), [1])
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from json import dumps
+from paperwrap import metrics, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        self.assertIsNone(metrics.Histogram().quantile(0.5))
+
+    def test_quantile(self):
+        histogram = metrics.Histogram((1, 2, 4, float('inf')))
+        for value in (0.5, 1.5, 1.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.sum, 6.5)
+        self.assertEqual(histogram.cumulative(),
+                         [(1, 1), (2, 3), (4, 4), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.25), 1)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(1), 4)
+
+    def test_infinite_bucket(self):
+        histogram = metrics.Histogram((1, float('inf')))
+        histogram.observe(100)
+        self.assertEqual(histogram.quantile(0.99), 1)
+
+    def test_bound_inclusive(self):
+        histogram = metrics.Histogram((1, float('inf')))
+        histogram.observe(1)
+        self.assertEqual(histogram.counts, [1, 0])
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
+        self.mocked_request = self.patcher.start()
+        self.mocked_request.return_value = ResponseObj(dumps({
+            'success': True,
+            'response': note
+            }))
+        self.api = wrapper.API(uri, coalesce=False, retries=0)
+        self.registry = self.api.metrics
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_requests(self):
+        self.api.get_note(notebook_id, note_id)
+        self.api.get_note(notebook_id, note_id)
+        self.api.update_note(note)
+        snapshot = self.registry.snapshot()
+        self.assertEqual(list(snapshot), [('note', 'get'), ('note', 'put')])
+        get = snapshot[('note', 'get')]
+        self.assertEqual(get['requests'], 2)
+        self.assertEqual(get['errors'], 0)
+        self.assertEqual(get['in_flight'], 0)
+        self.assertEqual(get['request_bytes'], 0)
+        self.assertEqual(
+            get['response_bytes'],
+            2 * len(self.mocked_request.return_value.content))
+        self.assertIsNotNone(get['p50'])
+        self.assertLessEqual(get['p50'], get['p99'])
+        self.assertGreater(snapshot[('note', 'put')]['request_bytes'], 0)
+
+    def test_errors(self):
+        self.mocked_request.return_value = ResponseObj(dumps({
+            'success': False,
+            'errors': 'not found'
+            }), 404)
+        self.api.get_note(notebook_id, note_id)
+        self.mocked_request.side_effect = IOError('down')
+        with self.assertRaises(IOError):
+            self.api.get_note(notebook_id, note_id)
+        snapshot = self.registry.snapshot()[('note', 'get')]
+        self.assertEqual(snapshot['requests'], 2)
+        self.assertEqual(snapshot['errors'], 2)
+        self.assertEqual(snapshot['in_flight'], 0)
+
+    def test_in_flight(self):
+        seen = []
+
+        def request(*args, **kwargs):
+            seen.append(self.registry.snapshot()[('notes', 'get')])
+            return ResponseObj(dumps({'success': True, 'response': notes}))
+        self.mocked_request.side_effect = request
+        self.api.list_notebook_notes(notebook_id)
+        self.assertEqual(seen[0]['in_flight'], 1)
+        self.assertEqual(seen[0]['requests'], 0)
+
+    def test_attachment_raw(self):
+        self.mocked_request.return_value = StreamResponseObj(b'\x00binary\xff')
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertTrue(self.api.download_note_attachment(
+                note, attachment_id, os.path.join(tmp, 'file')))
+        snapshot = self.registry.snapshot()[('attachment_raw', 'get')]
+        self.assertEqual(snapshot['requests'], 1)
+        self.assertEqual(snapshot['response_bytes'], 8)
+
+    def test_shared_registry(self):
+        registry = metrics.Registry()
+        first = wrapper.API(uri, metrics_registry=registry)
+        second = wrapper.API(uri, metrics_registry=registry)
+        self.assertIs(first.metrics, second.metrics)
+
+    def test_prometheus(self):
+        self.api.get_note(notebook_id, note_id)
+        text = self.registry.prometheus()
+        labels = 'keyword="note",method="get"'
+        self.assertIn('# TYPE paperwrap_requests_total counter\n', text)
+        self.assertIn('paperwrap_requests_total{{{}}} 1\n'.format(labels),
+                      text)
+        self.assertIn('paperwrap_request_errors_total{{{}}} 0\n'.format(
+            labels), text)
+        self.assertIn('paperwrap_requests_in_flight{{{}}} 0\n'.format(
+            labels), text)
+        self.assertIn(
+            'paperwrap_request_duration_seconds_bucket{{{},le="+Inf"}} 1\n'
+            .format(labels), text)
+        self.assertIn(
+            'paperwrap_request_duration_seconds_count{{{}}} 1\n'.format(
+                labels), text)
+
+    def test_write(self):
+        self.api.get_note(notebook_id, note_id)
+        path = os.path.join(tempfile.mkdtemp(), 'paperwrap.prom')
+        self.registry.write(path)
+        with open(path) as f:
+            self.assertEqual(f.read(), self.registry.prometheus())
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_serve(self):
+        self.api.get_note(notebook_id, note_id)
+        server = self.registry.serve(0)
+        try:
+            base = 'http://127.0.0.1:{}'.format(server.server_port)
+            response = urlopen(base + '/metrics')
+            self.assertEqual(response.headers['Content-Type'],
+                             metrics.CONTENT_TYPE)
+            self.assertEqual(response.read().decode('utf-8'),
+                             self.registry.prometheus())
+            with self.assertRaises(HTTPError):
+                urlopen(base + '/other')
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -1,3 +1,4 @@
+import time
 import unittest
 from json import dumps
 from paperwrap import models
@@ -9,9 +10,63 @@ except ImportError:
     from mock import patch
 
 
+class TestThreadedMethod(unittest.TestCase):
+    def setUp(self):
+        models.USE_THREADING = True
+        models.set_workers(2)
+
+    def tearDown(self):
+        models.USE_THREADING = False
+        models.set_workers(models.THREAD_WORKERS)
+
+    def test_returns_future(self):
+        @models.threaded_method
+        def double(value):
+            return value * 2
+        future = double(21)
+        self.assertEqual(future.result(), 42)
+        models.wait()
+        self.assertEqual(models.PENDING, set())
+
+    def test_wait_raises(self):
+        @models.threaded_method
+        def fail():
+            raise ValueError('failed')
+        fail()
+        self.assertRaises(ValueError, models.wait)
+
+    def test_bounded(self):
+        running = []
+        peak = []
+
+        @models.threaded_method
+        def work():
+            with models.PENDING_LOCK:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with models.PENDING_LOCK:
+                running.pop()
+        for _ in range(10):
+            work()
+        models.wait()
+        self.assertEqual(len(peak), 10)
+        self.assertLessEqual(max(peak), 2)
+
+    def test_nested_inline(self):
+        @models.threaded_method
+        def inner():
+            return 'inner'
+
+        @models.threaded_method
+        def outer():
+            return inner()
+        self.assertEqual(outer().result(), 'inner')
+
+
 class TestPaperwork(unittest.TestCase):
     def setUp(self):
-        self.patcher = patch('paperwrap.wrapper.requests.request')
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
         self.mocked_request = self.patcher.start()
         temp = ResponseObj(dumps({
             'success': True,
@@ -38,12 +93,197 @@ class TestPaperwork(unittest.TestCase):
         mocked_list_notebook_notes.return_value = notes
         mocked_list_note_versions.return_value = versions
         mocked_list_note_attachments.return_value = attachments
-        self.pw.download()
+        with patch('paperwrap.models.USE_THREADING', True), \
+                patch('paperwrap.models.submit') as mocked_submit:
+            self.pw.download()
+        # notes are indexed by the calling thread
+        self.assertFalse(mocked_submit.called)
+        self.assertEqual(len(self.pw.note_index), len(notes))
         self.assertTrue(mocked_list_tags.called)
         self.assertTrue(mocked_list_notebooks.called)
         self.assertTrue(mocked_list_notebook_notes.called)
+        self.assertFalse(mocked_list_note_versions.called)
+        self.assertFalse(mocked_list_note_attachments.called)
+        downloaded = self.pw.notebooks[notebook_id].notes[note_id]
+        self.assertEqual(len(downloaded.versions), 2)
+        self.assertEqual(len(downloaded.attachments), 2)
         self.assertTrue(mocked_list_note_versions.called)
         self.assertTrue(mocked_list_note_attachments.called)
+        self.assertTrue(downloaded.loaded)
+
+    @patch('paperwrap.wrapper.API.list_notebook_notes')
+    @patch('paperwrap.wrapper.API.list_notebooks')
+    @patch('paperwrap.wrapper.API.list_tags')
+    def test_download_workers(self, mocked_list_tags, mocked_list_notebooks,
+                              mocked_list_notebook_notes):
+        def list_notebook_notes(ident):
+            # later notebooks answer first
+            time.sleep(0.01 * (notebook2_id - ident))
+            return [dict(note, id=ident * 10)] if ident == notebook_id \
+                else [dict(note2, id=ident * 10 + i) for i in range(3)]
+        mocked_list_tags.return_value = tags
+        mocked_list_notebooks.return_value = [notebook, notebook2]
+        mocked_list_notebook_notes.side_effect = list_notebook_notes
+        results = []
+        for workers in (1, 4):
+            with patch('paperwrap.wrapper.API.test_connection'):
+                pw = models.Paperwork(uri)
+            pw.download(workers=workers)
+            results.append((
+                list(pw.notebooks),
+                [list(nb.notes) for nb in pw.notebooks.values()],
+                pw.find_note(note['title']).ident))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][0], [notebook_id, notebook2_id])
+
+    @patch('paperwrap.wrapper.API.list_note_attachments')
+    @patch('paperwrap.wrapper.API.list_notes_versions')
+    @patch('paperwrap.wrapper.API.list_note_versions')
+    @patch('paperwrap.wrapper.API.list_notebook_notes')
+    @patch('paperwrap.wrapper.API.list_notebooks')
+    @patch('paperwrap.wrapper.API.list_tags')
+    def test_download_bulk(self, mocked_list_tags, mocked_list_notebooks,
+                           mocked_list_notebook_notes,
+                           mocked_list_note_versions,
+                           mocked_list_notes_versions,
+                           mocked_list_note_attachments):
+        mocked_list_tags.return_value = tags
+        mocked_list_notebooks.return_value = [notebook]
+        mocked_list_notebook_notes.return_value = notes
+        mocked_list_notes_versions.return_value = [[version], [version2]]
+        mocked_list_note_attachments.side_effect = \
+            lambda note: [attachment] if note['id'] == note_id \
+            else [attachment2]
+        self.pw.download(bulk=True)
+        self.assertFalse(mocked_list_note_versions.called)
+        self.assertEqual(mocked_list_notes_versions.call_count, 1)
+        self.assertEqual(mocked_list_note_attachments.call_count, 2)
+        nb = self.pw.notebooks[notebook_id]
+        self.assertEqual(nb.notes[note_id].versions[0].ident, version_id)
+        self.assertEqual(nb.notes[note2_id].versions[0].ident, version2_id)
+        self.assertEqual(nb.notes[note_id].attachments[0].ident,
+                         attachment_id)
+        self.assertEqual(nb.notes[note2_id].attachments[0].ident,
+                         attachment2_id)
+
+    @patch('paperwrap.wrapper.API.list_notebook_notes')
+    @patch('paperwrap.wrapper.API.list_notebooks')
+    @patch('paperwrap.wrapper.API.list_tags')
+    def test_sync(self, mocked_list_tags, mocked_list_notebooks,
+                  mocked_list_notebook_notes):
+        old_notebook = dict(notebook, updated_at='1')
+        new_notebook = dict(notebook, updated_at='2')
+        old_notebook2 = dict(notebook2, updated_at='1')
+        new_notebook2 = dict(notebook2, updated_at='2')
+        listings = {notebook_id: notes, notebook2_id: []}
+        mocked_list_tags.return_value = tags
+        mocked_list_notebooks.return_value = [old_notebook, old_notebook2]
+        mocked_list_notebook_notes.side_effect = lambda ident: listings[ident]
+        self.pw.download()
+        changed = dict(note, title='changed', updated_at='2015-01-01')
+
+        mocked_list_notebook_notes.reset_mock()
+        self.assertEqual(self.pw.sync(), {key: [] for key in
+                                          models.SYNC_CHANGES})
+        self.assertFalse(mocked_list_notebook_notes.called)
+
+        listings = {notebook_id: [changed], notebook2_id: [note2]}
+        mocked_list_notebooks.return_value = [new_notebook, new_notebook2]
+        changes = self.pw.sync()
+        self.assertEqual(
+            [note.ident for note in changes['updated_notes']], [note_id])
+        self.assertEqual(
+            [note.ident for note in changes['moved_notes']], [note2_id])
+        self.assertEqual(changes['deleted_notes'], [])
+        self.assertEqual(len(changes['updated_notebooks']), 2)
+        self.assertEqual(self.pw.find_note('changed').ident, note_id)
+        self.assertIs(self.pw.find_note(note2_id).notebook,
+                      self.pw.notebooks[notebook2_id])
+
+        listings = {notebook_id: [changed]}
+        mocked_list_notebooks.return_value = [new_notebook]
+        changes = self.pw.sync(deep=True)
+        self.assertEqual(
+            [nb.ident for nb in changes['deleted_notebooks']], [notebook2_id])
+        self.assertEqual(
+            [note.ident for note in changes['deleted_notes']], [note2_id])
+        self.assertIsNone(self.pw.find_note(note2_id))
+        self.assertEqual(mocked_list_notebook_notes.call_args[0],
+                         (notebook_id,))
+
+        listings = {notebook_id: []}
+        changes = self.pw.sync(deep=True)
+        self.assertEqual(
+            [note.ident for note in changes['deleted_notes']], [note_id])
+        self.assertEqual(self.pw.notebooks[notebook_id].notes, {})
+
+    @patch('paperwrap.wrapper.API.list_notebook_notes')
+    @patch('paperwrap.wrapper.API.list_notebooks')
+    @patch('paperwrap.wrapper.API.list_tags')
+    def test_sync_conflicts(self, mocked_list_tags, mocked_list_notebooks,
+                            mocked_list_notebook_notes):
+        mocked_list_tags.return_value = tags
+        mocked_list_notebooks.return_value = [notebook]
+        mocked_list_notebook_notes.return_value = notes
+        self.pw.download()
+        nb = self.pw.notebooks[notebook_id]
+        edited = self.pw.find_note(note_id)
+        nb.title = 'local'
+        edited.content = 'local'
+
+        mocked_list_notebooks.return_value = [
+            dict(notebook, title='remote', updated_at='changed')]
+        mocked_list_notebook_notes.return_value = [
+            dict(note, content='remote', updated_at='changed'),
+            dict(note2, content='remote', updated_at='changed')]
+        changes = self.pw.sync()
+        self.assertEqual(changes['conflicted_notebooks'], [nb])
+        self.assertEqual(changes['updated_notebooks'], [])
+        self.assertEqual(changes['conflicted_notes'], [edited])
+        self.assertEqual(
+            [n.ident for n in changes['updated_notes']], [note2_id])
+        self.assertEqual(nb.title, 'local')
+        self.assertEqual(nb.dirty, {'title'})
+        self.assertEqual(edited.content, 'local')
+        self.assertEqual(edited.dirty, {'content'})
+        self.assertEqual(self.pw.find_note(note2_id).content, 'remote')
+
+    @patch('paperwrap.wrapper.API.list_notebook_notes')
+    @patch('paperwrap.wrapper.API.list_notebooks')
+    @patch('paperwrap.wrapper.API.list_tags')
+    def test_sync_deleted(self, mocked_list_tags, mocked_list_notebooks,
+                          mocked_list_notebook_notes):
+        listings = {notebook_id: [note], notebook2_id: [note2]}
+        mocked_list_tags.return_value = tags
+        mocked_list_notebooks.return_value = [notebook, notebook2]
+        mocked_list_notebook_notes.side_effect = lambda ident: listings[ident]
+        self.pw.download()
+        moved = self.pw.find_note(note2_id)
+        moved.content = 'changed'
+
+        # note2 moved to notebook before notebook2 and tag2 were deleted
+        listings = {notebook_id: [note, dict(note2, tags=[])]}
+        mocked_list_tags.return_value = [tag]
+        mocked_list_notebooks.return_value = [
+            dict(notebook, updated_at='changed')]
+        changes = self.pw.sync()
+        self.assertEqual(
+            [tag.ident for tag in changes['deleted_tags']], [tag2_id])
+        self.assertEqual(list(self.pw.tags), [tag_id])
+        self.assertIsNone(self.pw.find_tag(tag2_id))
+        self.assertEqual(moved.tags, set())
+        self.assertEqual(moved.dirty, {'content'})
+        self.assertEqual(
+            [nb.ident for nb in changes['deleted_notebooks']], [notebook2_id])
+        self.assertEqual(changes['moved_notes'], [moved])
+        self.assertEqual(changes['deleted_notes'], [])
+        self.assertIs(self.pw.find_note(note2_id), moved)
+        self.assertIs(moved.notebook, self.pw.notebooks[notebook_id])
+
+        mocked_list_tags.return_value = tags
+        changes = self.pw.sync()
+        self.assertEqual(
+            [tag.ident for tag in changes['created_tags']], [tag2_id])
 
     @patch('paperwrap.models.Note.update')
     @patch('paperwrap.models.Notebook.update')
@@ -51,10 +291,54 @@ class TestPaperwork(unittest.TestCase):
         parsed_notebook = models.Notebook.from_json(self.api, notebook)
         self.pw.add_notebook(parsed_notebook)
         self.pw.add_tag(models.Tag.from_json(self.api, tag))
-        parsed_notebook.add_note(models.Note.from_json(parsed_notebook, note))
+        parsed_note = models.Note.from_json(parsed_notebook, note)
+        parsed_notebook.add_note(parsed_note)
         self.pw.update()
+        self.assertFalse(mocked_update_note.called)
+        self.assertFalse(mocked_update_notebook.called)
+
+        parsed_notebook.title = 'changed'
+        parsed_note.content = 'changed'
+        updated = self.pw.update()
         self.assertTrue(mocked_update_note.called)
         self.assertTrue(mocked_update_notebook.called)
+        self.assertEqual(updated, {'notebooks': [parsed_notebook],
+                                   'notes': [parsed_note]})
+
+    def test_dirty(self):
+        nb = models.Notebook.from_json(self.api, notebook)
+        n = models.Note.from_json(nb, note)
+        self.assertEqual(n.dirty, frozenset())
+        n.title = n.title
+        self.assertEqual(n.dirty, frozenset())
+        n.title = 'changed'
+        n.updated_at = 'changed'
+        self.assertEqual(n.dirty, {'title'})
+        n.add_tags([models.Tag.from_json(self.api, tag)])
+        self.assertEqual(n.dirty, {'title', 'tags'})
+        self.pw.add_notebook(nb)
+        nb.add_note(n)
+        self.assertEqual(self.pw.dirty_notes(), [n])
+        self.assertEqual(self.pw.dirty_notebooks(), [])
+        n.mark_clean()
+        self.assertEqual(self.pw.dirty_notes(), [])
+
+    def test_dirty_tags(self):
+        nb = models.Notebook.from_json(self.api, notebook)
+        n = models.Note.from_json(nb, note)
+        tag1 = models.Tag.from_json(self.api, tag)
+        n.add_tags([tag1, tag1])
+        self.assertEqual(n.tags, {tag1})
+        self.assertEqual(n.dirty, {'tags'})
+        n.mark_clean()
+        before = n.tags
+        n.add_tags([tag1])
+        self.assertEqual(n.dirty, frozenset())
+        n.remove_tags([tag1])
+        self.assertEqual(n.tags, set())
+        self.assertEqual(n.dirty, {'tags'})
+        # the previous set is replaced, not changed
+        self.assertEqual(before, {tag1})
 
     def test_get_notes(self):
         nb = models.Notebook.from_json(self.api, notebook)
@@ -72,7 +356,7 @@ class TestPaperwork(unittest.TestCase):
 
 class TestModel(unittest.TestCase):
     def setUp(self):
-        self.patcher = patch('paperwrap.wrapper.requests.request')
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
         self.mocked_request = self.patcher.start()
         temp = ResponseObj(dumps({
             'success': True,
@@ -93,6 +377,14 @@ class TestModel(unittest.TestCase):
         self.assertEqual(model['id'], ident)
 
 
+class TestPlainModel(TestModel):
+    def test_from_json(self):
+        model = models.Model.from_json(self.api, notebook)
+        self.from_json_test(model, notebook_title, notebook_id)
+        self.assertEqual(model.dirty, models.CLEAN)
+        self.to_json_test(model.to_json(), notebook_title, notebook_id)
+
+
 class TestNotebook(TestModel):
     def setUp(self):
         super().setUp()
@@ -112,6 +404,22 @@ class TestNotebook(TestModel):
         parsed_notebook = models.Notebook.from_json(self.api, notebook)
         self.from_json_test(parsed_notebook, notebook_title, notebook_id)
 
+    @patch('paperwrap.wrapper.API.list_note_attachments')
+    @patch('paperwrap.wrapper.API.list_notes_versions')
+    def test_download_bulk_failed(self, mocked_versions, mocked_attachments):
+        first = self.note
+        second = models.Note.from_json(self.nb, note2)
+        # one list for two notes cannot be mapped
+        mocked_versions.return_value = [version]
+        mocked_attachments.side_effect = \
+            lambda json: [attachment] if json['id'] == note_id else None
+        self.nb.download_bulk([first, second])
+        self.assertIsNone(first._versions)
+        self.assertEqual(len(first._attachments), 1)
+        self.assertIsNone(second._versions)
+        self.assertIsNone(second._attachments)
+        self.assertFalse(first.loaded or second.loaded)
+
     @patch('paperwrap.wrapper.API.create_notebook')
     def test_create(self, mocked_create_notebook):
         models.Notebook.create(self.api, notebook_title)
@@ -181,6 +489,75 @@ class TestNote(TestModel):
         self.assertEqual(self.parsed_note.content, content)
         self.from_json_test(self.parsed_note, note_title, note_id)
 
+    @patch('paperwrap.wrapper.API.list_note_attachments')
+    @patch('paperwrap.wrapper.API.upload_attachment')
+    def test_upload_file(self, mocked_upload, mocked_list):
+        mocked_upload.return_value = attachment
+        mocked_list.return_value = [attachment]
+        uploaded = self.parsed_note.upload_file('file.pdf')
+        self.assertEqual(uploaded.ident, attachment_id)
+        self.assertFalse(mocked_list.called)
+        self.assertEqual(len(self.parsed_note.attachments), 1)
+        self.assertEqual(mocked_list.call_count, 1)
+        self.parsed_note.upload_file('file.pdf')
+        self.assertEqual(len(self.parsed_note.attachments), 2)
+
+    @patch('paperwrap.wrapper.API.list_note_version_attachments')
+    def test_version_attachments_lazy(self, mocked_list):
+        mocked_list.return_value = [attachment]
+        parsed_version = models.Version.from_json(self.parsed_note, version)
+        self.assertFalse(mocked_list.called)
+        self.assertEqual(parsed_version.attachments[0].note, self.parsed_note)
+        mocked_list.assert_called_once_with(
+            self.parsed_note.to_json(), version_id)
+
+    @patch('paperwrap.wrapper.API.list_note_attachments')
+    @patch('paperwrap.wrapper.API.list_note_versions')
+    def test_prefetch(self, mocked_versions, mocked_attachments):
+        mocked_versions.return_value = versions
+        mocked_attachments.return_value = attachments
+        self.assertFalse(self.parsed_note.loaded)
+        self.parsed_note.prefetch()
+        self.parsed_note.prefetch()
+        self.assertTrue(self.parsed_note.loaded)
+        self.assertEqual(mocked_versions.call_count, 1)
+        self.assertEqual(mocked_attachments.call_count, 1)
+
+    @patch('paperwrap.wrapper.API.list_note_version_attachments')
+    @patch('paperwrap.wrapper.API.list_note_attachments')
+    @patch('paperwrap.wrapper.API.list_note_versions')
+    def test_listing_failed(self, mocked_versions, mocked_attachments,
+                            mocked_version_attachments):
+        mocked_versions.return_value = None
+        mocked_attachments.return_value = None
+        mocked_version_attachments.return_value = None
+        self.assertEqual(self.parsed_note.versions, [])
+        self.assertEqual(self.parsed_note.attachments, [])
+        self.assertFalse(self.parsed_note.loaded)
+        parsed_version = models.Version.from_json(self.parsed_note, version)
+        self.assertEqual(parsed_version.attachments, [])
+        self.assertIsNone(parsed_version._attachments)
+
+        mocked_versions.return_value = versions
+        mocked_attachments.return_value = attachments
+        self.assertEqual(len(self.parsed_note.versions), 2)
+        self.assertEqual(len(self.parsed_note.attachments), 2)
+        self.assertTrue(self.parsed_note.loaded)
+
+    def test_slots(self):
+        for model in (self.parsed_note, self.notebook,
+                      models.Version.from_json(self.parsed_note, version),
+                      models.Attachment.from_json(
+                          self.parsed_note, attachment),
+                      models.Tag.from_json(self.api, tag)):
+            self.assertFalse(hasattr(model, '__dict__'))
+
+    def test_api_shared(self):
+        self.assertIs(self.parsed_note.api, self.notebook.api)
+        self.assertIs(
+            models.Version.from_json(self.parsed_note, version).api,
+            self.notebook.api)
+
     @patch('paperwrap.wrapper.API.create_note')
     def test_create(self, mocked_create_note):
         mocked_create_note.return_value = note
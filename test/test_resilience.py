@@ -0,0 +1,154 @@
+import unittest
+from json import dumps
+import requests
+from paperwrap import resilience, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = resilience.RetryPolicy(retries=2, backoff=1)
+
+    def test_should_retry_status(self):
+        self.assertTrue(self.policy.should_retry('get', 0, 503))
+        self.assertFalse(self.policy.should_retry('get', 0, 404))
+        self.assertFalse(self.policy.should_retry('get', 0, 200))
+        self.assertFalse(self.policy.should_retry('post', 0, 503))
+
+    def test_should_retry_exhausted(self):
+        self.assertTrue(self.policy.should_retry('get', 1))
+        self.assertFalse(self.policy.should_retry('get', 2))
+        self.assertEqual(self.policy.stats(), {
+            'retries': 1, 'exhausted': 1, 'statuses': {'connection': 1}})
+
+    def test_delay_backoff(self):
+        for attempt in range(4):
+            delay = self.policy.delay(attempt)
+            self.assertTrue(0 <= delay <= 2 ** attempt)
+
+    def test_delay_retry_after(self):
+        self.assertEqual(self.policy.delay(0, '7'), 7)
+        self.assertEqual(self.policy.delay(0, '120'), 30)
+
+    def test_parse_retry_after_date(self):
+        self.assertEqual(resilience.parse_retry_after(
+            'Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(resilience.parse_retry_after('soon'))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = resilience.CircuitBreaker(
+            failure_threshold=2, reset_timeout=60)
+
+    def test_opens(self):
+        self.breaker.record_failure()
+        self.breaker.before_request()
+        self.breaker.record_failure()
+        self.assertRaises(resilience.CircuitOpenError,
+                          self.breaker.before_request)
+        stats = self.breaker.stats()
+        self.assertEqual(stats['state'], resilience.OPEN)
+        self.assertEqual(stats['rejected'], 1)
+
+    def test_success_resets(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.before_request()
+
+    def test_half_open(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.reset_timeout = 0
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.breaker.before_request()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_half_open_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.reset_timeout = 0
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        # the trial request never reported back
+        self.breaker.reset_timeout = 60
+        with patch('paperwrap.resilience.time.time',
+                   return_value=self.breaker.opened_at + 60):
+            self.assertRaises(resilience.CircuitOpenError,
+                              self.breaker.before_request)
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.assertEqual(self.breaker.stats()['opened'], 2)
+
+
+class TestAPIRetry(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
+        self.mocked_request = self.patcher.start()
+        self.api = wrapper.API(uri, retries=2, breaker_threshold=3)
+        self.sleeps = []
+        self.api.retry.sleep = self.sleeps.append
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_retry_then_success(self):
+        self.mocked_request.side_effect = [
+            ResponseObj('', 503, {'Retry-After': '1'}),
+            requests.ConnectionError('reset'),
+            ResponseObj(dumps({'success': True, 'response': notebooks}))]
+        self.assertEqual(self.api.list_notebooks(), notebooks)
+        self.assertEqual(self.mocked_request.call_count, 3)
+        self.assertEqual(self.sleeps[0], 1)
+        self.assertEqual(self.api.retry.stats()['retries'], 2)
+        self.assertEqual(self.api.breaker.stats()['failures'], 0)
+
+    def test_post_not_retried(self):
+        self.mocked_request.return_value = ResponseObj(
+            dumps({'success': False, 'errors': 'down'}), 503)
+        self.assertIsNone(self.api.create_notebook(notebook_title))
+        self.assertEqual(self.mocked_request.call_count, 1)
+
+    def test_move_not_retried(self):
+        self.mocked_request.side_effect = requests.ConnectionError('reset')
+        self.assertRaises(requests.ConnectionError, self.api.move_note,
+                          note, notebook2_id)
+        self.assertEqual(self.mocked_request.call_count, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_chunked_encoding_retried(self):
+        self.mocked_request.side_effect = [
+            requests.exceptions.ChunkedEncodingError('dropped'),
+            ResponseObj(dumps({'success': True, 'response': notebooks}))]
+        self.assertEqual(self.api.list_notebooks(), notebooks)
+        self.assertEqual(self.mocked_request.call_count, 2)
+
+    def test_trial_other_error(self):
+        self.api.breaker.state = resilience.OPEN
+        self.api.breaker.reset_timeout = 0
+        self.mocked_request.side_effect = requests.exceptions.InvalidHeader(
+            'bad')
+        self.assertRaises(requests.exceptions.InvalidHeader,
+                          self.api.list_notebooks)
+        self.assertEqual(self.api.breaker.state, resilience.OPEN)
+        self.mocked_request.side_effect = None
+        self.mocked_request.return_value = ResponseObj(
+            dumps({'success': True, 'response': notebooks}))
+        self.assertEqual(self.api.list_notebooks(), notebooks)
+        self.assertEqual(self.api.breaker.state, resilience.CLOSED)
+
+    def test_circuit_opens(self):
+        self.mocked_request.side_effect = requests.ConnectionError('down')
+        self.assertRaises(requests.ConnectionError, self.api.list_notebooks)
+        self.assertRaises(resilience.CircuitOpenError,
+                          self.api.list_notebooks)
+        self.assertEqual(self.mocked_request.call_count, 3)
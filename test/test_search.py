@@ -0,0 +1,57 @@
+import unittest
+from paperwrap import models
+from paperwrap.search import tokenize
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+        self.nb = models.Notebook.from_json(self.pw.api, notebook)
+        self.pw.add_notebook(self.nb)
+        self.index = self.pw.search_index
+        self.apple = models.Note('Apple pie', 1, self.nb, 'apples and sugar')
+        self.sugar = models.Note('Shopping', 2, self.nb, 'sugar, milk')
+        self.cake = models.Note('Cake', 3, self.nb, 'flour, eggs, milk')
+        for note in (self.apple, self.sugar, self.cake):
+            self.nb.add_note(note)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Apple-Pie, apples!'),
+                         ['apple', 'pie', 'apples'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_ranking(self):
+        self.assertEqual(self.index.search('sugar'),
+                         [self.sugar, self.apple])
+        self.assertEqual(self.index.search('apple sugar'),
+                         [self.apple, self.sugar])
+        self.assertEqual(self.index.search('milk', limit=1), [self.sugar])
+        self.assertEqual(self.index.search('pear'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_incremental(self):
+        self.assertEqual(len(self.index), 3)
+        self.cake.content = 'sugar'
+        self.assertIn(self.cake, self.index.search('sugar'))
+        self.assertNotIn(self.cake, self.index.search('flour'))
+        self.nb.unindex_note(self.apple)
+        self.assertEqual(self.index.search('apple'), [])
+        self.pw.unindex_notebook(self.nb)
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.postings, {})
+
+    def test_paperwork_search(self):
+        with patch('paperwrap.wrapper.API.search') as mocked_search:
+            mocked_search.return_value = [{'id': 2}, {'id': 99}]
+            self.assertEqual(self.pw.search('sugar'), [self.sugar])
+            self.index.ready = True
+            self.assertEqual(self.pw.search('sugar'),
+                             [self.sugar, self.apple])
+            self.assertEqual(mocked_search.call_count, 1)
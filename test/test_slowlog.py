@@ -0,0 +1,172 @@
+import json
+import requests
+import threading
+import unittest
+from paperwrap import models, slowlog, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+# other tests leave requests mocked
+SESSION_REQUEST = requests.Session.request
+
+
+def records(logs):
+    return [json.loads(line.split('Slow request ', 1)[1])
+            for line in logs.output]
+
+
+class TestSlowRequestLog(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
+        self.mocked_request = self.patcher.start()
+        self.mocked_request.return_value = ResponseObj(json.dumps({
+            'success': True,
+            'response': notes
+            }))
+        self.api = wrapper.API(uri, coalesce=False, retries=0,
+                               slow_request_threshold=0,
+                               slow_request_sample_rate=0)
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_disabled(self):
+        api = wrapper.API(uri)
+        self.assertIsNone(api.slow_log)
+        self.assertIs(api.building(), slowlog.NO_BUILDING)
+        with patch('paperwrap.slowlog.LOGGER') as logger:
+            api.list_notebook_notes(notebook_id)
+        self.assertFalse(logger.warning.called)
+
+    def test_unsampled(self):
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            self.api.list_notebook_notes(notebook_id)
+        record = records(logs)[0]
+        self.assertEqual(record['method'], 'get')
+        self.assertEqual(record['keyword'], 'notes')
+        self.assertEqual(record['ids'], [notebook_id])
+        self.assertEqual(record['status'], 200)
+        self.assertFalse(record['sampled'])
+        self.assertEqual(sorted(record['phases']), ['decode', 'network'])
+        self.assertNotIn('stream', self.mocked_request.call_args[1])
+
+    def test_sampled(self):
+        self.api.slow_log.sample_rate = 1
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            self.api.list_notebook_notes(notebook_id)
+        record = records(logs)[0]
+        self.assertTrue(record['sampled'])
+        self.assertEqual(sorted(record['phases']),
+                         ['connect', 'decode', 'transfer', 'ttfb'])
+        self.assertGreaterEqual(record['duration'],
+                                sum(record['phases'].values()) - 1e-5)
+        self.assertTrue(self.mocked_request.call_args[1]['stream'])
+
+    def test_threshold(self):
+        self.api.slow_log.threshold = 60
+        with patch('paperwrap.slowlog.LOGGER') as logger:
+            self.api.list_notebook_notes(notebook_id)
+        self.assertFalse(logger.warning.called)
+
+    def test_error(self):
+        self.mocked_request.side_effect = IOError('down')
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            with self.assertRaises(IOError):
+                self.api.list_notebook_notes(notebook_id)
+        self.assertEqual(records(logs)[0]['error'], 'OSError: down')
+
+    def test_retry(self):
+        api = wrapper.API(uri, coalesce=False, retries=1,
+                          slow_request_threshold=0,
+                          slow_request_sample_rate=1)
+        api.retry.sleep = lambda delay: None
+        self.mocked_request.side_effect = [
+            requests.ConnectionError('reset'),
+            self.mocked_request.return_value]
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            api.list_notebook_notes(notebook_id)
+        record = records(logs)[0]
+        self.assertEqual(record['attempts'], 2)
+        self.assertEqual(sorted(record['phases']),
+                         ['connect', 'decode', 'retry', 'transfer', 'ttfb'])
+
+    def test_building(self):
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            with self.api.building():
+                self.api.list_notebook_notes(notebook_id)
+                self.api.list_notebook_notes(notebook2_id)
+                self.assertEqual(logs.output, [])
+        first, second = records(logs)
+        self.assertNotIn('model', first['phases'])
+        self.assertIn('model', second['phases'])
+        self.assertEqual(second['ids'], [notebook2_id])
+
+    def test_fetch_notes(self):
+        nb = models.Notebook.from_json(self.api, notebook)
+        with self.assertLogs('paperwrap.slowlog') as logs:
+            nb.fetch_notes({
+                json_tag['id']: models.Tag.from_json(self.api, json_tag)
+                for json_tag in tags})
+        self.assertIn('model', records(logs)[0]['phases'])
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'success': True, 'response': notes}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConnectTiming(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_connect(self):
+        api = wrapper.API(
+            '127.0.0.1:{}'.format(self.server.server_port),
+            slow_request_threshold=0, slow_request_sample_rate=1)
+        with self.assertLogs('paperwrap.slowlog') as logs, patch(
+                'paperwrap.wrapper.requests.Session.request',
+                SESSION_REQUEST):
+            self.assertEqual(api.list_notebook_notes(notebook_id), notes)
+            api.list_notebook_notes(notebook_id)
+        api.close()
+        first, second = records(logs)
+        self.assertGreater(first['phases']['connect'], 0)
+        self.assertGreater(first['phases']['ttfb'], 0)
+        # the second request reuses the connection
+        self.assertEqual(second['phases']['connect'], 0)
+
+    def test_connect_after_request(self):
+        api = wrapper.API('127.0.0.1:{}'.format(self.server.server_port))
+        with patch('paperwrap.wrapper.requests.Session.request',
+                   SESSION_REQUEST):
+            api.list_notebook_notes(notebook_id)
+            api.log_slow_requests(0, 1)
+            with self.assertLogs('paperwrap.slowlog') as logs:
+                api.list_notebook_notes(notebook_id)
+        api.close()
+        self.assertGreater(records(logs)[0]['phases']['connect'], 0)
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from paperwrap import models, store
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.pw = self.paperwork()
+        self.pw.add_tag(models.Tag.from_json(self.pw.api, tag))
+        self.pw.add_tag(models.Tag.from_json(self.pw.api, tag2))
+        nb = models.Notebook.from_json(self.pw.api, notebook)
+        self.pw.add_notebook(nb)
+        self.pw.add_notebook(models.Notebook.from_json(self.pw.api, notebook2))
+        self.note = models.Note.from_json(nb, note)
+        self.note.tags.add(self.pw.tags[tag_id])
+        self.note.versions = [
+            models.Version.from_json(self.note, version),
+            models.Version.from_json(self.note, version2)]
+        self.note.attachments = [
+            models.Attachment.from_json(self.note, attachment)]
+        nb.add_note(self.note)
+        nb.add_note(models.Note.from_json(nb, note2))
+        self.store = store.Store(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def paperwork(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            return models.Paperwork(uri)
+
+    def test_roundtrip(self):
+        self.pw.save(self.store)
+        loaded = self.paperwork()
+        self.assertTrue(loaded.load(self.store))
+        self.assertEqual(list(loaded.tags), [tag_id, tag2_id])
+        self.assertEqual(list(loaded.notebooks), [notebook_id, notebook2_id])
+        nb = loaded.notebooks[notebook_id]
+        self.assertEqual(list(nb.notes), [note_id, note2_id])
+        parsed = nb.notes[note_id]
+        self.assertEqual(parsed.to_json(), self.note.to_json())
+        self.assertEqual(parsed.updated_at, note_updated_at)
+        self.assertEqual(parsed.dirty, frozenset())
+        self.assertTrue(parsed.loaded)
+        self.assertEqual([v.ident for v in parsed.versions],
+                         [version_id, version2_id])
+        self.assertEqual(parsed.versions[1].previous_id, version_id)
+        self.assertEqual(parsed.attachments[0].title, attachment_file)
+        self.assertEqual(parsed.attachments[0].version_id, version_id)
+        self.assertFalse(nb.notes[note2_id].loaded)
+        self.assertIs(loaded.find_note(note_id), parsed)
+
+    def test_dirty(self):
+        self.note.title = 'changed'
+        self.note.add_tags([self.pw.tags[tag2_id]])
+        self.pw.notebooks[notebook2_id].title = 'changed'
+        self.pw.save(self.store)
+        loaded = self.paperwork()
+        loaded.load(self.store)
+        self.assertEqual(loaded.find_note(note_id).dirty, {'title', 'tags'})
+        self.assertEqual(loaded.find_note(note2_id).dirty, frozenset())
+        self.assertEqual(
+            [nb.ident for nb in loaded.dirty_notebooks()], [notebook2_id])
+
+    def test_migrate(self):
+        path = os.path.join(tempfile.mkdtemp(), 'store.db')
+        connection = sqlite3.connect(path)
+        for statement in store.MIGRATIONS[0]:
+            connection.execute(statement)
+        connection.execute('PRAGMA user_version = 1')
+        connection.close()
+        with store.Store(path) as local:
+            self.assertEqual(local.version, store.SCHEMA_VERSION)
+            self.pw.save(local)
+            self.assertTrue(self.paperwork().load(local))
+
+    def test_other_host(self):
+        self.pw.save(self.store)
+        with patch('paperwrap.wrapper.API.test_connection'):
+            other = models.Paperwork('other/uri')
+        self.assertFalse(other.load(self.store))
+        self.assertFalse(self.paperwork().load(store.Store(':memory:')))
+
+    def test_newer_schema(self):
+        path = os.path.join(tempfile.mkdtemp(), 'store.db')
+        with store.Store(path) as local:
+            self.pw.save(local)
+            local.connection.execute('PRAGMA user_version = 99')
+        with store.Store(path) as local:
+            self.assertEqual(local.version, store.SCHEMA_VERSION)
+            self.assertFalse(self.paperwork().load(local))
+
+    @patch('paperwrap.models.Paperwork.sync')
+    def test_reconcile(self, mocked_sync):
+        mocked_sync.return_value = {}
+        self.assertEqual(self.pw.reconcile(self.store).result(), {})
+        mocked_sync.assert_called_with(True)
+        self.assertTrue(self.paperwork().load(self.store))
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from paperwrap import models, tracing, wrapper
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = tracing.add_exporter(tracing.InMemoryExporter())
+
+    def tearDown(self):
+        tracing.shutdown()
+
+    def test_noop_without_exporter(self):
+        tracing.shutdown()
+        with tracing.span('noop', key='value') as span:
+            span.set(status=200)
+        self.assertIs(span, tracing.NOOP)
+        self.assertFalse(span)
+        self.assertIsNone(tracing.current())
+        func = len
+        self.assertIs(tracing.bind(func), func)
+
+    def test_nested(self):
+        with tracing.span('outer') as outer:
+            with tracing.span('inner', key='value') as inner:
+                self.assertIs(tracing.current(), inner)
+            self.assertIs(tracing.current(), outer)
+        self.assertIsNone(tracing.current())
+        self.assertEqual(self.exporter.spans, [inner, outer])
+        self.assertEqual(inner.parent_id, outer.ident)
+        self.assertIsNone(outer.parent_id)
+        self.assertEqual(inner.attributes, {'key': 'value'})
+        self.assertGreaterEqual(outer.duration, inner.duration)
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with tracing.span('failing'):
+                raise ValueError('failed')
+        self.assertEqual(self.exporter.spans[0].error, 'ValueError: failed')
+        self.assertIsNone(tracing.current())
+
+    def test_exporter_base(self):
+        tracing.add_exporter(tracing.Exporter())
+        with tracing.span('discarded'):
+            pass
+        self.assertEqual(len(self.exporter.spans), 1)
+
+    def test_bind(self):
+        def run():
+            with tracing.span('child'):
+                pass
+        with tracing.span('parent') as parent:
+            thread = threading.Thread(target=tracing.bind(run))
+            thread.start()
+            thread.join()
+        child = self.exporter.find('child')[0]
+        self.assertEqual(child.parent_id, parent.ident)
+        self.assertNotEqual(child.thread, parent.thread)
+
+    def test_exporter_failure(self):
+        class Failing(tracing.Exporter):
+            def export(self, finished):
+                raise IOError('full')
+        tracing.add_exporter(Failing())
+        with tracing.span('exported'):
+            pass
+        self.assertEqual(len(self.exporter.spans), 1)
+
+    def test_json_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), 'trace.jsonl')
+        exporter = tracing.add_exporter(tracing.JSONLinesExporter(path))
+        with tracing.span('outer'):
+            with tracing.span('inner', keyword='notes'):
+                pass
+        tracing.remove_exporter(exporter)
+        with open(path) as trace:
+            lines = [json.loads(line) for line in trace]
+        self.assertEqual([line['name'] for line in lines], ['inner', 'outer'])
+        self.assertEqual(lines[0]['parent_id'], lines[1]['id'])
+        self.assertEqual(lines[0]['attributes'], {'keyword': 'notes'})
+
+    def test_chrome(self):
+        path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        exporter = tracing.add_exporter(tracing.ChromeTraceExporter(path))
+        with tracing.span('outer') as outer:
+            pass
+        tracing.remove_exporter(exporter)
+        with open(path) as trace:
+            events = json.load(trace)['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertEqual(events[0]['name'], 'outer')
+        self.assertEqual(events[0]['ts'], outer.start * 1e6)
+
+
+class TestTracedRequests(unittest.TestCase):
+    def setUp(self):
+        self.exporter = tracing.add_exporter(tracing.InMemoryExporter())
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
+        self.mocked_request = self.patcher.start()
+        self.mocked_request.side_effect = self.respond
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+
+    def tearDown(self):
+        self.patcher.stop()
+        tracing.shutdown()
+
+    def respond(self, method, uri, **kwargs):
+        path = uri.split(wrapper.API_VERSION, 1)[1]
+        if path == 'tags':
+            response = tags
+        elif path == 'notebooks':
+            response = [notebook, notebook2]
+        elif path.endswith('/notes'):
+            response = [note] if path.startswith(
+                'notebooks/{}/'.format(notebook_id)) else []
+        else:
+            response = note
+        return ResponseObj(json.dumps({
+            'success': True, 'response': response}))
+
+    def test_request(self):
+        self.pw.api.request('put', 'note', notebook_id, note_id, **note)
+        span = self.exporter.find('http')[0]
+        self.assertEqual(span.attributes['method'], 'put')
+        self.assertEqual(span.attributes['keyword'], 'note')
+        self.assertEqual(span.attributes['status'], 200)
+        self.assertGreater(span.attributes['request_bytes'], 0)
+        self.assertGreater(span.attributes['response_bytes'], 0)
+        self.assertEqual(span.attributes['server_time'], 0.005)
+
+    def test_attachments(self):
+        self.mocked_request.side_effect = None
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, attachment_file)
+            self.mocked_request.return_value = StreamResponseObj(b'%PDF')
+            self.assertTrue(self.pw.api.download_note_attachment(
+                note, attachment_id, path))
+            self.mocked_request.return_value = ResponseObj(json.dumps({
+                'success': True, 'response': attachment}))
+            self.pw.api.upload_attachment(note, path)
+        download, upload = self.exporter.find('http')
+        self.assertEqual(download.attributes['keyword'], 'attachment_raw')
+        self.assertEqual(download.attributes['status'], 200)
+        self.assertEqual(download.attributes['response_bytes'], 4)
+        self.assertEqual(upload.attributes['method'], 'post')
+        self.assertEqual(upload.attributes['keyword'], 'attachments')
+        self.assertEqual(upload.attributes['status'], 200)
+        self.assertGreater(upload.attributes['request_bytes'], 4)
+
+    def test_download(self):
+        self.pw.download(workers=2)
+        download = self.exporter.find('Paperwork.download')[0]
+        self.assertEqual(download.attributes['notebooks'], 2)
+        self.assertEqual(download.attributes['notes'], 1)
+        requests = self.exporter.find('http')
+        self.assertEqual(len(requests), 4)
+        fetches = self.exporter.find('Notebook.fetch_notes')
+        self.assertEqual(len(fetches), 2)
+        for fetch in fetches:
+            self.assertEqual(fetch.parent_id, download.ident)
+        parents = {fetch.ident for fetch in fetches} | {download.ident}
+        for request in requests:
+            self.assertIn(request.parent_id, parents)
+
+    def test_note_update(self):
+        self.pw.download()
+        self.exporter.clear()
+        self.pw.find_note(note_id).update(force=True)
+        update = self.exporter.find('Note.update')[0]
+        self.assertEqual(update.attributes, {'note': note_id, 'pushed': True})
+        for request in self.exporter.find('http'):
+            self.assertEqual(request.parent_id, update.ident)
@@ -0,0 +1,88 @@
+import unittest
+from paperwrap import models, unitofwork
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.pw = models.Paperwork(uri)
+        self.nb = models.Notebook('source', 1, self.pw.api)
+        self.nb2 = models.Notebook('other', 2, self.pw.api)
+        self.target = models.Notebook('target', 3, self.pw.api)
+        for nb in (self.nb, self.nb2, self.target):
+            self.pw.add_notebook(nb)
+        self.notes = [models.Note('note', i, self.nb) for i in range(5)]
+        self.notes.append(models.Note('note', 5, self.nb2))
+        for note in self.notes:
+            note.notebook.add_note(note)
+        self.tag = models.Tag('tag', 1, self.pw.api)
+        self.pw.add_tag(self.tag)
+
+    def test_chunks(self):
+        self.assertEqual(unitofwork.chunks([1, 2, 3], 2), [[1, 2], [3]])
+
+    @patch('paperwrap.wrapper.API.move_notes')
+    @patch('paperwrap.wrapper.API.delete_notes')
+    def test_commit(self, mocked_delete, mocked_move):
+        mocked_delete.side_effect = lambda notes: notes
+        mocked_move.side_effect = lambda notes, target: notes
+        with self.pw.batch(chunk_size=2) as batch:
+            for note in self.notes[:4]:
+                batch.move(note, self.target)
+            batch.move(self.notes[5], self.target)
+            batch.delete(self.notes[3])
+            batch.delete(self.notes[4])
+            self.assertIs(self.notes[0].notebook, self.nb)
+        # 3 notes from nb in chunks of 2, 1 from nb2
+        self.assertEqual(mocked_move.call_count, 3)
+        self.assertEqual(mocked_delete.call_count, 1)
+        self.assertEqual(
+            sorted(note['id'] for note in mocked_delete.call_args[0][0]),
+            [3, 4])
+        self.assertEqual(sorted(self.target.notes), [0, 1, 2, 5])
+        self.assertEqual(self.nb.notes, {})
+        self.assertIsNone(self.pw.find_note(3))
+        self.assertIs(self.pw.find_note(5).notebook, self.target)
+
+    @patch('paperwrap.wrapper.API.move_notes')
+    def test_failure(self, mocked_move):
+        mocked_move.side_effect = lambda notes, target: \
+            None if notes[0]['notebook_id'] == 2 else notes
+        batch = self.pw.batch()
+        batch.move(self.notes[0], self.target)
+        batch.move(self.notes[5], self.target)
+        with self.assertRaises(unitofwork.BatchError) as raised:
+            batch.commit()
+        self.assertEqual(raised.exception.results['moved'], [self.notes[0]])
+        self.assertEqual(raised.exception.failed[0][1], [self.notes[5]])
+        self.assertIs(self.notes[0].notebook, self.target)
+        self.assertIs(self.notes[5].notebook, self.nb2)
+        self.assertEqual(len(batch), 0)
+
+    @patch('paperwrap.wrapper.API.update_note')
+    def test_tags(self, mocked_update):
+        mocked_update.return_value = {'updated_at': 'now'}
+        with self.pw.batch() as batch:
+            batch.add_tags(self.notes[0], [self.tag])
+            batch.add_tags(self.notes[1], [self.tag])
+            batch.remove_tags(self.notes[1], [self.tag])
+        self.assertEqual(mocked_update.call_count, 2)
+        self.assertEqual(self.pw.find_tagged(all_of=[self.tag]),
+                         [self.notes[0]])
+        self.assertEqual(self.notes[0].updated_at, 'now')
+        self.assertEqual(self.notes[0].dirty, frozenset())
+
+    @patch('paperwrap.wrapper.API.delete_notes')
+    def test_discard(self, mocked_delete):
+        with self.assertRaises(ValueError):
+            with self.pw.batch() as batch:
+                batch.delete(self.notes[0])
+                raise ValueError()
+        self.assertFalse(mocked_delete.called)
+        self.assertIs(self.pw.find_note(0), self.notes[0])
@@ -0,0 +1,61 @@
+import unittest
+from paperwrap import models, utils
+from test_data import *
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+class TestFuzzy(unittest.TestCase):
+    def setUp(self):
+        with patch('paperwrap.wrapper.API.test_connection'):
+            self.api = models.Paperwork(uri).api
+        self.nb = models.Notebook.from_json(self.api, notebook)
+        for ident, title in enumerate(
+                ('Shopping list', 'Recipes', 'Work notes', 'shopping')):
+            self.nb.add_note(models.Note(title, ident, self.nb))
+
+    def test_trigrams(self):
+        self.assertEqual(utils.trigrams('Ab'), {'  a', ' ab', 'ab '})
+
+    def test_fuzzy_find(self):
+        self.assertEqual(utils.fuzzy_find('shoping', self.nb.notes).ident, 3)
+        self.assertEqual(utils.fuzzy_find('Recipe', self.nb.notes).ident, 1)
+        self.assertIsNone(utils.fuzzy_find('zzz', self.nb.notes))
+        self.assertIsNone(utils.fuzzy_find('zzz', []))
+
+    def test_top(self):
+        top = utils.fuzzy_top('shoping', self.nb.notes, 2)
+        self.assertEqual([(note.ident, score) for note, score in top],
+                         [(3, 93), (0, 60)])
+
+    def test_prefilter(self):
+        index = utils.FuzzyIndex(self.nb.notes)
+        self.assertEqual(index.candidates('shop', 10), [0, 3])
+        self.assertEqual(index.candidates('shop', 1), [0])
+
+    def test_index_cache(self):
+        index = utils.fuzzy_index(self.nb.notes)
+        self.assertIs(utils.fuzzy_index(self.nb.notes), index)
+        index.top('work')
+        self.assertIn(('work', 1), index.cache)
+        self.nb.notes[2].title = 'Holidays'
+        self.assertIsNot(utils.fuzzy_index(self.nb.notes), index)
+        self.assertEqual(utils.fuzzy_find('holiday', self.nb.notes).ident, 2)
+
+    def test_index_invalidate(self):
+        index = utils.fuzzy_index(self.nb.notes)
+        self.nb.index_note(models.Note('Holidays', 4, self.nb))
+        self.assertIsNot(utils.fuzzy_index(self.nb.notes), index)
+        self.assertEqual(utils.fuzzy_find('holiday', self.nb.notes).ident, 4)
+
+        with patch.object(utils.FuzzyIndex, '__init__') as init:
+            utils.fuzzy_find('holiday', self.nb.notes)
+        self.assertFalse(init.called)
+
+        tags = {}
+        utils.fuzzy_index(tags)
+        models.ModelIndex().add(models.Tag('Travel', 1, self.api))
+        self.assertEqual(utils.INDEXES, {})
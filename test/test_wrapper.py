@@ -1,5 +1,8 @@
 # License: MIT
 # Author: Nelo Wallus, http://github.com/ntnn
+import os
+import tempfile
+import threading
 import unittest
 from paperwrap import wrapper
 from json import dumps
@@ -11,9 +14,63 @@ except ImportError:
     from mock import patch
 
 
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.single_flight = wrapper.SingleFlight()
+        self.release = threading.Event()
+        self.calls = []
+
+    def call(self):
+        self.calls.append(1)
+        self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    def run_concurrently(self, count):
+        results = []
+
+        def run():
+            try:
+                results.append(self.single_flight.do('key', self.call))
+            except Exception as error:
+                results.append(error)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        while self.single_flight.stats()['calls'] < count:
+            pass
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesce(self):
+        self.result = notes
+        results = self.run_concurrently(5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [notes] * 5)
+        self.assertEqual(self.single_flight.stats(),
+                         {'calls': 5, 'coalesced': 4, 'in_flight': 0})
+
+    def test_exception_shared(self):
+        self.result = ValueError('failed')
+        results = self.run_concurrently(3)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [self.result] * 3)
+
+    def test_sequential_calls_not_coalesced(self):
+        self.result = notes
+        self.release.set()
+        self.single_flight.do('key', self.call)
+        self.single_flight.do('key', self.call)
+        self.assertEqual(len(self.calls), 2)
+
+
 class TestAPI(unittest.TestCase):
     def setUp(self):
-        self.patcher = patch('paperwrap.wrapper.requests.request')
+        self.patcher = patch('paperwrap.wrapper.requests.Session.request')
         self.mocked_request = self.patcher.start()
         temp = ResponseObj(dumps({
             'success': True,
@@ -33,6 +90,40 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(self.api.host, uri_correct)
         self.assertEqual(self.api.headers['User-Agent'], agent)
 
+    def test_init_pool(self):
+        api = wrapper.API(uri, pool_connections=3, pool_maxsize=7,
+                          timeout=2, keep_alive=False)
+        self.assertEqual(api.adapter._pool_connections, 3)
+        self.assertEqual(api.adapter._pool_maxsize, 7)
+        self.assertEqual(api.timeout, 2)
+        self.assertEqual(api.headers['Connection'], 'close')
+        self.assertIs(api.session.get_adapter(uri_correct), api.adapter)
+
+    def test_request_timeout(self):
+        self.api.timeout = 3
+        self.api.list_notebooks()
+        self.assertEqual(self.mocked_request.call_args[1]['timeout'], 3)
+
+    def test_request_headers_not_shared(self):
+        self.api.update_notebook(notebook)
+        self.assertNotIn('Content-Type', self.api.headers)
+
+    def test_pool_stats(self):
+        self.assertEqual(self.api.pool_stats(), {})
+        self.api.adapter.poolmanager.connection_from_url(uri_correct)
+        stats = self.api.pool_stats()
+        self.assertEqual(stats['http://test:80']['requests'], 0)
+        self.assertEqual(stats['http://test:80']['maxsize'],
+                         wrapper.DEFAULT_POOL_MAXSIZE)
+
+    def test_request_coalesced(self):
+        self.api.single_flight.do = lambda key, func: key
+        self.assertEqual(self.api.get_notebook(notebook_id),
+                         ('notebook', (str(notebook_id),)))
+        self.assertFalse(self.mocked_request.called)
+        self.api.move_notes(notes, new_notebook_id)
+        self.assertTrue(self.mocked_request.called)
+
     def request(self, function, keyword, *args):
         temp = ResponseObj(dumps({
             'success': True,
@@ -84,6 +175,19 @@ class TestAPI(unittest.TestCase):
     def test_delete_notes(self):
         self.request(self.api.delete_notes, 'notes', notes)
 
+    @patch('paperwrap.wrapper.API.delete')
+    def test_delete_notes_notebooks(self, mocked_delete):
+        mocked_delete.side_effect = lambda keyword, notebook_id, ids: [
+            {'id': int(ident)} for ident in ids.split(',')]
+        spread = [dict(note, notebook_id=1), dict(note2, notebook_id=2),
+                  dict(note, id=7, notebook_id=1)]
+        self.assertEqual(self.api.delete_notes(spread),
+                         [{'id': note_id}, {'id': 7}, {'id': note2_id}])
+        self.assertEqual(
+            [call[0] for call in mocked_delete.call_args_list],
+            [('note', 1, '{},7'.format(note_id)),
+             ('note', 2, str(note2_id))])
+
     @patch('paperwrap.wrapper.API.move_notes')
     def test_move_note(self, mocked_move_notes):
         self.api.move_note(note, new_notebook_id)
@@ -112,19 +216,98 @@ class TestAPI(unittest.TestCase):
         self.request(self.api.delete_note_attachment, 'attachment', note,
                      attachment_id)
 
-    @patch('paperwrap.wrapper.requests.post')
-    @patch('builtins.open', lambda path, mode: path)
-    def test_upload_attachment(self, mocked_post):
-        self.api.upload_attachment(note, 'some/path/')
-        mocked_post.assert_called_with(
-            self.api.host + wrapper.API_VERSION +
-            wrapper.API_PATH['attachments'].format(
-                note['notebook_id'],
-                note['id'],
-                0),
-            files={'file': 'some/path/'},
-            headers=self.api.headers
-            )
+    def test_download_attachment(self):
+        self.mocked_request.return_value = StreamResponseObj(b'\x00binary\xff')
+        progress = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'file')
+            self.assertTrue(self.api.download_note_attachment(
+                note, attachment_id, path,
+                lambda done, total: progress.append((done, total))))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'\x00binary\xff')
+            self.assertFalse(os.path.exists(path + wrapper.PART_SUFFIX))
+        self.assertNotIn('Range', self.mocked_request.call_args[1]['headers'])
+        self.assertTrue(self.mocked_request.call_args[1]['stream'])
+        self.assertEqual(progress[-1], (8, 8))
+
+    def test_download_attachment_resume(self):
+        self.mocked_request.return_value = StreamResponseObj(b'rest', 206)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'file')
+            with open(path + wrapper.PART_SUFFIX, 'wb') as f:
+                f.write(b'first')
+            self.assertTrue(self.api.download_note_attachment(
+                note, attachment_id, path))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'firstrest')
+        self.assertEqual(self.mocked_request.call_args[1]['headers']['Range'],
+                         'bytes=5-')
+
+    def test_download_attachment_range_ignored(self):
+        self.mocked_request.return_value = StreamResponseObj(b'complete')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'file')
+            with open(path + wrapper.PART_SUFFIX, 'wb') as f:
+                f.write(b'stale')
+            self.assertTrue(self.api.download_note_attachment(
+                note, attachment_id, path))
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'complete')
+
+    def test_download_attachment_error_keeps_part(self):
+        self.mocked_request.return_value = StreamResponseObj(b'', 500)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'file')
+            with open(path + wrapper.PART_SUFFIX, 'wb') as f:
+                f.write(b'first')
+            self.assertFalse(self.api.download_note_attachment(
+                note, attachment_id, path))
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(wrapper.partial_size(path), 5)
+
+    def test_upload_attachment(self):
+        self.mocked_request.return_value = ResponseObj(dumps({
+            'success': True,
+            'response': attachment
+            }))
+        progress = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, attachment_file)
+            with open(path, 'wb') as f:
+                f.write(b'%PDF')
+            response = self.api.upload_attachment(
+                note, path, lambda done, total: progress.append(done))
+        self.assertEqual(response, attachment)
+        args, kwargs = self.mocked_request.call_args
+        self.assertEqual(args[0], 'post')
+        self.assertEqual(args[1], self.api.uri(
+            'attachments', note['notebook_id'], note['id'], 0))
+        body = kwargs['data']
+        self.assertTrue(body.file.closed)
+        self.assertEqual(kwargs['headers']['Content-Type'], body.content_type)
+        self.assertEqual(kwargs['headers']['User-Agent'], agent)
+
+    def test_multipart_encoder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, attachment_file)
+            with open(path, 'wb') as f:
+                f.write(b'0123456789')
+            with wrapper.MultipartEncoder('file', path) as body:
+                chunks = []
+                chunk = body.read(7)
+                while chunk:
+                    chunks.append(chunk)
+                    chunk = body.read(7)
+        data = b''.join(chunks)
+        self.assertEqual(len(data), len(body))
+        self.assertTrue(all(len(chunk) == 7 for chunk in chunks[:-1]))
+        self.assertEqual(
+            data,
+            body.head + b'0123456789' +
+            '\r\n--{}--\r\n'.format(body.boundary).encode())
+        self.assertIn(b'filename="attached.pdf"', body.head)
+        self.assertIn(b'Content-Type: application/pdf', body.head)
 
     def test_list_tags(self):
         self.request(self.api.list_tags, 'tags')